@@ -2,17 +2,24 @@ import base64
 import json
 import logging
 import secrets
+import time
 from typing import Optional
 
 import click
 from flask import current_app
-from sqlalchemy import select
+from sqlalchemy import select, update
 from werkzeug.exceptions import NotFound
 
 from configs import dify_config
 from constants.languages import languages
 from core.rag.datasource.vdb.vector_factory import Vector
 from core.rag.datasource.vdb.vector_type import VectorType
+from core.rag.embedding.embedding_codec import (
+    EmbeddingStorageType,
+    decode_embedding,
+    encode_embedding,
+    is_encoded_embedding,
+)
 from core.rag.index_processor.constant.built_in_field import BuiltInField
 from core.rag.models.document import Document
 from events.app_event import app_was_created
@@ -23,7 +30,14 @@ from libs.helper import email as email_validate
 from libs.password import hash_password, password_pattern, valid_password
 from libs.rsa import generate_key_pair
 from models import Tenant
-from models.dataset import Dataset, DatasetCollectionBinding, DatasetMetadata, DatasetMetadataBinding, DocumentSegment
+from models.dataset import (
+    Dataset,
+    DatasetCollectionBinding,
+    DatasetMetadata,
+    DatasetMetadataBinding,
+    DocumentSegment,
+    Embedding,
+)
 from models.dataset import Document as DatasetDocument
 from models.model import Account, App, AppAnnotationSetting, AppMode, Conversation, MessageAnnotation
 from models.provider import Provider, ProviderModel
@@ -1154,3 +1168,48 @@ def remove_orphaned_files_on_storage(force: bool):
         click.echo(click.style(f"Removed {removed_files} orphaned files without errors.", fg="green"))
     else:
         click.echo(click.style(f"Removed {removed_files} orphaned files, with {error_files} errors.", fg="yellow"))
+
+
+@click.command("migrate-embedding-storage-format", help="Migrate pickled embeddings to the binary storage format.")
+@click.option("--batch-size", default=500, show_default=True, help="Number of embedding rows processed per batch.")
+@click.option("--sleep", default=0.0, show_default=True, help="Seconds to sleep between batches to limit db load.")
+def migrate_embedding_storage_format(batch_size: int, sleep: float):
+    """
+    Re-encode pickled rows of the embeddings table with the configured binary storage format.
+    Rows are processed in primary key order, so the command can be interrupted and run again.
+    """
+    storage_type = EmbeddingStorageType(dify_config.EMBEDDING_STORAGE_FORMAT)
+    click.echo(click.style(f"Starting embedding storage format migration to {storage_type}.", fg="green"))
+
+    last_id = None
+    migrated_count = 0
+    scanned_count = 0
+    while True:
+        stmt = select(Embedding.id, Embedding.embedding).order_by(Embedding.id).limit(batch_size)
+        if last_id is not None:
+            stmt = stmt.where(Embedding.id > last_id)
+        rows = db.session.execute(stmt).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        scanned_count += len(rows)
+
+        updates = []
+        for row in rows:
+            if is_encoded_embedding(row.embedding):
+                continue
+            try:
+                updates.append(
+                    {"id": row.id, "embedding": encode_embedding(decode_embedding(row.embedding), storage_type)}
+                )
+            except Exception as e:
+                click.echo(click.style(f"Failed to decode embedding {row.id}: {str(e)}", fg="red"))
+        if updates:
+            db.session.execute(update(Embedding), updates)
+            migrated_count += len(updates)
+        db.session.commit()
+        click.echo(f"Scanned {scanned_count} embeddings, migrated {migrated_count}.")
+        if sleep:
+            time.sleep(sleep)
+
+    click.echo(click.style(f"Embedding storage format migration completed, migrated {migrated_count}.", fg="green"))
@@ -5,6 +5,7 @@ from pydantic import (
     Field,
     HttpUrl,
     NegativeInt,
+    NonNegativeFloat,
     NonNegativeInt,
     PositiveFloat,
     PositiveInt,
@@ -65,6 +66,11 @@ class AppExecutionConfig(BaseSettings):
         description="Maximum number of requests per app per day",
         default=5000,
     )
+    APP_STOP_SIGNAL_POLL_INTERVAL: NonNegativeFloat = Field(
+        description="Interval in seconds at which stop flags of running tasks are polled from Redis"
+        " (0 to read the flag from Redis on every check)",
+        default=0.5,
+    )
 
 
 class CodeExecutionSandboxConfig(BaseSettings):
@@ -97,6 +103,38 @@ class CodeExecutionSandboxConfig(BaseSettings):
         default=10.0,
     )
 
+    CODE_EXECUTION_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections to the code execution service per process",
+        default=100,
+    )
+
+    CODE_EXECUTION_POOL_MAX_KEEPALIVE_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of idle keep-alive connections to the code execution service per process",
+        default=20,
+    )
+
+    CODE_EXECUTION_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Seconds an idle keep-alive connection to the code execution service is kept open",
+        default=5.0,
+    )
+
+    JINJA2_LOCAL_RENDER_ENABLED: bool = Field(
+        description="Render Jinja2 templates using only a safe subset of Jinja2 in a sandboxed environment of the API"
+        " process instead of the code execution service, other templates are still sent to the service",
+        default=False,
+    )
+
+    JINJA2_TEMPLATE_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of compiled Jinja2 templates cached per process for local rendering",
+        default=1000,
+    )
+
+    JINJA2_RENDER_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of locally rendered Jinja2 outputs cached per process by template and inputs"
+        " (0 to disable)",
+        default=1000,
+    )
+
     CODE_MAX_NUMBER: PositiveInt = Field(
         description="Maximum allowed numeric value in code execution",
         default=9223372036854775807,
@@ -242,6 +280,12 @@ class FileAccessConfig(BaseSettings):
         default=300,
     )
 
+    FILES_SPOOL_MAX_MEMORY_SIZE: NonNegativeInt = Field(
+        description="Size in megabytes up to which files read from storage are kept in memory,"
+        " larger files are spooled to temporary files",
+        default=10,
+    )
+
 
 class FileUploadConfig(BaseSettings):
     """
@@ -381,6 +425,26 @@ class HttpConfig(BaseSettings):
         default=5,
     )
 
+    SSRF_POOL_MAX_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of concurrent connections of each pooled HTTP client (SSRF)",
+        default=100,
+    )
+
+    SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS: PositiveInt = Field(
+        description="Maximum number of idle keep-alive connections of each pooled HTTP client (SSRF)",
+        default=20,
+    )
+
+    SSRF_POOL_KEEPALIVE_EXPIRY: PositiveFloat = Field(
+        description="Seconds an idle keep-alive connection of a pooled HTTP client is kept open (SSRF)",
+        default=5.0,
+    )
+
+    SSRF_POOL_HTTP2_ENABLED: bool = Field(
+        description="Enable HTTP/2 for pooled HTTP clients used for network requests (SSRF), requires the h2 package",
+        default=False,
+    )
+
     RESPECT_XFORWARD_HEADERS_ENABLED: bool = Field(
         description="Enable handling of X-Forwarded-For, X-Forwarded-Proto, and X-Forwarded-Port headers"
         " when the app is behind a single trusted reverse proxy.",
@@ -460,6 +524,80 @@ class ModelLoadBalanceConfig(BaseSettings):
         default=False,
     )
 
+    GPT2_TOKENIZER_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of token counts of the GPT-2 tokenizer cached per process by content"
+        " (0 to disable)",
+        default=10000,
+    )
+
+    GPT2_TOKENIZER_PROCESS_POOL_WORKERS: NonNegativeInt = Field(
+        description="Number of worker processes counting large batches with the GPT-2 tokenizer (0 to count them"
+        " in the calling process)",
+        default=0,
+    )
+
+    GPT2_TOKENIZER_PROCESS_POOL_MIN_CHARS: PositiveInt = Field(
+        description="Minimum number of characters of a batch to count it in the GPT-2 tokenizer process pool",
+        default=200000,
+    )
+
+
+class ModelProviderCacheConfig(BaseSettings):
+    """
+    Configuration for the cache of model provider configurations
+    """
+
+    PROVIDER_CONFIGURATIONS_CACHE_ENABLED: bool = Field(
+        description="Enable the per-process cache of the model provider configurations of each workspace",
+        default=False,
+    )
+
+    PROVIDER_CONFIGURATIONS_CACHE_TTL: PositiveInt = Field(
+        description="Maximum age in seconds of cached model provider configurations",
+        default=60,
+    )
+
+    PROVIDER_CONFIGURATIONS_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of workspaces whose model provider configurations are cached per process",
+        default=1000,
+    )
+
+    PLUGIN_MODEL_SCHEMA_CACHE_ENABLED: bool = Field(
+        description="Enable the per-process and redis cache of the model providers and schemas of plugins",
+        default=False,
+    )
+
+    PLUGIN_MODEL_SCHEMA_CACHE_TTL: PositiveInt = Field(
+        description="Maximum age in seconds of cached plugin model providers and schemas",
+        default=300,
+    )
+
+    PLUGIN_MODEL_SCHEMA_CACHE_SIZE: PositiveInt = Field(
+        description="Maximum number of plugin model providers and schemas cached per process",
+        default=1000,
+    )
+
+    TENANT_RSA_KEY_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of parsed workspace private keys cached per process for decrypting credentials"
+        " (0 to disable)",
+        default=1000,
+    )
+
+    TENANT_RSA_KEY_CACHE_TTL: PositiveInt = Field(
+        description="Maximum age in seconds of cached workspace private keys",
+        default=120,
+    )
+
+    PROVIDER_CREDENTIALS_LOCAL_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of decrypted model provider credentials cached per process (0 to disable)",
+        default=0,
+    )
+
+    PROVIDER_CREDENTIALS_LOCAL_CACHE_TTL: PositiveInt = Field(
+        description="Maximum age in seconds of decrypted model provider credentials cached per process",
+        default=300,
+    )
+
 
 class BillingConfig(BaseSettings):
     """
@@ -513,6 +651,16 @@ class WorkflowConfig(BaseSettings):
         default=200 * 1024,
     )
 
+    WORKFLOW_GRAPH_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of compiled workflow graphs cached per process (0 to disable the cache)",
+        default=128,
+    )
+
+    DOCUMENT_EXTRACTOR_FILE_SIZE_LIMIT: NonNegativeInt = Field(
+        description="Maximum size in megabytes of files read by document extractor nodes (0 for no limit)",
+        default=0,
+    )
+
 
 class WorkflowNodeExecutionConfig(BaseSettings):
     """
@@ -524,11 +672,45 @@ class WorkflowNodeExecutionConfig(BaseSettings):
         default=100,
     )
 
+    WORKFLOW_PARALLEL_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of parallel branches of a single workflow run executed at the same time",
+        default=10,
+    )
+
+    WORKFLOW_SCHEDULER_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of parallel branches and iterations executed at the same time per process",
+        default=100,
+    )
+
+    WORKFLOW_SCHEDULER_MAX_WORKERS_PER_TENANT: NonNegativeInt = Field(
+        description="Maximum number of parallel branches and iterations of one tenant executed at the same time"
+        " per process (0 for no limit)",
+        default=0,
+    )
+
     WORKFLOW_NODE_EXECUTION_STORAGE: str = Field(
         default="rdbms",
         description="Storage backend for WorkflowNodeExecution. Options: 'rdbms', 'hybrid'",
     )
 
+    WORKFLOW_NODE_EXECUTION_WRITE_MODE: Literal["sync", "write_behind"] = Field(
+        description="How workflow node executions are written: 'sync' commits every save on the workflow run,"
+        " 'write_behind' buffers them and writes them in bulk, trading durability of the last"
+        " WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL seconds on a crash for fewer commits",
+        default="sync",
+    )
+
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL: PositiveFloat = Field(
+        description="Interval in seconds between writes of buffered workflow node executions in write_behind mode",
+        default=1.0,
+    )
+
+    WORKFLOW_NODE_EXECUTION_MAX_BUFFER_SIZE: PositiveInt = Field(
+        description="Maximum number of workflow node executions buffered per workflow run in write_behind mode,"
+        " the workflow run writes them itself when the buffer is full",
+        default=200,
+    )
+
 
 class AuthConfig(BaseSettings):
     """
@@ -581,6 +763,22 @@ class AuthConfig(BaseSettings):
     )
 
 
+class MemoryConfig(BaseSettings):
+    """
+    Configuration for conversation memory
+    """
+
+    MEMORY_SNAPSHOT_CACHE_ENABLED: bool = Field(
+        description="Cache the loaded history messages of a conversation in Redis until a new message is saved",
+        default=False,
+    )
+
+    MEMORY_SNAPSHOT_CACHE_TTL: PositiveInt = Field(
+        description="Time-to-live in seconds for cached conversation history messages",
+        default=300,
+    )
+
+
 class ModerationConfig(BaseSettings):
     """
     Configuration for content moderation
@@ -677,10 +875,15 @@ class RagEtlConfig(BaseSettings):
 
     KEYWORD_DATA_SOURCE_TYPE: str = Field(
         description="Data source type for keyword extraction"
-        " ('database' or other supported types), default to 'database'",
+        " ('database', 'sharded' or other supported types), default to 'database'",
         default="database",
     )
 
+    KEYWORD_TABLE_SHARD_CACHE_SIZE: NonNegativeInt = Field(
+        description="Maximum number of parsed keyword table shards cached per process (0 to disable the cache)",
+        default=1024,
+    )
+
     UNSTRUCTURED_API_URL: Optional[str] = Field(
         description="API URL for Unstructured.io service",
         default=None,
@@ -732,6 +935,38 @@ class DataSetConfig(BaseSettings):
         default=30,
     )
 
+    DATASET_RETRIEVAL_STATS_BUFFER_ENABLED: bool = Field(
+        description="Buffer segment hit counts and dataset queries of retrievals in redis,"
+        " and write them in a periodic task instead of on the request path",
+        default=False,
+    )
+
+    DATASET_RETRIEVAL_STATS_FLUSH_INTERVAL: PositiveInt = Field(
+        description="Interval in seconds between writes of buffered retrieval stats",
+        default=60,
+    )
+
+    DATASET_RETRIEVAL_STATS_FLUSH_BATCH_SIZE: PositiveInt = Field(
+        description="Maximum number of buffered dataset queries inserted per statement",
+        default=1000,
+    )
+
+    RETRIEVAL_EXECUTOR_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of dataset searches executed at the same time per process",
+        default=100,
+    )
+
+    RETRIEVAL_EXECUTOR_MAX_WORKERS_PER_TENANT: NonNegativeInt = Field(
+        description="Maximum number of dataset searches of one tenant executed at the same time"
+        " per process (0 for no limit)",
+        default=0,
+    )
+
+    RETRIEVAL_EXECUTOR_TIMEOUT: PositiveFloat = Field(
+        description="Timeout in seconds of dataset searches, results of datasets searched longer are ignored",
+        default=30.0,
+    )
+
 
 class WorkspaceConfig(BaseSettings):
     """
@@ -759,6 +994,36 @@ class IndexingConfig(BaseSettings):
         default=50,
     )
 
+    INDEXING_MAX_WORKERS: PositiveInt = Field(
+        description="Maximum number of threads loading the chunks of a document into the index at the same time",
+        default=10,
+    )
+
+    INDEXING_LOAD_BATCH_SIZE: PositiveInt = Field(
+        description="Number of chunks embedded and written to the index per batch when indexing a document",
+        default=200,
+    )
+
+    EMBEDDING_CACHE_LOOKUP_BATCH_SIZE: PositiveInt = Field(
+        description="Maximum number of text hashes looked up in the embedding cache table per query",
+        default=1000,
+    )
+
+    EMBEDDING_CACHE_REDIS_ENABLED: bool = Field(
+        description="Enable Redis as a cache tier in front of the embedding cache table for document embeddings",
+        default=False,
+    )
+
+    EMBEDDING_CACHE_REDIS_TTL: PositiveInt = Field(
+        description="Time-to-live in seconds for document embeddings cached in Redis",
+        default=600,
+    )
+
+    EMBEDDING_STORAGE_FORMAT: Literal["float32", "float16", "int8"] = Field(
+        description="Binary format used to store cached embeddings: 'float32', 'float16' or 'int8' (quantized)",
+        default="float32",
+    )
+
 
 class MultiModalTransferConfig(BaseSettings):
     MULTIMODAL_SEND_FORMAT: Literal["base64", "url"] = Field(
@@ -766,6 +1031,11 @@ class MultiModalTransferConfig(BaseSettings):
         default="base64",
     )
 
+    MULTIMODAL_FILE_SIZE_LIMIT: NonNegativeInt = Field(
+        description="Maximum size in megabytes of files sent to models as base64 (0 for no limit)",
+        default=0,
+    )
+
 
 class CeleryBeatConfig(BaseSettings):
     CELERY_BEAT_SCHEDULER_TIME: int = Field(
@@ -886,7 +1156,9 @@ class FeatureConfig(
     IndexingConfig,
     LoggingConfig,
     MailConfig,
+    MemoryConfig,
     ModelLoadBalanceConfig,
+    ModelProviderCacheConfig,
     ModerationConfig,
     MultiModalTransferConfig,
     PositionConfig,
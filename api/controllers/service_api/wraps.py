@@ -1,4 +1,3 @@
-import time
 from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
 from enum import Enum
@@ -13,8 +12,8 @@ from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from werkzeug.exceptions import Forbidden, Unauthorized
 
+from core.app.features.rate_limiting.sliding_window_rate_limit import check_knowledge_rate_limit
 from extensions.ext_database import db
-from extensions.ext_redis import redis_client
 from libs.login import _get_user
 from models.account import Account, Tenant, TenantAccountJoin, TenantStatus
 from models.dataset import RateLimitLog
@@ -177,16 +176,7 @@ def cloud_edition_billing_rate_limit_check(resource: str, api_token_type: str):
             if resource == "knowledge":
                 knowledge_rate_limit = FeatureService.get_knowledge_rate_limit(api_token.tenant_id)
                 if knowledge_rate_limit.enabled:
-                    current_time = int(time.time() * 1000)
-                    key = f"rate_limit_{api_token.tenant_id}"
-
-                    redis_client.zadd(key, {current_time: current_time})
-
-                    redis_client.zremrangebyscore(key, 0, current_time - 60000)
-
-                    request_count = redis_client.zcard(key)
-
-                    if request_count > knowledge_rate_limit.limit:
+                    if check_knowledge_rate_limit(api_token.tenant_id, knowledge_rate_limit.limit) < 0:
                         # add ratelimit record
                         rate_limit_log = RateLimitLog(
                             tenant_id=api_token.tenant_id,
@@ -1,4 +1,5 @@
 import queue
+import threading
 import time
 from abc import abstractmethod
 from enum import Enum
@@ -7,6 +8,7 @@ from typing import Any, Optional
 from sqlalchemy.orm import DeclarativeMeta
 
 from configs import dify_config
+from core.app.apps.stop_signal_watcher import StopSignalWatcher
 from core.app.entities.app_invoke_entities import InvokeFrom
 from core.app.entities.queue_entities import (
     AppQueueEvent,
@@ -42,6 +44,12 @@ class AppQueueManager:
 
         self._q = q
 
+        self._stop_event: Optional[threading.Event] = None
+        if dify_config.APP_STOP_SIGNAL_POLL_INTERVAL > 0:
+            self._stop_event = StopSignalWatcher.get_instance().watch(
+                AppQueueManager._generate_stopped_cache_key(self._task_id)
+            )
+
     def listen(self):
         """
         Listen to queue
@@ -79,6 +87,8 @@ class AppQueueManager:
         :return:
         """
         self._q.put(None)
+        if self._stop_event is not None:
+            StopSignalWatcher.get_instance().unwatch(AppQueueManager._generate_stopped_cache_key(self._task_id))
 
     def publish_error(self, e, pub_from: PublishFrom) -> None:
         """
@@ -131,6 +141,9 @@ class AppQueueManager:
         Check if task is stopped
         :return:
         """
+        if self._stop_event is not None:
+            return self._stop_event.is_set()
+
         stopped_cache_key = AppQueueManager._generate_stopped_cache_key(self._task_id)
         result = redis_client.get(stopped_cache_key)
         if result is not None:
@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from configs import dify_config
+from core.helper.fork_safe_singleton import ForkSafeSingleton
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class StopSignalWatcher:
+    """
+    Process-wide watcher of task stop flags.
+
+    Instead of every queue manager reading its stop flag from redis on each published event,
+    one background thread per process polls the stop flags of all watched tasks in a single
+    redis round trip and sets a local event for each stopped task, so checking a flag is free.
+    Stop latency is bounded by APP_STOP_SIGNAL_POLL_INTERVAL.
+    """
+
+    def __init__(self, poll_interval: float) -> None:
+        self._poll_interval = poll_interval
+        self._lock = threading.Lock()
+        # stop flag cache key -> (stop event, registered at)
+        self._watched: dict[str, tuple[threading.Event, float]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def get_instance() -> "StopSignalWatcher":
+        # the polling thread does not survive a fork, forked children start a new watcher
+        return _instance.get()
+
+    def watch(self, stopped_cache_key: str) -> threading.Event:
+        """
+        Start watching the stop flag stored under the given cache key.
+        :param stopped_cache_key: redis key of the stop flag
+        :return: event that is set once the stop flag is found
+        """
+        with self._lock:
+            watched = self._watched.get(stopped_cache_key)
+            if watched:
+                return watched[0]
+            stop_event = threading.Event()
+            self._watched[stopped_cache_key] = (stop_event, time.monotonic())
+            self._ensure_started()
+        return stop_event
+
+    def unwatch(self, stopped_cache_key: str) -> None:
+        with self._lock:
+            self._watched.pop(stopped_cache_key, None)
+
+    def poll(self) -> None:
+        """
+        Read the stop flags of all watched tasks in one round trip.
+        """
+        # tasks can not run longer than APP_MAX_EXECUTION_TIME, drop entries that were never unwatched
+        expire_before = time.monotonic() - dify_config.APP_MAX_EXECUTION_TIME
+        with self._lock:
+            for key in [key for key, (_, registered_at) in self._watched.items() if registered_at < expire_before]:
+                del self._watched[key]
+            watched = [(key, stop_event) for key, (stop_event, _) in self._watched.items() if not stop_event.is_set()]
+        if not watched:
+            return
+
+        pipeline = redis_client.pipeline(transaction=False)
+        for key, _ in watched:
+            pipeline.exists(key)
+        for (_, stop_event), exists in zip(watched, pipeline.execute()):
+            if exists:
+                stop_event.set()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="StopSignalWatcher", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self._poll_interval)
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Failed to poll task stop flags")
+
+
+_instance = ForkSafeSingleton(lambda: StopSignalWatcher(poll_interval=dify_config.APP_STOP_SIGNAL_POLL_INTERVAL))
@@ -0,0 +1,22 @@
+from collections.abc import Sequence
+from typing import Any
+
+from extensions.ext_redis import redis_client
+
+
+class LuaScript:
+    """
+    Lua script run atomically by redis in a single round trip.
+    The script is registered on first use, redis_client is only initialized with the app.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self._client: Any = None
+        self._script: Any = None
+
+    def __call__(self, keys: Sequence[str], args: Sequence[Any]) -> Any:
+        if self._script is None or self._client is not redis_client:
+            self._client = redis_client
+            self._script = redis_client.register_script(self.source)
+        return self._script(keys=keys, args=args)
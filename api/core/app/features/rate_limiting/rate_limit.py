@@ -5,11 +5,53 @@ from collections.abc import Generator, Mapping
 from datetime import timedelta
 from typing import Any, Optional, Union
 
+from core.app.features.rate_limiting.lua_script import LuaScript
 from core.errors.error import AppInvokeQuotaExceededError
 from extensions.ext_redis import redis_client
 
 logger = logging.getLogger(__name__)
 
+# KEYS[1]: active requests hash, ARGV: request id, now, max active requests, request max alive time, key ttl
+# admits the request and returns the remaining capacity, or -1 if the limit is reached.
+# requests that never exited are only expired when the limit is reached, so admitting stays O(1).
+_ENTER_SCRIPT = LuaScript("""
+local now = tonumber(ARGV[2])
+local max_active_requests = tonumber(ARGV[3])
+local count = redis.call('HLEN', KEYS[1])
+if count >= max_active_requests then
+    local request_details = redis.call('HGETALL', KEYS[1])
+    for i = 1, #request_details, 2 do
+        if now - tonumber(request_details[i + 1]) > tonumber(ARGV[4]) then
+            redis.call('HDEL', KEYS[1], request_details[i])
+            count = count - 1
+        end
+    end
+    if count >= max_active_requests then
+        return -1
+    end
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return max_active_requests - count - 1
+""")
+
+# KEYS[1]: active requests hash, ARGV: now, request max alive time, key ttl
+# expires the requests that never exited and returns the number of active requests.
+_FLUSH_SCRIPT = LuaScript("""
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+local now = tonumber(ARGV[1])
+local request_details = redis.call('HGETALL', KEYS[1])
+for i = 1, #request_details, 2 do
+    if now - tonumber(request_details[i + 1]) > tonumber(ARGV[2]) then
+        redis.call('HDEL', KEYS[1], request_details[i])
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return redis.call('HLEN', KEYS[1])
+""")
+
 
 class RateLimit:
     _MAX_ACTIVE_REQUESTS_KEY = "dify:rate_limit:{}:max_active_requests"
@@ -17,6 +59,7 @@ class RateLimit:
     _UNLIMITED_REQUEST_ID = "unlimited_request_id"
     _REQUEST_MAX_ALIVE_TIME = 10 * 60  # 10 minutes
     _ACTIVE_REQUESTS_COUNT_FLUSH_INTERVAL = 5 * 60  # recalculate request_count from request_detail every 5 minutes
+    _KEY_TTL = int(timedelta(days=1).total_seconds())
     _instance_dict: dict[str, "RateLimit"] = {}
 
     def __new__(cls: type["RateLimit"], client_id: str, max_active_requests: int):
@@ -51,17 +94,10 @@ class RateLimit:
             redis_client.expire(self.max_active_requests_key, timedelta(days=1))
 
         # flush max active requests (in-transit request list)
-        if not redis_client.exists(self.active_requests_key):
-            return
-        request_details = redis_client.hgetall(self.active_requests_key)
-        redis_client.expire(self.active_requests_key, timedelta(days=1))
-        timeout_requests = [
-            k
-            for k, v in request_details.items()
-            if time.time() - float(v.decode("utf-8")) > RateLimit._REQUEST_MAX_ALIVE_TIME
-        ]
-        if timeout_requests:
-            redis_client.hdel(self.active_requests_key, *timeout_requests)
+        _FLUSH_SCRIPT(
+            keys=[self.active_requests_key],
+            args=[time.time(), RateLimit._REQUEST_MAX_ALIVE_TIME, RateLimit._KEY_TTL],
+        )
 
     def enter(self, request_id: Optional[str] = None) -> str:
         if self.disabled():
@@ -71,13 +107,22 @@ class RateLimit:
         if not request_id:
             request_id = RateLimit.gen_request_key()
 
-        active_requests_count = redis_client.hlen(self.active_requests_key)
-        if active_requests_count >= self.max_active_requests:
+        # check and admit in one atomic round trip, so concurrent requests can not exceed the limit
+        remaining = _ENTER_SCRIPT(
+            keys=[self.active_requests_key],
+            args=[
+                request_id,
+                str(time.time()),
+                self.max_active_requests,
+                RateLimit._REQUEST_MAX_ALIVE_TIME,
+                RateLimit._KEY_TTL,
+            ],
+        )
+        if remaining < 0:
             raise AppInvokeQuotaExceededError(
                 f"Too many requests. Please try again later. The current maximum concurrent requests allowed "
                 f"for {self.client_id} is {self.max_active_requests}."
             )
-        redis_client.hset(self.active_requests_key, request_id, str(time.time()))
         return request_id
 
     def exit(self, request_id: str):
@@ -0,0 +1,35 @@
+import time
+import uuid
+
+from core.app.features.rate_limiting.lua_script import LuaScript
+
+# KEYS[1]: sorted set of request timestamps, ARGV: now in milliseconds, window in milliseconds, request member
+# records the request, drops the requests outside of the window and returns the number of requests in the window.
+_SLIDING_WINDOW_SCRIPT = LuaScript("""
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZADD', KEYS[1], now, ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+redis.call('PEXPIRE', KEYS[1], window)
+return redis.call('ZCARD', KEYS[1])
+""")
+
+
+def check_sliding_window_rate_limit(key: str, limit: int, window_ms: int = 60000) -> int:
+    """
+    Record a request in the sliding window stored under the key in one atomic round trip.
+    :return: remaining capacity of the window, negative if the request exceeds the limit
+    """
+    current_time = int(time.time() * 1000)
+    # requests in the same millisecond must not overwrite each other
+    member = f"{current_time}:{uuid.uuid4().hex}"
+    request_count = _SLIDING_WINDOW_SCRIPT(keys=[key], args=[current_time, window_ms, member])
+    return limit - int(request_count)
+
+
+def check_knowledge_rate_limit(tenant_id: str, limit: int) -> int:
+    """
+    Record a knowledge base request of the tenant, allowing `limit` requests per minute.
+    :return: remaining capacity, negative if the request exceeds the limit
+    """
+    return check_sliding_window_rate_limit(f"rate_limit_{tenant_id}", limit)
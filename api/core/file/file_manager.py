@@ -1,5 +1,9 @@
 import base64
-from collections.abc import Mapping
+import io
+import tempfile
+from collections.abc import Generator, Iterator, Mapping
+from contextlib import contextmanager
+from typing import IO
 
 from configs import dify_config
 from core.helper import ssrf_proxy
@@ -102,19 +106,89 @@ def _download_file_content(path: str, /):
     return data
 
 
-def _get_encoded_string(f: File, /):
+def stream(f: File, /, *, start: int = 0, length: int | None = None, max_size: int = 0) -> Generator[bytes, None, None]:
+    """
+    Stream the contents of a file, or the range of `length` bytes from `start`.
+
+    Files in storage are read chunk by chunk with `storage.load_stream`, which has no ranges, so the chunks
+    before the range are skipped and reading stops at its end. Remote files are read chunk by chunk from the
+    response, and rejected before reading when their Content-Length is larger than max_size.
+
+    Args:
+        start (int): Offset of the first byte to return.
+        length (int | None): Number of bytes to return, up to the end of the file by default.
+        max_size (int): Maximum size of the file in bytes, 0 for no limit.
+
+    Raises:
+        ValueError: If the file is larger than max_size.
+    """
+    if max_size and f.size > max_size:
+        raise ValueError(f"file {f.filename} is larger than {max_size} bytes")
+
+    end = None if length is None else start + length
+    position = 0
+    for chunk in _iter_chunks(f, max_size=max_size):
+        chunk_start = position
+        position += len(chunk)
+        if max_size and position > max_size:
+            raise ValueError(f"file {f.filename} is larger than {max_size} bytes")
+        if position <= start:
+            continue
+        if end is not None and chunk_start >= end:
+            break
+        if chunk_start < start or (end is not None and position > end):
+            chunk = chunk[max(start - chunk_start, 0) : None if end is None else end - chunk_start]
+        yield chunk
+        if end is not None and position >= end:
+            break
+
+
+@contextmanager
+def open_file(f: File, /, *, max_size: int = 0) -> Generator[IO[bytes], None, None]:
+    """
+    Open the contents of a file as a binary file object, rewound.
+
+    The contents are spooled to a temporary file, which is kept in memory up to FILES_SPOOL_MAX_MEMORY_SIZE,
+    and deleted when the context exits.
+
+    Raises:
+        ValueError: If the file is larger than max_size bytes.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=dify_config.FILES_SPOOL_MAX_MEMORY_SIZE * 1024 * 1024) as spool:
+        for chunk in stream(f, max_size=max_size):
+            spool.write(chunk)
+        spool.seek(0)
+        yield spool  # type: ignore
+
+
+def _iter_chunks(f: File, /, *, max_size: int = 0) -> Iterator[bytes]:
     match f.transfer_method:
+        case FileTransferMethod.LOCAL_FILE | FileTransferMethod.TOOL_FILE:
+            yield from storage.load_stream(f._storage_key)
         case FileTransferMethod.REMOTE_URL:
-            response = ssrf_proxy.get(f.remote_url, follow_redirects=True)
-            response.raise_for_status()
-            data = response.content
-        case FileTransferMethod.LOCAL_FILE:
-            data = _download_file_content(f._storage_key)
-        case FileTransferMethod.TOOL_FILE:
-            data = _download_file_content(f._storage_key)
-
-    encoded_string = base64.b64encode(data).decode("utf-8")
-    return encoded_string
+            with ssrf_proxy.stream("GET", f.remote_url, follow_redirects=True) as response:
+                response.raise_for_status()
+                content_length = response.headers.get("content-length")
+                if max_size and content_length and content_length.isdigit() and int(content_length) > max_size:
+                    raise ValueError(f"file {f.filename} is larger than {max_size} bytes")
+                yield from response.iter_bytes()
+        case _:
+            raise ValueError(f"unsupported transfer method: {f.transfer_method}")
+
+
+def _get_encoded_string(f: File, /):
+    # encode the chunks as they are read, in multiples of 3 bytes so that no padding is added between them
+    encoded = io.StringIO()
+    remainder = b""
+    for chunk in stream(f, max_size=dify_config.MULTIMODAL_FILE_SIZE_LIMIT * 1024 * 1024):
+        if remainder:
+            chunk = remainder + chunk
+        view = memoryview(chunk)
+        cut = len(view) - len(view) % 3
+        encoded.write(base64.b64encode(view[:cut]).decode("ascii"))
+        remainder = bytes(view[cut:])
+    encoded.write(base64.b64encode(remainder).decode("ascii"))
+    return encoded.getvalue()
 
 
 def _to_url(f: File, /):
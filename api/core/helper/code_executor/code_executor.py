@@ -4,12 +4,13 @@ from enum import StrEnum
 from threading import Lock
 from typing import Any, Optional
 
-from httpx import Timeout, post
 from pydantic import BaseModel
 from yarl import URL
 
 from configs import dify_config
+from core.helper.code_executor import sandbox_client
 from core.helper.code_executor.javascript.javascript_transformer import NodeJsTemplateTransformer
+from core.helper.code_executor.jinja2.jinja2_local_renderer import Jinja2LocalRenderer
 from core.helper.code_executor.jinja2.jinja2_transformer import Jinja2TemplateTransformer
 from core.helper.code_executor.python3.python3_transformer import Python3TemplateTransformer
 from core.helper.code_executor.template_transformer import TemplateTransformer
@@ -67,8 +68,6 @@ class CodeExecutor:
         """
         url = code_execution_endpoint_url / "v1" / "sandbox" / "run"
 
-        headers = {"X-Api-Key": dify_config.CODE_EXECUTION_API_KEY}
-
         data = {
             "language": cls.code_language_to_running_language.get(language),
             "code": code,
@@ -77,17 +76,8 @@ class CodeExecutor:
         }
 
         try:
-            response = post(
-                str(url),
-                json=data,
-                headers=headers,
-                timeout=Timeout(
-                    connect=dify_config.CODE_EXECUTION_CONNECT_TIMEOUT,
-                    read=dify_config.CODE_EXECUTION_READ_TIMEOUT,
-                    write=dify_config.CODE_EXECUTION_WRITE_TIMEOUT,
-                    pool=None,
-                ),
-            )
+            # the pooled client sends the api key and applies the timeouts
+            response = sandbox_client.get_client().post(str(url), json=data)
             if response.status_code == 503:
                 raise CodeExecutionError("Code execution service is unavailable")
             elif response.status_code != 200:
@@ -128,6 +118,11 @@ class CodeExecutor:
         :param inputs: inputs
         :return:
         """
+        if language == CodeLanguage.JINJA2 and dify_config.JINJA2_LOCAL_RENDER_ENABLED:
+            output = Jinja2LocalRenderer.render(code, inputs)
+            if output is not None:
+                return {"result": output}
+
         template_transformer = cls.code_template_transformers.get(language)
         if not template_transformer:
             raise CodeExecutionError(f"Unsupported language {language}")
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import logging
+import threading
+from collections.abc import Callable, Mapping
+from typing import Any, Optional
+
+from cachetools import LRUCache
+from jinja2 import BaseLoader, Environment, Template, TemplateNotFound, nodes
+from jinja2.bccache import Bucket, BytecodeCache
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+
+from configs import dify_config
+
+logger = logging.getLogger(__name__)
+
+# nodes of templates that substitute variables, use filters and tests, branch and loop over their inputs;
+# no assignments, macros, calls, includes or imports, and no operators like `*` or `%` that can build huge values
+_SAFE_NODES = (
+    nodes.Template,
+    nodes.Output,
+    nodes.TemplateData,
+    nodes.Name,
+    nodes.Const,
+    nodes.List,
+    nodes.Tuple,
+    nodes.Dict,
+    nodes.Pair,
+    nodes.Keyword,
+    nodes.Getattr,
+    nodes.Getitem,
+    nodes.Slice,
+    nodes.Filter,
+    nodes.Test,
+    nodes.If,
+    nodes.For,
+    nodes.CondExpr,
+    nodes.Compare,
+    nodes.Operand,
+    nodes.And,
+    nodes.Or,
+    nodes.Not,
+    nodes.Neg,
+    nodes.Pos,
+    nodes.Add,
+    nodes.Sub,
+    nodes.Div,
+    nodes.FloorDiv,
+    nodes.Concat,
+)
+# filters whose output is bounded by the size of their inputs
+_SAFE_FILTERS = {
+    "abs",
+    "capitalize",
+    "count",
+    "d",
+    "default",
+    "dictsort",
+    "e",
+    "escape",
+    "first",
+    "float",
+    "forceescape",
+    "int",
+    "join",
+    "last",
+    "length",
+    "list",
+    "lower",
+    "max",
+    "min",
+    "reverse",
+    "round",
+    "safe",
+    "sort",
+    "string",
+    "striptags",
+    "sum",
+    "title",
+    "tojson",
+    "trim",
+    "unique",
+    "upper",
+    "urlencode",
+    "wordcount",
+}
+# loops are not nested, so the work of a template grows linearly with the size of its inputs
+_MAX_LOOP_DEPTH = 1
+# the sandbox embeds the template in a python string literal of its runner script,
+# templates changed by that are left to the sandbox
+_RUNNER_SCRIPT_TOKENS = ("\\", "'''", "{{code}}", "{{inputs}}")
+
+
+class _LRUBytecodeCache(BytecodeCache):
+    """
+    In-memory bytecode cache, so templates evicted from the template cache of the environment
+    are loaded again without being compiled.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._lock = threading.Lock()
+        # bucket key -> (source checksum, code)
+        self._codes: LRUCache = LRUCache(maxsize=maxsize)
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        with self._lock:
+            cached = self._codes.get(bucket.key)
+        if cached and cached[0] == bucket.checksum:
+            bucket.code = cached[1]
+
+    def dump_bytecode(self, bucket: Bucket) -> None:
+        with self._lock:
+            self._codes[bucket.key] = (bucket.checksum, bucket.code)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._codes.clear()
+
+
+class _TemplateHashLoader(BaseLoader):
+    """
+    Loads templates by the hash of their source, registered before they are loaded.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._lock = threading.Lock()
+        self._sources: LRUCache = LRUCache(maxsize=maxsize)
+
+    def register(self, template_hash: str, source: str) -> None:
+        with self._lock:
+            self._sources[template_hash] = source
+
+    def get_source(self, environment: Environment, template: str) -> tuple[str, Optional[str], Callable[[], bool]]:
+        with self._lock:
+            source = self._sources.get(template)
+        if source is None:
+            raise TemplateNotFound(template)
+        # the name is the hash of the source, a template never changes
+        return source, None, lambda: True
+
+
+class Jinja2LocalRenderer:
+    """
+    Renders Jinja2 templates in process instead of in the code execution sandbox.
+
+    Only templates in a safe subset are rendered locally: they substitute variables, use filters and tests, and
+    branch or loop over their inputs without nesting loops. Assignments, macros, calls, includes, imports,
+    private attributes and operators like `*` or `%` are left out, and rendering stops once the output is longer
+    than `CODE_MAX_STRING_LENGTH`. They run in an immutable sandboxed environment with the defaults of
+    `jinja2.Template` used by the sandbox.
+    Compiled templates and their bytecode are cached by the hash of the template, rendered outputs by the
+    hash of the template and of the inputs.
+    Anything else, and any template failing to render, is left to the sandbox, which then reports the error.
+    """
+
+    _lock = threading.Lock()
+    _loader = _TemplateHashLoader(maxsize=dify_config.JINJA2_TEMPLATE_CACHE_SIZE)
+    _environment = ImmutableSandboxedEnvironment(
+        loader=_loader,
+        cache_size=dify_config.JINJA2_TEMPLATE_CACHE_SIZE,
+        bytecode_cache=_LRUBytecodeCache(maxsize=dify_config.JINJA2_TEMPLATE_CACHE_SIZE),
+        auto_reload=False,
+    )
+    # template hash -> whether the template is in the safe subset
+    _safe_templates: LRUCache = LRUCache(maxsize=dify_config.JINJA2_TEMPLATE_CACHE_SIZE)
+    # (template hash, inputs hash) -> rendered output
+    _outputs: LRUCache[tuple[str, bytes], str] = LRUCache(maxsize=dify_config.JINJA2_RENDER_CACHE_SIZE or 1)
+
+    @classmethod
+    def render(cls, template: str, inputs: Mapping[str, Any]) -> Optional[str]:
+        """
+        Render the template locally.
+        :return: the rendered template, or None if it must be rendered by the sandbox
+        """
+        template_hash = hashlib.sha256(template.encode("utf-8", errors="surrogatepass")).hexdigest()
+        if not cls._is_safe(template_hash, template):
+            return None
+
+        # the sandbox receives the inputs as json
+        inputs_json = json.dumps(inputs, ensure_ascii=False)
+        output_key = (template_hash, hashlib.sha256(inputs_json.encode("utf-8", errors="surrogatepass")).digest())
+        with cls._lock:
+            output = cls._outputs.get(output_key)
+        if output is not None:
+            return output
+
+        try:
+            compiled_template = cls._environment.get_template(template_hash)
+            output = cls._render_bounded(compiled_template, json.loads(inputs_json))
+        except Exception as e:
+            logger.debug(f"Failed to render jinja2 template locally, rendering it in the sandbox: {e}")
+            return None
+        if output is None:
+            return None
+
+        if dify_config.JINJA2_RENDER_CACHE_SIZE:
+            with cls._lock:
+                cls._outputs[output_key] = output
+        return output
+
+    @classmethod
+    def _render_bounded(cls, compiled_template: Template, inputs: Mapping[str, Any]) -> Optional[str]:
+        chunks = []
+        length = 0
+        for chunk in compiled_template.generate(**inputs):
+            length += len(chunk)
+            if length > dify_config.CODE_MAX_STRING_LENGTH:
+                logger.debug("Jinja2 template output is too long to be rendered locally, rendering it in the sandbox")
+                return None
+            chunks.append(chunk)
+        return "".join(chunks)
+
+    @classmethod
+    def _is_safe(cls, template_hash: str, template: str) -> bool:
+        with cls._lock:
+            safe = cls._safe_templates.get(template_hash)
+        if safe is None:
+            safe = cls._check_safe(template)
+            with cls._lock:
+                cls._safe_templates[template_hash] = safe
+        if safe:
+            cls._loader.register(template_hash, template)
+        return safe
+
+    @classmethod
+    def _check_safe(cls, template: str) -> bool:
+        if any(token in template for token in _RUNNER_SCRIPT_TOKENS):
+            return False
+        try:
+            ast = cls._environment.parse(template)
+        except Exception:
+            return False
+
+        for node in ast.find_all(nodes.Node):
+            if not isinstance(node, _SAFE_NODES):
+                return False
+            if isinstance(node, nodes.For) and node.recursive:
+                return False
+            if isinstance(node, nodes.Filter) and node.name not in _SAFE_FILTERS:
+                return False
+            if isinstance(node, nodes.Getattr) and node.attr.startswith("_"):
+                return False
+            if isinstance(node, nodes.Const) and isinstance(node.value, str) and node.value.startswith("_"):
+                return False
+        return cls._loop_depth(ast) <= _MAX_LOOP_DEPTH
+
+    @classmethod
+    def _loop_depth(cls, node: nodes.Node) -> int:
+        depth = max((cls._loop_depth(child) for child in node.iter_child_nodes()), default=0)
+        return depth + 1 if isinstance(node, nodes.For) else depth
@@ -0,0 +1,43 @@
+"""
+Pooled HTTP client of the code execution sandbox
+"""
+
+import httpx
+
+from configs import dify_config
+from core.helper.fork_safe_singleton import ForkSafeSingleton
+
+
+def _build_client() -> httpx.Client:
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=dify_config.CODE_EXECUTION_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=dify_config.CODE_EXECUTION_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=dify_config.CODE_EXECUTION_POOL_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=dify_config.CODE_EXECUTION_CONNECT_TIMEOUT,
+            read=dify_config.CODE_EXECUTION_READ_TIMEOUT,
+            write=dify_config.CODE_EXECUTION_WRITE_TIMEOUT,
+            pool=None,
+        ),
+        headers={"X-Api-Key": dify_config.CODE_EXECUTION_API_KEY},
+    )
+
+
+# connections of the parent process must not be shared with forked workers
+_client = ForkSafeSingleton(_build_client)
+
+
+def get_client() -> httpx.Client:
+    """
+    Get the process-wide pooled client of the sandbox, keeping connections alive across executions.
+    """
+    return _client.get()
+
+
+def close_clients() -> None:
+    """Close and drop the pooled client."""
+    client = _client.pop()
+    if client is not None:
+        client.close()
@@ -0,0 +1,45 @@
+import os
+import threading
+from collections.abc import Callable
+from typing import Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class ForkSafeSingleton(Generic[T]):
+    """
+    Process-wide object created by a factory on first use and shared by the threads of the process.
+
+    Threads, connections and held locks do not survive a fork, so forked children drop the object of the parent
+    and create their own on first use. Meant to be created at module level, each one is reset after every fork.
+    """
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def get(self) -> T:
+        value = self._value
+        if value is None:
+            with self._lock:
+                if self._value is None:
+                    self._value = self._factory()
+                value = self._value
+        return value
+
+    def peek(self) -> Optional[T]:
+        """Get the object if it was created, without creating it."""
+        return self._value
+
+    def pop(self) -> Optional[T]:
+        """Drop the object, the next `get` creates a new one. The dropped object is returned, if any."""
+        with self._lock:
+            value, self._value = self._value, None
+        return value
+
+    def _reset(self) -> None:
+        self._lock = threading.Lock()
+        self._value = None
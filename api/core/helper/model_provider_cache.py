@@ -1,8 +1,14 @@
 import json
+import threading
+import time
 from enum import Enum
 from json import JSONDecodeError
 from typing import Optional
 
+from cachetools import LRUCache
+
+from configs import dify_config
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
 from extensions.ext_redis import redis_client
 
 
@@ -13,7 +19,27 @@ class ProviderCredentialsCacheType(Enum):
 
 
 class ProviderCredentialsCache:
-    def __init__(self, tenant_id: str, identity_id: str, cache_type: ProviderCredentialsCacheType):
+    """
+    Cache of decrypted model provider credentials in redis.
+
+    With PROVIDER_CREDENTIALS_LOCAL_CACHE_SIZE, credentials read with a version of the provider configurations
+    of the tenant are also cached in the process, stamped with that version. Deleting credentials changes the
+    version, so that no process reads credentials cached before the change.
+    """
+
+    _lock = threading.Lock()
+    # cache key -> (version, cached at, credentials)
+    _entries: LRUCache = LRUCache(maxsize=dify_config.PROVIDER_CREDENTIALS_LOCAL_CACHE_SIZE or 1)
+
+    def __init__(
+        self,
+        tenant_id: str,
+        identity_id: str,
+        cache_type: ProviderCredentialsCacheType,
+        version: Optional[str] = None,
+    ):
+        self.tenant_id = tenant_id
+        self.version = version
         self.cache_key = f"{cache_type.value}_credentials:tenant_id:{tenant_id}:id:{identity_id}"
 
     def get(self) -> Optional[dict]:
@@ -22,6 +48,16 @@ class ProviderCredentialsCache:
 
         :return:
         """
+        if self._local_cache_enabled:
+            with self._lock:
+                entry = self._entries.get(self.cache_key)
+            if (
+                entry is not None
+                and entry[0] == self.version
+                and time.monotonic() - entry[1] <= dify_config.PROVIDER_CREDENTIALS_LOCAL_CACHE_TTL
+            ):
+                return dict(entry[2])
+
         cached_provider_credentials = redis_client.get(self.cache_key)
         if cached_provider_credentials:
             try:
@@ -30,6 +66,7 @@ class ProviderCredentialsCache:
             except JSONDecodeError:
                 return None
 
+            self._set_local(dict(cached_provider_credentials))
             return dict(cached_provider_credentials)
         else:
             return None
@@ -42,6 +79,7 @@ class ProviderCredentialsCache:
         :return:
         """
         redis_client.setex(self.cache_key, 86400, json.dumps(credentials))
+        self._set_local(dict(credentials))
 
     def delete(self) -> None:
         """
@@ -50,3 +88,16 @@ class ProviderCredentialsCache:
         :return:
         """
         redis_client.delete(self.cache_key)
+        with self._lock:
+            self._entries.pop(self.cache_key, None)
+        # credentials cached by other processes are stamped with the previous version
+        ProviderConfigurationsCache.invalidate(self.tenant_id)
+
+    @property
+    def _local_cache_enabled(self) -> bool:
+        return self.version is not None and dify_config.PROVIDER_CREDENTIALS_LOCAL_CACHE_SIZE > 0
+
+    def _set_local(self, credentials: dict) -> None:
+        if self._local_cache_enabled:
+            with self._lock:
+                self._entries[self.cache_key] = (self.version, time.monotonic(), credentials)
@@ -0,0 +1,200 @@
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Callable, Sequence
+from typing import Any, Optional
+
+from cachetools import LRUCache, TTLCache
+from pydantic import TypeAdapter
+from redis import RedisError
+
+from configs import dify_config
+from core.model_runtime.entities.model_entities import AIModelEntity
+from core.plugin.entities.plugin_daemon import PluginModelProviderEntity
+from extensions.ext_redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+PLUGIN_MODEL_SCHEMA_VERSION_KEY_PREFIX = "plugin_model_schema_version"
+PLUGIN_MODEL_SCHEMA_KEY_PREFIX = "plugin_model_schema"
+PLUGIN_INSTALL_TASK_INVALIDATED_KEY_PREFIX = "plugin_model_schema_install_task_invalidated"
+# seconds the version of a tenant is kept in the process, invalidations in other processes are seen after it
+PLUGIN_MODEL_SCHEMA_VERSION_LOCAL_TTL = 5
+
+_model_providers_adapter = TypeAdapter(list[PluginModelProviderEntity])
+
+
+class PluginModelSchemaCache:
+    """
+    Two-tier cache of the model providers and model schemas returned by the plugin daemon.
+
+    Entries are cached per process and in redis, keyed by the tenant, the plugin model and a hash of the
+    credentials, and stamped with the plugin version of the tenant read from redis. Installing, upgrading or
+    uninstalling a plugin changes the version, so that all processes fetch them again on their next read.
+    Installations finish asynchronously in the plugin daemon, entries also expire after
+    PLUGIN_MODEL_SCHEMA_CACHE_TTL, which bounds how long a finished installation can go unnoticed.
+    Versions are kept in the process for PLUGIN_MODEL_SCHEMA_VERSION_LOCAL_TTL seconds, so that cached entries
+    are read without a round trip to redis. When redis is unavailable, everything is fetched by the loaders.
+    """
+
+    _lock = threading.Lock()
+    # cache key -> (cached at, value)
+    _entries: LRUCache = LRUCache(maxsize=dify_config.PLUGIN_MODEL_SCHEMA_CACHE_SIZE)
+    # tenant id -> version
+    _versions: TTLCache = TTLCache(
+        maxsize=dify_config.PLUGIN_MODEL_SCHEMA_CACHE_SIZE, ttl=PLUGIN_MODEL_SCHEMA_VERSION_LOCAL_TTL
+    )
+
+    @classmethod
+    def get_model_providers(
+        cls, tenant_id: str, loader: Callable[[], Sequence[PluginModelProviderEntity]]
+    ) -> list[PluginModelProviderEntity]:
+        """
+        Get the model providers of the tenant, loaded by the loader if they are not cached.
+        The returned providers are copies and may be modified.
+        """
+        try:
+            key = cls._cache_key(tenant_id, "providers")
+        except RedisError:
+            logger.warning("Failed to get the plugin model schema version, fetching model providers", exc_info=True)
+            return list(loader())
+        providers = cls._get(
+            key,
+            loader=lambda: list(loader()),
+            dump=_model_providers_adapter.dump_json,
+            load=_model_providers_adapter.validate_json,
+        )
+        return copy.deepcopy(providers)
+
+    @classmethod
+    def get_model_schema(
+        cls,
+        tenant_id: str,
+        plugin_id: str,
+        provider: str,
+        model_type: str,
+        model: str,
+        credentials: dict,
+        loader: Callable[[], Optional[AIModelEntity]],
+    ) -> Optional[AIModelEntity]:
+        """
+        Get the schema of the model, loaded by the loader if it is not cached.
+        Models without a schema are not cached.
+        """
+        try:
+            key = cls._cache_key(
+                tenant_id, "schema", plugin_id, provider, model_type, model, cls._credentials_hash(credentials)
+            )
+        except RedisError:
+            logger.warning("Failed to get the plugin model schema version, fetching model schema", exc_info=True)
+            return loader()
+        schema = cls._get(
+            key,
+            loader=loader,
+            dump=lambda value: value.model_dump_json().encode("utf-8"),
+            load=AIModelEntity.model_validate_json,
+        )
+        return schema.model_copy(deep=True) if schema is not None else None
+
+    @classmethod
+    def invalidate(cls, tenant_id: str) -> None:
+        """
+        Invalidate the cached model providers and schemas of the tenant in all processes.
+        """
+        version = uuid.uuid4().hex
+        with cls._lock:
+            cls._versions[tenant_id] = version
+        try:
+            redis_client.set(cls._version_key(tenant_id), version)
+        except RedisError:
+            logger.warning(f"Failed to invalidate plugin model schemas of tenant {tenant_id}", exc_info=True)
+
+    @classmethod
+    def invalidate_installed(cls, tenant_id: str, task_id: str) -> None:
+        """
+        Invalidate the cached model providers and schemas of the tenant once its installation task succeeded.
+        The status of tasks is polled until they finish, later polls of the same task do not invalidate again.
+        """
+        invalidated_key = f"{PLUGIN_INSTALL_TASK_INVALIDATED_KEY_PREFIX}:{tenant_id}:{task_id}"
+        try:
+            first_success = redis_client.set(invalidated_key, 1, nx=True, ex=86400)
+        except RedisError:
+            first_success = True
+        if first_success:
+            cls.invalidate(tenant_id)
+
+    @classmethod
+    def _get(
+        cls,
+        key: str,
+        loader: Callable[[], Any],
+        dump: Callable[[Any], bytes],
+        load: Callable[[bytes], Any],
+    ) -> Any:
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= dify_config.PLUGIN_MODEL_SCHEMA_CACHE_TTL:
+                return entry[1]
+
+        value = None
+        try:
+            cached = redis_client.get(key)
+        except RedisError:
+            logger.warning(f"Failed to get cached plugin model schema {key}", exc_info=True)
+            cached = None
+        if cached is not None:
+            try:
+                value = load(cached)
+            except Exception:
+                logger.warning(f"Failed to load cached plugin model schema {key}, fetching it again", exc_info=True)
+
+        if value is None:
+            value = loader()
+            if value is None:
+                return None
+            try:
+                redis_client.set(key, dump(value), ex=dify_config.PLUGIN_MODEL_SCHEMA_CACHE_TTL)
+            except RedisError:
+                logger.warning(f"Failed to cache plugin model schema {key}", exc_info=True)
+
+        with cls._lock:
+            cls._entries[key] = (time.monotonic(), value)
+        return value
+
+    @classmethod
+    def _cache_key(cls, tenant_id: str, *parts: str) -> str:
+        # the version is part of the key, entries of older versions are never read again and expire
+        return ":".join((PLUGIN_MODEL_SCHEMA_KEY_PREFIX, tenant_id, cls._get_version(tenant_id), *parts))
+
+    @classmethod
+    def _get_version(cls, tenant_id: str) -> str:
+        with cls._lock:
+            cached_version = cls._versions.get(tenant_id)
+        if cached_version is not None:
+            return str(cached_version)
+
+        version_key = cls._version_key(tenant_id)
+        version = redis_client.get(version_key)
+        if version is None:
+            # the version is random, so entries cached before the key was lost never match again
+            redis_client.set(version_key, uuid.uuid4().hex, nx=True)
+            version = redis_client.get(version_key)
+        version = version.decode("utf-8") if isinstance(version, bytes) else str(version)
+        with cls._lock:
+            cls._versions[tenant_id] = version
+        return version
+
+    @staticmethod
+    def _credentials_hash(credentials: dict) -> str:
+        # keyed by the secret key, credentials can not be guessed from the cache keys
+        data = json.dumps(credentials, sort_keys=True, default=str).encode("utf-8")
+        return hmac.new(dify_config.SECRET_KEY.encode("utf-8"), data, hashlib.sha256).hexdigest()
+
+    @staticmethod
+    def _version_key(tenant_id: str) -> str:
+        return f"{PLUGIN_MODEL_SCHEMA_VERSION_KEY_PREFIX}:{tenant_id}"
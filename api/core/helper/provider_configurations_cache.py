@@ -0,0 +1,65 @@
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from cachetools import LRUCache
+
+from configs import dify_config
+from extensions.ext_redis import redis_client
+
+PROVIDER_CONFIGURATIONS_VERSION_KEY_PREFIX = "provider_configurations_version"
+
+
+class ProviderConfigurationsCache:
+    """
+    Process-local cache of the provider configurations of each tenant.
+
+    Every entry is stamped with the version of the tenant read from redis, so that invalidating a tenant
+    in one process makes all processes rebuild its configurations on their next read. Entries also expire
+    after PROVIDER_CONFIGURATIONS_CACHE_TTL, which bounds how stale quota usage can get.
+    """
+
+    _lock = threading.Lock()
+    # tenant id -> (version, cached at, provider configurations)
+    _entries: LRUCache = LRUCache(maxsize=dify_config.PROVIDER_CONFIGURATIONS_CACHE_SIZE)
+
+    @classmethod
+    def get_version(cls, tenant_id: str) -> str:
+        version_key = cls._version_key(tenant_id)
+        version = redis_client.get(version_key)
+        if version is None:
+            # the version is random, so entries cached before the key was lost never match again
+            redis_client.set(version_key, uuid.uuid4().hex, nx=True)
+            version = redis_client.get(version_key)
+        return version.decode("utf-8") if isinstance(version, bytes) else str(version)
+
+    @classmethod
+    def get(cls, tenant_id: str, version: str) -> Optional[Any]:
+        with cls._lock:
+            entry = cls._entries.get(tenant_id)
+            if (
+                entry is None
+                or entry[0] != version
+                or time.monotonic() - entry[1] > dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL
+            ):
+                return None
+            return entry[2]
+
+    @classmethod
+    def set(cls, tenant_id: str, version: str, provider_configurations: Any) -> None:
+        with cls._lock:
+            cls._entries[tenant_id] = (version, time.monotonic(), provider_configurations)
+
+    @classmethod
+    def invalidate(cls, tenant_id: str) -> None:
+        """
+        Invalidate the cached provider configurations of the tenant in all processes.
+        """
+        redis_client.set(cls._version_key(tenant_id), uuid.uuid4().hex)
+        with cls._lock:
+            cls._entries.pop(tenant_id, None)
+
+    @staticmethod
+    def _version_key(tenant_id: str) -> str:
+        return f"{PROVIDER_CONFIGURATIONS_VERSION_KEY_PREFIX}:{tenant_id}"
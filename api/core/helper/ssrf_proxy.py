@@ -4,10 +4,17 @@ Proxy requests to avoid SSRF
 
 import logging
 import time
+from collections.abc import Generator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from http.cookiejar import CookieJar
+from typing import Optional
 
 import httpx
 
 from configs import dify_config
+from core.helper.fork_safe_singleton import ForkSafeSingleton
 
 SSRF_DEFAULT_MAX_RETRIES = dify_config.SSRF_DEFAULT_MAX_RETRIES
 
@@ -34,7 +41,104 @@ class MaxRetriesExceededError(ValueError):
     pass
 
 
-def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
+_request_cookie_jar: ContextVar[Optional[CookieJar]] = ContextVar("ssrf_proxy_request_cookie_jar", default=None)
+
+
+class _RequestCookieJar(CookieJar):
+    """
+    Cookie jar of the pooled clients that keeps the cookies of the request being made in the current context
+    only, so redirects within one request get the cookies set along the way, while clients shared across
+    tenants never carry cookies from one request to the next.
+    """
+
+    def _request_jar(self) -> CookieJar:
+        jar = _request_cookie_jar.get()
+        # outside of a request, cookies go to a jar that is dropped right away
+        return jar if jar is not None else CookieJar()
+
+    def set_cookie(self, cookie):
+        self._request_jar().set_cookie(cookie)
+
+    def extract_cookies(self, response, request):
+        self._request_jar().extract_cookies(response, request)
+
+    def add_cookie_header(self, request):
+        self._request_jar().add_cookie_header(request)
+
+    def clear(self, domain=None, path=None, name=None):
+        self._request_jar().clear(domain, path, name)
+
+    def clear_session_cookies(self):
+        self._request_jar().clear_session_cookies()
+
+    def clear_expired_cookies(self):
+        self._request_jar().clear_expired_cookies()
+
+    def __iter__(self):
+        return iter(self._request_jar())
+
+    def __len__(self):
+        return len(self._request_jar())
+
+
+@contextmanager
+def _request_cookies() -> Generator[None, None, None]:
+    token = _request_cookie_jar.set(CookieJar())
+    try:
+        yield
+    finally:
+        _request_cookie_jar.reset(token)
+
+
+def _build_client(ssl_verify: bool) -> httpx.Client:
+    limits = httpx.Limits(
+        max_connections=dify_config.SSRF_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=dify_config.SSRF_POOL_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=dify_config.SSRF_POOL_KEEPALIVE_EXPIRY,
+    )
+    http2 = dify_config.SSRF_POOL_HTTP2_ENABLED
+    cookies = _RequestCookieJar()
+    if dify_config.SSRF_PROXY_ALL_URL:
+        return httpx.Client(
+            proxy=dify_config.SSRF_PROXY_ALL_URL, verify=ssl_verify, limits=limits, http2=http2, cookies=cookies
+        )
+    elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
+        proxy_mounts: dict[str, httpx.BaseTransport | None] = {
+            "http://": httpx.HTTPTransport(
+                proxy=dify_config.SSRF_PROXY_HTTP_URL, verify=ssl_verify, limits=limits, http2=http2
+            ),
+            "https://": httpx.HTTPTransport(
+                proxy=dify_config.SSRF_PROXY_HTTPS_URL, verify=ssl_verify, limits=limits, http2=http2
+            ),
+        }
+        return httpx.Client(mounts=proxy_mounts, verify=ssl_verify, limits=limits, http2=http2, cookies=cookies)
+    else:
+        return httpx.Client(verify=ssl_verify, limits=limits, http2=http2, cookies=cookies)
+
+
+# connections of the parent process must not be shared with forked workers
+_clients: dict[bool, ForkSafeSingleton[httpx.Client]] = {
+    ssl_verify: ForkSafeSingleton(partial(_build_client, ssl_verify)) for ssl_verify in (True, False)
+}
+
+
+def get_client(ssl_verify: bool = HTTP_REQUEST_NODE_SSL_VERIFY) -> httpx.Client:
+    """
+    Get the process-wide pooled client for the given ssl verification mode.
+    The proxy mode is fixed by the configuration, so the client is keyed by ssl_verify only.
+    """
+    return _clients[bool(ssl_verify)].get()
+
+
+def close_clients() -> None:
+    """Close and drop all pooled clients."""
+    for singleton in _clients.values():
+        client = singleton.pop()
+        if client is not None:
+            client.close()
+
+
+def _prepare_request_kwargs(kwargs: dict) -> bool:
     if "allow_redirects" in kwargs:
         allow_redirects = kwargs.pop("allow_redirects")
         if "follow_redirects" not in kwargs:
@@ -51,28 +155,46 @@ def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
     if "ssl_verify" not in kwargs:
         kwargs["ssl_verify"] = HTTP_REQUEST_NODE_SSL_VERIFY
 
-    ssl_verify = kwargs.pop("ssl_verify")
+    return bool(kwargs.pop("ssl_verify"))
+
+
+def make_request(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs):
+    return _send_request(method, url, max_retries=max_retries, stream=False, **kwargs)
+
+
+@contextmanager
+def stream(method, url, max_retries=SSRF_DEFAULT_MAX_RETRIES, **kwargs) -> Generator[httpx.Response, None, None]:
+    """
+    Make a request and yield its response before its body is read, to be read with `iter_bytes`.
+    The request is retried like with `make_request` until the response headers are received, and the response
+    is closed when the context exits.
+    """
+    response = _send_request(method, url, max_retries=max_retries, stream=True, **kwargs)
+    try:
+        yield response
+    finally:
+        response.close()
+
+
+def _send_request(method, url, max_retries: int, stream: bool, **kwargs) -> httpx.Response:
+    ssl_verify = _prepare_request_kwargs(kwargs)
+    client = get_client(ssl_verify)
+    follow_redirects = kwargs.pop("follow_redirects", httpx.USE_CLIENT_DEFAULT)
 
     retries = 0
     while retries <= max_retries:
         try:
-            if dify_config.SSRF_PROXY_ALL_URL:
-                with httpx.Client(proxy=dify_config.SSRF_PROXY_ALL_URL, verify=ssl_verify) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            elif dify_config.SSRF_PROXY_HTTP_URL and dify_config.SSRF_PROXY_HTTPS_URL:
-                proxy_mounts = {
-                    "http://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTP_URL, verify=ssl_verify),
-                    "https://": httpx.HTTPTransport(proxy=dify_config.SSRF_PROXY_HTTPS_URL, verify=ssl_verify),
-                }
-                with httpx.Client(mounts=proxy_mounts, verify=ssl_verify) as client:
-                    response = client.request(method=method, url=url, **kwargs)
-            else:
-                with httpx.Client(verify=ssl_verify) as client:
-                    response = client.request(method=method, url=url, **kwargs)
+            with _request_cookies():
+                if stream:
+                    request = client.build_request(method=method, url=url, **kwargs)
+                    response = client.send(request, stream=True, follow_redirects=follow_redirects)
+                else:
+                    response = client.request(method=method, url=url, follow_redirects=follow_redirects, **kwargs)
 
             if response.status_code not in STATUS_FORCELIST:
                 return response
             else:
+                response.close()
                 logging.warning(f"Received status code {response.status_code} for URL {url} which is in the force list")
 
         except httpx.RequestError as e:
@@ -0,0 +1,184 @@
+import logging
+import threading
+from collections import Counter, OrderedDict, deque
+from collections.abc import Callable, Generator
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_IDLE_TIMEOUT = 60.0
+
+
+class _Task:
+    __slots__ = ("args", "blocked", "fn", "future", "group", "kwargs")
+
+    def __init__(self, group: "TaskGroup", fn: Callable, args: tuple, kwargs: dict[str, Any]) -> None:
+        self.group = group
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.blocked = False
+
+
+class TaskGroup:
+    """
+    Tasks of one caller on a shared scheduler, like a workflow run or the searches of a retrieval.
+    At most `max_workers` tasks of the group run at the same time.
+    """
+
+    def __init__(self, tenant_id: str, max_workers: int, scheduler: "TaskScheduler") -> None:
+        self.tenant_id = tenant_id
+        self.max_workers = max_workers
+        self.scheduler = scheduler
+        self.running = 0
+        self.pending: deque[_Task] = deque()
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        return self.scheduler.submit(self, fn, *args, **kwargs)
+
+
+class TaskScheduler:
+    """
+    Worker pool shared by task groups.
+
+    Pending tasks are queued per task group and dispatched round-robin across groups, so a group with many
+    tasks can not starve the others. The number of running tasks is limited globally by `max_workers` and per
+    tenant by `max_workers_per_tenant`. Workers are started on demand and stop after being idle for a while.
+
+    A task that waits for tasks it submitted itself (nested parallel branches, parallel iterations, nested
+    searches) does so inside `blocking()`, which hands its slot over to other tasks until it resumes. Blocked
+    tasks do not count towards the limits, and a task leaving `blocking()` takes its slot back right away even
+    when the limits are reached by then: waiting for a slot could deadlock with the tasks holding the others, or
+    outlast the deadline of a caller whose timed out tasks still run. The limits can therefore be exceeded by
+    one task per resumed blocked task, and no pending task starts until the running tasks are within them again.
+    """
+
+    def __init__(self, max_workers: int, max_workers_per_tenant: int = 0, thread_name_prefix: str = "Task") -> None:
+        self._max_workers = max_workers
+        self._max_workers_per_tenant = max_workers_per_tenant
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        # task groups with pending tasks, in dispatch order
+        self._pending_groups: OrderedDict[int, TaskGroup] = OrderedDict()
+        self._pending_count = 0
+        self._running_count = 0
+        self._running_by_tenant: Counter[str] = Counter()
+        self._worker_count = 0
+        self._idle_worker_count = 0
+        self._thread_name_prefix = thread_name_prefix
+
+    def submit(self, group: TaskGroup, fn: Callable, /, *args, **kwargs) -> Future:
+        task = _Task(group, fn, args, kwargs)
+        with self._condition:
+            group.pending.append(task)
+            self._pending_groups.setdefault(id(group), group)
+            self._pending_count += 1
+            self._dispatch()
+        return task.future
+
+    @contextmanager
+    def blocking(self) -> Generator[None, None, None]:
+        """
+        Release the slot of the current task while it waits for other tasks of the scheduler.
+        Outside of a scheduler task this is a no-op.
+        """
+        task: Optional[_Task] = getattr(self._local, "task", None)
+        if task is None or task.blocked:
+            yield
+            return
+
+        with self._condition:
+            self._release(task.group)
+            task.blocked = True
+            self._dispatch()
+        try:
+            yield
+        finally:
+            # take the slot back right away, even over the limits, waiting for it could deadlock
+            with self._condition:
+                task.blocked = False
+                self._acquire(task.group)
+
+    def _has_capacity(self, group: TaskGroup) -> bool:
+        if group.running >= group.max_workers:
+            return False
+        if self._max_workers_per_tenant and self._running_by_tenant[group.tenant_id] >= self._max_workers_per_tenant:
+            return False
+        return True
+
+    def _acquire(self, group: TaskGroup) -> None:
+        self._running_count += 1
+        self._running_by_tenant[group.tenant_id] += 1
+        group.running += 1
+
+    def _release(self, group: TaskGroup) -> None:
+        self._running_count -= 1
+        self._running_by_tenant[group.tenant_id] -= 1
+        if self._running_by_tenant[group.tenant_id] <= 0:
+            del self._running_by_tenant[group.tenant_id]
+        group.running -= 1
+
+    def _take_task(self) -> Optional[_Task]:
+        if self._running_count >= self._max_workers:
+            return None
+        for group_key, group in self._pending_groups.items():
+            if not self._has_capacity(group):
+                continue
+            task = group.pending.popleft()
+            if group.pending:
+                self._pending_groups.move_to_end(group_key)
+            else:
+                del self._pending_groups[group_key]
+            self._pending_count -= 1
+            self._acquire(group)
+            return task
+        return None
+
+    def _dispatch(self) -> None:
+        if not self._pending_count or self._running_count >= self._max_workers:
+            return
+        if self._idle_worker_count:
+            self._condition.notify()
+            return
+        self._worker_count += 1
+        self._idle_worker_count += 1
+        threading.Thread(
+            target=self._work, name=f"{self._thread_name_prefix}Worker-{self._worker_count}", daemon=True
+        ).start()
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                task = self._take_task()
+                while task is None:
+                    notified = self._condition.wait(timeout=WORKER_IDLE_TIMEOUT)
+                    task = self._take_task()
+                    if task is None and not notified:
+                        self._idle_worker_count -= 1
+                        self._worker_count -= 1
+                        return
+                self._idle_worker_count -= 1
+                # wake up another worker if more tasks can run
+                self._dispatch()
+
+            self._run(task)
+
+            with self._condition:
+                self._release(task.group)
+                self._idle_worker_count += 1
+
+    def _run(self, task: _Task) -> None:
+        if not task.future.set_running_or_notify_cancel():
+            return
+        self._local.task = task
+        try:
+            result = task.fn(*task.args, **task.kwargs)
+        except BaseException as e:
+            task.future.set_exception(e)
+        else:
+            task.future.set_result(result)
+        finally:
+            self._local.task = None
@@ -542,7 +542,7 @@ class IndexingRunner:
             )
             create_keyword_thread.start()
 
-        max_workers = 10
+        max_workers = dify_config.INDEXING_MAX_WORKERS
         if dataset.indexing_technique == "high_quality":
             with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
                 futures = []
@@ -555,18 +555,20 @@ class IndexingRunner:
                     hash = helper.generate_text_hash(document.page_content)
                     group_index = int(hash, 16) % max_workers
                     document_groups[group_index].append(document)
-                for chunk_documents in document_groups:
-                    if len(chunk_documents) == 0:
+                stop_event = threading.Event()
+                for group_documents in document_groups:
+                    if len(group_documents) == 0:
                         continue
                     futures.append(
                         executor.submit(
-                            self._process_chunk,
+                            self._process_document_group,
                             current_app._get_current_object(),  # type: ignore
                             index_processor,
-                            chunk_documents,
+                            group_documents,
                             dataset,
                             dataset_document,
                             embedding_model_instance,
+                            stop_event,
                         )
                     )
 
@@ -613,6 +615,40 @@ class IndexingRunner:
 
                 db.session.commit()
 
+    def _process_document_group(
+        self,
+        flask_app,
+        index_processor,
+        group_documents,
+        dataset,
+        dataset_document,
+        embedding_model_instance,
+        stop_event: threading.Event,
+    ) -> int:
+        """
+        Load a group of documents in batches of INDEXING_LOAD_BATCH_SIZE, so that segments become
+        searchable batch by batch instead of once the whole group is loaded.
+        """
+        batch_size = dify_config.INDEXING_LOAD_BATCH_SIZE
+        tokens = 0
+        for i in range(0, len(group_documents), batch_size):
+            # stop early when another group failed, its error is raised by the caller
+            if stop_event.is_set():
+                break
+            try:
+                tokens += self._process_chunk(
+                    flask_app,
+                    index_processor,
+                    group_documents[i : i + batch_size],
+                    dataset,
+                    dataset_document,
+                    embedding_model_instance,
+                )
+            except Exception:
+                stop_event.set()
+                raise
+        return tokens
+
     def _process_chunk(
         self, flask_app, index_processor, chunk_documents, dataset, dataset_document, embedding_model_instance
     ):
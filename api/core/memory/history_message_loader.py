@@ -0,0 +1,214 @@
+import logging
+from collections import defaultdict
+from collections.abc import Sequence
+from typing import Any, Optional
+
+from pydantic import BaseModel, Field
+from redis import RedisError
+
+from configs import dify_config
+from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
+from core.file import FileBelongsTo, FileUploadConfig
+from core.prompt.utils.extract_thread_messages import extract_thread_messages
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.model import AppMode, Conversation, Message, MessageFile
+from models.workflow import Workflow, WorkflowRun
+
+logger = logging.getLogger(__name__)
+
+MEMORY_SNAPSHOT_CACHE_KEY_PREFIX = "memory_snapshot"
+
+
+class HistoryMessageFile(BaseModel):
+    """
+    File sent by the user with a history message.
+    """
+
+    id: str
+    type: str
+    transfer_method: str
+    url: Optional[str] = None
+    upload_file_id: Optional[str] = None
+
+    def to_mapping(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "type": self.type,
+            "transfer_method": self.transfer_method,
+            "url": self.url,
+            "upload_file_id": self.upload_file_id,
+        }
+
+
+class HistoryMessage(BaseModel):
+    """
+    Message of the conversation thread used to build memory.
+    """
+
+    id: str
+    query: str
+    answer: str
+    files: list[HistoryMessageFile] = Field(default_factory=list)
+    file_upload_config: Optional[FileUploadConfig] = None
+
+
+class MemorySnapshot(BaseModel):
+    messages: list[HistoryMessage]
+
+
+class HistoryMessageLoader:
+    """
+    Load the messages of the current conversation thread, oldest first, with their files and file upload config.
+
+    Files of all messages are fetched with one query and the file upload config is resolved once per
+    distinct workflow. When MEMORY_SNAPSHOT_CACHE_ENABLED is set, the loaded messages are cached in redis
+    until the messages of the conversation change, and loaded from the database while redis is unavailable.
+    """
+
+    def __init__(self, conversation: Conversation) -> None:
+        self.conversation = conversation
+
+    def load(self, message_limit: int) -> list[HistoryMessage]:
+        if not dify_config.MEMORY_SNAPSHOT_CACHE_ENABLED:
+            return self._load_from_db(message_limit)
+
+        cache_key = self._cache_key(self.conversation.id)
+        try:
+            snapshot = redis_client.hget(cache_key, str(message_limit))
+        except RedisError:
+            logger.warning("Failed to get the memory snapshot, loading history messages", exc_info=True)
+            return self._load_from_db(message_limit)
+        if snapshot:
+            return MemorySnapshot.model_validate_json(snapshot).messages
+
+        messages = self._load_from_db(message_limit)
+        try:
+            redis_client.hset(cache_key, str(message_limit), MemorySnapshot(messages=messages).model_dump_json())
+            redis_client.expire(cache_key, dify_config.MEMORY_SNAPSHOT_CACHE_TTL)
+        except RedisError:
+            logger.warning("Failed to save the memory snapshot", exc_info=True)
+        return messages
+
+    @classmethod
+    def invalidate(cls, conversation_id: str) -> None:
+        """
+        Drop the cached messages of the conversation, to be called whenever its messages change.
+        """
+        if not dify_config.MEMORY_SNAPSHOT_CACHE_ENABLED:
+            return
+
+        try:
+            redis_client.delete(cls._cache_key(conversation_id))
+        except RedisError:
+            logger.warning(f"Failed to invalidate the memory snapshot of conversation {conversation_id}", exc_info=True)
+
+    @staticmethod
+    def _cache_key(conversation_id: str) -> str:
+        return f"{MEMORY_SNAPSHOT_CACHE_KEY_PREFIX}:{conversation_id}"
+
+    def _load_from_db(self, message_limit: int) -> list[HistoryMessage]:
+        # fetch limited messages, and return reversed
+        messages = (
+            db.session.query(
+                Message.id,
+                Message.query,
+                Message.answer,
+                Message.created_at,
+                Message.workflow_run_id,
+                Message.parent_message_id,
+                Message.answer_tokens,
+            )
+            .filter(
+                Message.conversation_id == self.conversation.id,
+            )
+            .order_by(Message.created_at.desc())
+            .limit(message_limit)
+            .all()
+        )
+
+        # instead of all messages from the conversation, we only need to extract messages
+        # that belong to the thread of last message
+        thread_messages = extract_thread_messages(messages)
+
+        # for newly created message, its answer is temporarily empty, we don't need to add it to memory
+        if thread_messages and not thread_messages[0].answer and thread_messages[0].answer_tokens == 0:
+            thread_messages.pop(0)
+
+        thread_messages = list(reversed(thread_messages))
+        if not thread_messages:
+            return []
+
+        message_files = self._get_message_files([message.id for message in thread_messages])
+        file_upload_configs = self._get_file_upload_configs(
+            [message for message in thread_messages if message.id in message_files]
+        )
+
+        return [
+            HistoryMessage(
+                id=message.id,
+                query=message.query,
+                answer=message.answer,
+                files=message_files.get(message.id, []),
+                file_upload_config=file_upload_configs.get(message.id),
+            )
+            for message in thread_messages
+        ]
+
+    @staticmethod
+    def _get_message_files(message_ids: Sequence[str]) -> dict[str, list[HistoryMessageFile]]:
+        message_files: dict[str, list[HistoryMessageFile]] = defaultdict(list)
+        files = db.session.query(MessageFile).filter(MessageFile.message_id.in_(message_ids)).all()
+        for file in files:
+            # files generated by the assistant are not sent back to the model
+            if file.belongs_to == FileBelongsTo.ASSISTANT:
+                continue
+            message_files[file.message_id].append(
+                HistoryMessageFile(
+                    id=file.id,
+                    type=file.type,
+                    transfer_method=file.transfer_method,
+                    url=file.url,
+                    upload_file_id=file.upload_file_id,
+                )
+            )
+        return message_files
+
+    def _get_file_upload_configs(self, messages: Sequence[Any]) -> dict[str, Optional[FileUploadConfig]]:
+        """
+        Resolve the file upload config of each message that has files.
+        """
+        if not messages:
+            return {}
+
+        if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
+            file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
+            return {message.id: file_extra_config for message in messages}
+
+        workflow_run_ids = {message.workflow_run_id for message in messages if message.workflow_run_id}
+        if not workflow_run_ids:
+            return {}
+
+        workflow_ids_by_run_id: dict[str, str] = dict(
+            db.session.query(WorkflowRun.id, WorkflowRun.workflow_id)
+            .filter(WorkflowRun.id.in_(workflow_run_ids))
+            .tuples()
+            .all()
+        )
+        workflows = (
+            db.session.query(Workflow).filter(Workflow.id.in_(set(workflow_ids_by_run_id.values()))).all()
+            if workflow_ids_by_run_id
+            else []
+        )
+        file_upload_configs_by_workflow_id = {
+            workflow.id: FileUploadConfigManager.convert(workflow.features_dict, is_vision=False)
+            for workflow in workflows
+        }
+
+        file_upload_configs: dict[str, Optional[FileUploadConfig]] = {}
+        for message in messages:
+            workflow_id = workflow_ids_by_run_id.get(message.workflow_run_id) if message.workflow_run_id else None
+            file_upload_configs[message.id] = (
+                file_upload_configs_by_workflow_id.get(workflow_id) if workflow_id else None
+            )
+        return file_upload_configs
@@ -1,8 +1,11 @@
-from collections.abc import Sequence
+import logging
+from collections.abc import Mapping, Sequence
 from typing import Optional
 
-from core.app.app_config.features.file_upload.manager import FileUploadConfigManager
+from redis import RedisError
+
 from core.file import file_manager
+from core.memory.history_message_loader import HistoryMessageLoader
 from core.model_manager import ModelInstance
 from core.model_runtime.entities import (
     AssistantPromptMessage,
@@ -13,11 +16,14 @@ from core.model_runtime.entities import (
     UserPromptMessage,
 )
 from core.model_runtime.entities.message_entities import PromptMessageContentUnionTypes
-from core.prompt.utils.extract_thread_messages import extract_thread_messages
-from extensions.ext_database import db
+from extensions.ext_redis import redis_client
 from factories import file_factory
-from models.model import AppMode, Conversation, Message, MessageFile
-from models.workflow import WorkflowRun
+from models.model import Conversation
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_TOKENS_CACHE_KEY_PREFIX = "memory_message_tokens"
+MESSAGE_TOKENS_CACHE_TTL = 86400
 
 
 class TokenBufferMemory:
@@ -35,63 +41,30 @@ class TokenBufferMemory:
         """
         app_record = self.conversation.app
 
-        # fetch limited messages, and return reversed
-        query = (
-            db.session.query(
-                Message.id,
-                Message.query,
-                Message.answer,
-                Message.created_at,
-                Message.workflow_run_id,
-                Message.parent_message_id,
-                Message.answer_tokens,
-            )
-            .filter(
-                Message.conversation_id == self.conversation.id,
-            )
-            .order_by(Message.created_at.desc())
-        )
-
         if message_limit and message_limit > 0:
             message_limit = min(message_limit, 500)
         else:
             message_limit = 500
 
-        messages = query.limit(message_limit).all()
-
-        # instead of all messages from the conversation, we only need to extract messages
-        # that belong to the thread of last message
-        thread_messages = extract_thread_messages(messages)
-
-        # for newly created message, its answer is temporarily empty, we don't need to add it to memory
-        if thread_messages and not thread_messages[0].answer and thread_messages[0].answer_tokens == 0:
-            thread_messages.pop(0)
-
-        messages = list(reversed(thread_messages))
+        messages = HistoryMessageLoader(self.conversation).load(message_limit)
 
         prompt_messages: list[PromptMessage] = []
+        # (message id, role) of each prompt message, used to cache per-message token counts
+        prompt_message_keys: list[tuple[str, str]] = []
         for message in messages:
-            files = db.session.query(MessageFile).filter(MessageFile.message_id == message.id).all()
-            if files:
-                file_extra_config = None
-                if self.conversation.mode not in {AppMode.ADVANCED_CHAT, AppMode.WORKFLOW}:
-                    file_extra_config = FileUploadConfigManager.convert(self.conversation.model_config)
-                else:
-                    if message.workflow_run_id:
-                        workflow_run = (
-                            db.session.query(WorkflowRun).filter(WorkflowRun.id == message.workflow_run_id).first()
-                        )
-
-                        if workflow_run and workflow_run.workflow:
-                            file_extra_config = FileUploadConfigManager.convert(
-                                workflow_run.workflow.features_dict, is_vision=False
-                            )
+            prompt_message_keys.append((message.id, PromptMessageRole.USER.value))
+            prompt_message_keys.append((message.id, PromptMessageRole.ASSISTANT.value))
+            if message.files:
+                file_extra_config = message.file_upload_config
 
                 detail = ImagePromptMessageContent.DETAIL.LOW
                 if file_extra_config and app_record:
-                    file_objs = file_factory.build_from_message_files(
-                        message_files=files, tenant_id=app_record.tenant_id, config=file_extra_config
-                    )
+                    file_objs = [
+                        file_factory.build_from_mapping(
+                            mapping=file.to_mapping(), tenant_id=app_record.tenant_id, config=file_extra_config
+                        )
+                        for file in message.files
+                    ]
                     if file_extra_config.image_config and file_extra_config.image_config.detail:
                         detail = file_extra_config.image_config.detail
                 else:
@@ -122,14 +95,90 @@ class TokenBufferMemory:
         # prune the chat message if it exceeds the max token limit
         curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
 
-        if curr_message_tokens > max_token_limit:
-            pruned_memory = []
-            while curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
-                pruned_memory.append(prompt_messages.pop(0))
-                curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages)
+        if curr_message_tokens > max_token_limit and len(prompt_messages) > 1:
+            prompt_messages = self._prune_prompt_messages(
+                prompt_messages, prompt_message_keys, curr_message_tokens, max_token_limit
+            )
 
         return prompt_messages
 
+    def _prune_prompt_messages(
+        self,
+        prompt_messages: list[PromptMessage],
+        prompt_message_keys: Sequence[tuple[str, str]],
+        curr_message_tokens: int,
+        max_token_limit: int,
+    ) -> list[PromptMessage]:
+        """
+        Drop the oldest prompt messages until the rest fits in the token limit.
+
+        Dropping a message the first time counts the remaining messages, like dropping them one by one would,
+        and the difference is cached in redis per message and model as the share of the message in the prompt.
+        Cached shares let later turns skip over the messages that were dropped before, with the result counted
+        again to correct the estimate.
+        """
+        cache_keys = [
+            f"{MESSAGE_TOKENS_CACHE_KEY_PREFIX}:{self.model_instance.provider}:{self.model_instance.model}"
+            f":{message_id}:{role}"
+            for message_id, role in prompt_message_keys
+        ]
+        cached_counts = self._get_cached_message_tokens(cache_keys)
+
+        new_counts: dict[str, int] = {}
+        estimated = False
+        start = 0
+        while curr_message_tokens > max_token_limit and start < len(prompt_messages) - 1:
+            cached_count = cached_counts[start]
+            if cached_count is not None:
+                curr_message_tokens -= cached_count
+                estimated = True
+            else:
+                message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages[start + 1 :])
+                new_counts[cache_keys[start]] = curr_message_tokens - message_tokens
+                curr_message_tokens = message_tokens
+            start += 1
+        self._set_cached_message_tokens(new_counts)
+
+        if estimated:
+            # the estimate may be off either way, drop more messages or add dropped ones back as needed
+            curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages[start:])
+            if curr_message_tokens > max_token_limit:
+                while curr_message_tokens > max_token_limit and start < len(prompt_messages) - 1:
+                    start += 1
+                    curr_message_tokens = self.model_instance.get_llm_num_tokens(prompt_messages[start:])
+            else:
+                while (
+                    start > 0
+                    and self.model_instance.get_llm_num_tokens(prompt_messages[start - 1 :]) <= max_token_limit
+                ):
+                    start -= 1
+
+        return prompt_messages[start:]
+
+    @staticmethod
+    def _get_cached_message_tokens(cache_keys: Sequence[str]) -> list[Optional[int]]:
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for cache_key in cache_keys:
+                pipeline.get(cache_key)
+            cached_counts = pipeline.execute()
+        except RedisError:
+            logger.warning("Failed to get cached message token counts", exc_info=True)
+            return [None] * len(cache_keys)
+        return [int(cached_count) if cached_count is not None else None for cached_count in cached_counts]
+
+    @staticmethod
+    def _set_cached_message_tokens(counts: Mapping[str, int]) -> None:
+        if not counts:
+            return
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for cache_key, num_tokens in counts.items():
+                pipeline.setex(cache_key, MESSAGE_TOKENS_CACHE_TTL, num_tokens)
+            pipeline.execute()
+        except RedisError:
+            logger.warning("Failed to cache message token counts", exc_info=True)
+
     def get_history_prompt_text(
         self,
         human_prefix: str = "Human",
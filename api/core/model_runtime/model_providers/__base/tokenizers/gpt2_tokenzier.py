@@ -1,12 +1,45 @@
+import hashlib
 import logging
+import multiprocessing
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
 from threading import Lock
-from typing import Any
+from typing import Any, Optional
+
+from cachetools import LRUCache
+
+from configs import dify_config
+from core.helper.fork_safe_singleton import ForkSafeSingleton
 
 logger = logging.getLogger(__name__)
 
 _tokenizer: Any = None
 _lock = Lock()
 
+# content hash -> number of tokens
+_num_tokens_cache: LRUCache = LRUCache(maxsize=dify_config.GPT2_TOKENIZER_CACHE_SIZE or 1)
+_num_tokens_cache_lock = Lock()
+
+# worker processes of the parent do not belong to forked children
+_process_pool = ForkSafeSingleton(
+    lambda: ProcessPoolExecutor(
+        max_workers=dify_config.GPT2_TOKENIZER_PROCESS_POOL_WORKERS,
+        # spawn, forking a process running threads is not safe
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+)
+
+
+def _count_tokens_of_texts(texts: Sequence[str]) -> list[int]:
+    """
+    Count the tokens of each text, run in the process pool for large batches.
+    """
+    encoder = GPT2Tokenizer.get_encoder()
+    if hasattr(encoder, "encode_batch"):
+        # tiktoken encodes batches on its own threads without holding the GIL
+        return [len(tokens) for tokens in encoder.encode_batch(list(texts))]
+    return [len(encoder.encode(text)) for text in texts]
+
 
 class GPT2Tokenizer:
     @staticmethod
@@ -25,7 +58,75 @@ class GPT2Tokenizer:
         # future = _executor.submit(GPT2Tokenizer._get_num_tokens_by_gpt2, text)
         # result = future.result()
         # return cast(int, result)
-        return GPT2Tokenizer._get_num_tokens_by_gpt2(text)
+        if not dify_config.GPT2_TOKENIZER_CACHE_SIZE:
+            return GPT2Tokenizer._get_num_tokens_by_gpt2(text)
+
+        key = GPT2Tokenizer._cache_key(text)
+        with _num_tokens_cache_lock:
+            num_tokens = _num_tokens_cache.get(key)
+        if num_tokens is None:
+            num_tokens = GPT2Tokenizer._get_num_tokens_by_gpt2(text)
+            with _num_tokens_cache_lock:
+                _num_tokens_cache[key] = num_tokens
+        return num_tokens
+
+    @staticmethod
+    def get_num_tokens_batch(texts: Sequence[str]) -> list[int]:
+        """
+        Get the number of tokens of each text.
+
+        Counts are cached by content. Texts that are not cached are encoded in one batch, in the process pool
+        if GPT2_TOKENIZER_PROCESS_POOL_WORKERS is set and they hold at least GPT2_TOKENIZER_PROCESS_POOL_MIN_CHARS
+        characters.
+        """
+        if not texts:
+            return []
+
+        cache_enabled = bool(dify_config.GPT2_TOKENIZER_CACHE_SIZE)
+        keys = [GPT2Tokenizer._cache_key(text) for text in texts] if cache_enabled else []
+        results: list[Optional[int]] = [None] * len(texts)
+        if cache_enabled:
+            with _num_tokens_cache_lock:
+                for i, key in enumerate(keys):
+                    results[i] = _num_tokens_cache.get(key)
+
+        # the same text may appear several times in a batch, encode it once
+        missing: dict[str, list[int]] = {}
+        for i, num_tokens in enumerate(results):
+            if num_tokens is None:
+                missing.setdefault(texts[i], []).append(i)
+        if missing:
+            missing_texts = list(missing)
+            for text, num_tokens in zip(missing_texts, GPT2Tokenizer._count_tokens(missing_texts)):
+                for i in missing[text]:
+                    results[i] = num_tokens
+            if cache_enabled:
+                with _num_tokens_cache_lock:
+                    for indexes in missing.values():
+                        _num_tokens_cache[keys[indexes[0]]] = results[indexes[0]]
+
+        return [num_tokens or 0 for num_tokens in results]
+
+    @staticmethod
+    def _count_tokens(texts: list[str]) -> list[int]:
+        workers = dify_config.GPT2_TOKENIZER_PROCESS_POOL_WORKERS
+        if workers < 1 or len(texts) < 2 or sum(map(len, texts)) < dify_config.GPT2_TOKENIZER_PROCESS_POOL_MIN_CHARS:
+            return _count_tokens_of_texts(texts)
+
+        chunk_size = -(-len(texts) // workers)
+        chunks = [texts[i : i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        results: list[int] = []
+        for chunk_results in GPT2Tokenizer._get_process_pool().map(_count_tokens_of_texts, chunks):
+            results.extend(chunk_results)
+        return results
+
+    @staticmethod
+    def _get_process_pool() -> ProcessPoolExecutor:
+        return _process_pool.get()
+
+    @staticmethod
+    def _cache_key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8", errors="surrogatepass"), digest_size=16).digest()
 
     @staticmethod
     def get_encoder() -> Any:
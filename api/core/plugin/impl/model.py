@@ -2,6 +2,8 @@ import binascii
 from collections.abc import Generator, Sequence
 from typing import IO, Optional
 
+from configs import dify_config
+from core.helper.plugin_model_schema_cache import PluginModelSchemaCache
 from core.model_runtime.entities.llm_entities import LLMResultChunk
 from core.model_runtime.entities.message_entities import PromptMessage, PromptMessageTool
 from core.model_runtime.entities.model_entities import AIModelEntity
@@ -26,6 +28,13 @@ class PluginModelClient(BasePluginClient):
         """
         Fetch model providers for the given tenant.
         """
+        if dify_config.PLUGIN_MODEL_SCHEMA_CACHE_ENABLED:
+            return PluginModelSchemaCache.get_model_providers(
+                tenant_id, loader=lambda: self._fetch_model_providers(tenant_id)
+            )
+        return self._fetch_model_providers(tenant_id)
+
+    def _fetch_model_providers(self, tenant_id: str) -> Sequence[PluginModelProviderEntity]:
         response = self._request_with_plugin_daemon_response(
             "GET",
             f"plugin/{tenant_id}/management/models",
@@ -47,6 +56,30 @@ class PluginModelClient(BasePluginClient):
         """
         Get model schema
         """
+        if dify_config.PLUGIN_MODEL_SCHEMA_CACHE_ENABLED:
+            return PluginModelSchemaCache.get_model_schema(
+                tenant_id,
+                plugin_id,
+                provider,
+                model_type,
+                model,
+                credentials,
+                loader=lambda: self._get_model_schema(
+                    tenant_id, user_id, plugin_id, provider, model_type, model, credentials
+                ),
+            )
+        return self._get_model_schema(tenant_id, user_id, plugin_id, provider, model_type, model, credentials)
+
+    def _get_model_schema(
+        self,
+        tenant_id: str,
+        user_id: str,
+        plugin_id: str,
+        provider: str,
+        model_type: str,
+        model: str,
+        credentials: dict,
+    ) -> AIModelEntity | None:
         response = self._request_with_plugin_daemon_response_stream(
             "POST",
             f"plugin/{tenant_id}/dispatch/model/schema",
@@ -24,6 +24,7 @@ from core.entities.provider_entities import (
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
 from core.helper.position_helper import is_filtered
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
     ConfigurateMethod,
@@ -56,6 +57,8 @@ class ProviderManager:
     def __init__(self) -> None:
         self.decoding_rsa_key = None
         self.decoding_cipher_rsa = None
+        # version of the provider configurations of the tenant, stamped on credentials cached in the process
+        self.credentials_version: Optional[str] = None
 
     def get_configurations(self, tenant_id: str) -> ProviderConfigurations:
         """
@@ -94,6 +97,29 @@ class ProviderManager:
         :param tenant_id:
         :return:
         """
+        if not dify_config.PROVIDER_CONFIGURATIONS_CACHE_ENABLED:
+            version = (
+                ProviderConfigurationsCache.get_version(tenant_id)
+                if dify_config.PROVIDER_CREDENTIALS_LOCAL_CACHE_SIZE
+                else None
+            )
+            return self._build_configurations(tenant_id, version)
+
+        # read the version before building, so that an invalidation during the build is not lost
+        version = ProviderConfigurationsCache.get_version(tenant_id)
+        cached_provider_configurations = ProviderConfigurationsCache.get(tenant_id, version)
+        if cached_provider_configurations is None:
+            cached_provider_configurations = self._build_configurations(tenant_id, version)
+            ProviderConfigurationsCache.set(tenant_id, version, cached_provider_configurations)
+
+        # callers may add or replace configurations, do not share the mapping with the cache
+        provider_configurations = ProviderConfigurations(tenant_id=tenant_id)
+        provider_configurations.configurations.update(cached_provider_configurations.configurations)
+        return provider_configurations
+
+    def _build_configurations(self, tenant_id: str, version: Optional[str] = None) -> ProviderConfigurations:
+        self.credentials_version = version
+
         # Get all provider records of the workspace
         provider_name_to_provider_records_dict = self._get_all_providers(tenant_id)
 
@@ -601,6 +627,7 @@ class ProviderManager:
                 tenant_id=tenant_id,
                 identity_id=custom_provider_record.id,
                 cache_type=ProviderCredentialsCacheType.PROVIDER,
+                version=self.credentials_version,
             )
 
             # Get cached provider credentials
@@ -654,7 +681,10 @@ class ProviderManager:
                 continue
 
             provider_model_credentials_cache = ProviderCredentialsCache(
-                tenant_id=tenant_id, identity_id=provider_model_record.id, cache_type=ProviderCredentialsCacheType.MODEL
+                tenant_id=tenant_id,
+                identity_id=provider_model_record.id,
+                cache_type=ProviderCredentialsCacheType.MODEL,
+                version=self.credentials_version,
             )
 
             # Get cached provider model credentials
@@ -771,6 +801,7 @@ class ProviderManager:
                     tenant_id=tenant_id,
                     identity_id=provider_record_quota_free.id,
                     cache_type=ProviderCredentialsCacheType.PROVIDER,
+                    version=self.credentials_version,
                 )
 
                 # Get cached provider credentials
@@ -920,6 +951,7 @@ class ProviderManager:
                             tenant_id=load_balancing_model_config.tenant_id,
                             identity_id=load_balancing_model_config.id,
                             cache_type=ProviderCredentialsCacheType.LOAD_BALANCING_MODEL,
+                            version=self.credentials_version,
                         )
 
                         # Get cached provider model credentials
@@ -1,11 +1,13 @@
 import json
 from collections import defaultdict
+from collections.abc import Iterable
 from typing import Any, Optional
 
 from pydantic import BaseModel
 
 from configs import dify_config
 from core.rag.datasource.keyword.jieba.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.rag.datasource.keyword.jieba.sharded_keyword_table import ShardedKeywordTable
 from core.rag.datasource.keyword.keyword_base import BaseKeyword
 from core.rag.models.document import Document
 from extensions.ext_database import db
@@ -13,6 +15,9 @@ from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
 from models.dataset import Dataset, DatasetKeywordTable, DocumentSegment
 
+# candidates hydrated per query when filtering by documents, as a multiple of top_k
+SEARCH_FILTERED_BATCH_SIZE_FACTOR = 10
+
 
 class KeywordTableConfig(BaseModel):
     max_keywords_per_chunk: int = 10
@@ -24,60 +29,63 @@ class Jieba(BaseKeyword):
         self._config = KeywordTableConfig()
 
     def create(self, texts: list[Document], **kwargs) -> BaseKeyword:
+        keyword_table_handler = JiebaKeywordTableHandler()
+        node_keywords = {}
+        for text in texts:
+            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                node_keywords[text.metadata["doc_id"]] = list(keywords)
+
+        # keywords are extracted before taking the lock, so only the keyword table update is serialized
         lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
         with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-            keyword_table = self._get_dataset_keyword_table()
-            for text in texts:
-                keywords = keyword_table_handler.extract_keywords(
-                    text.page_content, self._config.max_keywords_per_chunk
-                )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
-
-            self._save_dataset_keyword_table(keyword_table)
+            self._add_node_keywords_to_keyword_table(node_keywords)
 
-            return self
+        return self
 
     def add_texts(self, texts: list[Document], **kwargs):
-        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
-        with redis_client.lock(lock_name, timeout=600):
-            keyword_table_handler = JiebaKeywordTableHandler()
-
-            keyword_table = self._get_dataset_keyword_table()
-            keywords_list = kwargs.get("keywords_list")
-            for i in range(len(texts)):
-                text = texts[i]
-                if keywords_list:
-                    keywords = keywords_list[i]
-                    if not keywords:
-                        keywords = keyword_table_handler.extract_keywords(
-                            text.page_content, self._config.max_keywords_per_chunk
-                        )
-                else:
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords_list = kwargs.get("keywords_list")
+        node_keywords = {}
+        for i in range(len(texts)):
+            text = texts[i]
+            if keywords_list:
+                keywords = keywords_list[i]
+                if not keywords:
                     keywords = keyword_table_handler.extract_keywords(
                         text.page_content, self._config.max_keywords_per_chunk
                     )
-                if text.metadata is not None:
-                    self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
-                    keyword_table = self._add_text_to_keyword_table(
-                        keyword_table or {}, text.metadata["doc_id"], list(keywords)
-                    )
+            else:
+                keywords = keyword_table_handler.extract_keywords(
+                    text.page_content, self._config.max_keywords_per_chunk
+                )
+            if text.metadata is not None:
+                self._update_segment_keywords(self.dataset.id, text.metadata["doc_id"], list(keywords))
+                node_keywords[text.metadata["doc_id"]] = list(keywords)
 
-            self._save_dataset_keyword_table(keyword_table)
+        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
+        with redis_client.lock(lock_name, timeout=600):
+            self._add_node_keywords_to_keyword_table(node_keywords)
 
     def text_exists(self, id: str) -> bool:
-        keyword_table = self._get_dataset_keyword_table()
-        if keyword_table is None:
+        sharded_keyword_table = self._get_sharded_keyword_table()
+        if sharded_keyword_table:
+            keyword_table: Optional[dict] = sharded_keyword_table.load()
+        else:
+            keyword_table = self._get_dataset_keyword_table()
+        if not keyword_table:
             return False
-        return id in set.union(*keyword_table.values())
+        return any(id in node_ids for node_ids in keyword_table.values())
 
     def delete_by_ids(self, ids: list[str]) -> None:
         lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
         with redis_client.lock(lock_name, timeout=600):
+            sharded_keyword_table = self._get_sharded_keyword_table(for_update=True)
+            if sharded_keyword_table:
+                sharded_keyword_table.delete_ids(ids)
+                return
+
             keyword_table = self._get_dataset_keyword_table()
             if keyword_table is not None:
                 keyword_table = self._delete_ids_from_keyword_table(keyword_table, ids)
@@ -85,22 +93,33 @@ class Jieba(BaseKeyword):
             self._save_dataset_keyword_table(keyword_table)
 
     def search(self, query: str, **kwargs: Any) -> list[Document]:
-        keyword_table = self._get_dataset_keyword_table()
+        keyword_table_handler = JiebaKeywordTableHandler()
+        keywords = keyword_table_handler.extract_keywords(query)
+
+        # only the shards holding the query keywords are loaded from a sharded keyword table
+        sharded_keyword_table = self._get_sharded_keyword_table()
+        if sharded_keyword_table:
+            keyword_table: Optional[dict] = sharded_keyword_table.load(keywords)
+        else:
+            keyword_table = self._get_dataset_keyword_table()
 
         k = kwargs.get("top_k", 4)
         document_ids_filter = kwargs.get("document_ids_filter")
-        sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table or {}, query, k)
-
-        documents = []
-        for chunk_index in sorted_chunk_indices:
-            segment_query = db.session.query(DocumentSegment).filter(
-                DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id == chunk_index
-            )
-            if document_ids_filter:
-                segment_query = segment_query.filter(DocumentSegment.document_id.in_(document_ids_filter))
-            segment = segment_query.first()
-
-            if segment:
+        sorted_chunk_indices = self._retrieve_ids_by_keywords(keyword_table or {}, keywords)
+
+        # hydrate the ranked chunks batch by batch until top_k segments are found, so that chunks filtered out
+        # by document_ids_filter or without a segment do not make the result come back short
+        documents: list[Document] = []
+        if k <= 0:
+            return documents
+        batch_size = k * SEARCH_FILTERED_BATCH_SIZE_FACTOR if document_ids_filter else k
+        for start in range(0, len(sorted_chunk_indices), batch_size):
+            chunk_indices = sorted_chunk_indices[start : start + batch_size]
+            segments = self._get_segments_by_index_node_ids(chunk_indices, document_ids_filter)
+            for chunk_index in chunk_indices:
+                segment = segments.get(chunk_index)
+                if not segment:
+                    continue
                 documents.append(
                     Document(
                         page_content=segment.content,
@@ -112,6 +131,8 @@ class Jieba(BaseKeyword):
                         },
                     )
                 )
+                if len(documents) >= k:
+                    return documents
 
         return documents
 
@@ -122,10 +143,57 @@ class Jieba(BaseKeyword):
             if dataset_keyword_table:
                 db.session.delete(dataset_keyword_table)
                 db.session.commit()
-                if dataset_keyword_table.data_source_type != "database":
+                if dataset_keyword_table.data_source_type == "sharded":
+                    ShardedKeywordTable(self.dataset.id).clear()
+                elif dataset_keyword_table.data_source_type != "database":
                     file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
                     storage.delete(file_key)
 
+    def _get_sharded_keyword_table(self, for_update: bool = False) -> Optional[ShardedKeywordTable]:
+        """
+        Get the sharded keyword table of the dataset, or None if its keyword table is stored in a single blob.
+        With for_update, a keyword table stored in a single blob is converted to a sharded one first
+        when KEYWORD_DATA_SOURCE_TYPE is 'sharded'. The keyword indexing lock must be held in that case.
+        """
+        dataset_keyword_table = self.dataset.dataset_keyword_table
+        if dataset_keyword_table is None:
+            if dify_config.KEYWORD_DATA_SOURCE_TYPE != "sharded":
+                return None
+            if for_update:
+                # creates the keyword table record
+                self._get_dataset_keyword_table()
+            return ShardedKeywordTable(self.dataset.id)
+
+        if dataset_keyword_table.data_source_type == "sharded":
+            return ShardedKeywordTable(self.dataset.id)
+        if not for_update or dify_config.KEYWORD_DATA_SOURCE_TYPE != "sharded":
+            return None
+
+        keyword_table = self._get_dataset_keyword_table()
+        sharded_keyword_table = ShardedKeywordTable(self.dataset.id)
+        sharded_keyword_table.replace(keyword_table or {})
+        if dataset_keyword_table.data_source_type != "database":
+            file_key = "keyword_files/" + self.dataset.tenant_id + "/" + self.dataset.id + ".txt"
+            storage.delete(file_key)
+        dataset_keyword_table.data_source_type = "sharded"
+        dataset_keyword_table.keyword_table = ""
+        db.session.commit()
+        return sharded_keyword_table
+
+    def _add_node_keywords_to_keyword_table(self, node_keywords: dict[str, list[str]]) -> None:
+        """
+        Add the keywords of index nodes to the keyword table, the keyword indexing lock must be held.
+        """
+        sharded_keyword_table = self._get_sharded_keyword_table(for_update=True)
+        if sharded_keyword_table:
+            sharded_keyword_table.add(node_keywords)
+            return
+
+        keyword_table = self._get_dataset_keyword_table()
+        for node_id, keywords in node_keywords.items():
+            keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
+        self._save_dataset_keyword_table(keyword_table)
+
     def _save_dataset_keyword_table(self, keyword_table):
         keyword_table_dict = {
             "__type__": "keyword_table",
@@ -192,13 +260,10 @@ class Jieba(BaseKeyword):
 
         return keyword_table
 
-    def _retrieve_ids_by_query(self, keyword_table: dict, query: str, k: int = 4):
-        keyword_table_handler = JiebaKeywordTableHandler()
-        keywords = keyword_table_handler.extract_keywords(query)
-
+    def _retrieve_ids_by_keywords(self, keyword_table: dict, keywords: Iterable[str], k: Optional[int] = None):
         # go through text chunks in order of most matching keywords
         chunk_indices_count: dict[str, int] = defaultdict(int)
-        keywords_list = [keyword for keyword in keywords if keyword in set(keyword_table.keys())]
+        keywords_list = [keyword for keyword in keywords if keyword in keyword_table]
         for keyword in keywords_list:
             for node_id in keyword_table[keyword]:
                 chunk_indices_count[node_id] += 1
@@ -209,7 +274,19 @@ class Jieba(BaseKeyword):
             reverse=True,
         )
 
-        return sorted_chunk_indices[:k]
+        return sorted_chunk_indices[:k] if k is not None else sorted_chunk_indices
+
+    def _get_segments_by_index_node_ids(
+        self, index_node_ids: list[str], document_ids_filter: Optional[list[str]] = None
+    ) -> dict[str, DocumentSegment]:
+        if not index_node_ids:
+            return {}
+        segment_query = db.session.query(DocumentSegment).filter(
+            DocumentSegment.dataset_id == self.dataset.id, DocumentSegment.index_node_id.in_(index_node_ids)
+        )
+        if document_ids_filter:
+            segment_query = segment_query.filter(DocumentSegment.document_id.in_(document_ids_filter))
+        return {segment.index_node_id: segment for segment in segment_query.all()}
 
     def _update_segment_keywords(self, dataset_id: str, node_id: str, keywords: list[str]):
         document_segment = (
@@ -223,33 +300,32 @@ class Jieba(BaseKeyword):
             db.session.commit()
 
     def create_segment_keywords(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
         self._update_segment_keywords(self.dataset.id, node_id, keywords)
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
+        with redis_client.lock(lock_name, timeout=600):
+            self._add_node_keywords_to_keyword_table({node_id: keywords})
 
     def multi_create_segment_keywords(self, pre_segment_data_list: list):
         keyword_table_handler = JiebaKeywordTableHandler()
-        keyword_table = self._get_dataset_keyword_table()
+        node_keywords = {}
         for pre_segment_data in pre_segment_data_list:
             segment = pre_segment_data["segment"]
             if pre_segment_data["keywords"]:
                 segment.keywords = pre_segment_data["keywords"]
-                keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, pre_segment_data["keywords"]
-                )
+                node_keywords[segment.index_node_id] = pre_segment_data["keywords"]
             else:
                 keywords = keyword_table_handler.extract_keywords(segment.content, self._config.max_keywords_per_chunk)
                 segment.keywords = list(keywords)
-                keyword_table = self._add_text_to_keyword_table(
-                    keyword_table or {}, segment.index_node_id, list(keywords)
-                )
-        self._save_dataset_keyword_table(keyword_table)
+                node_keywords[segment.index_node_id] = list(keywords)
+
+        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
+        with redis_client.lock(lock_name, timeout=600):
+            self._add_node_keywords_to_keyword_table(node_keywords)
 
     def update_segment_keywords_index(self, node_id: str, keywords: list[str]):
-        keyword_table = self._get_dataset_keyword_table()
-        keyword_table = self._add_text_to_keyword_table(keyword_table or {}, node_id, keywords)
-        self._save_dataset_keyword_table(keyword_table)
+        lock_name = "keyword_indexing_lock_{}".format(self.dataset.id)
+        with redis_client.lock(lock_name, timeout=600):
+            self._add_node_keywords_to_keyword_table({node_id: keywords})
 
 
 class SetEncoder(json.JSONEncoder):
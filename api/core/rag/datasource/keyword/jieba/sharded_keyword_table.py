@@ -0,0 +1,174 @@
+import json
+import threading
+import zlib
+from collections import defaultdict
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import UTC, datetime
+from typing import Optional
+
+from cachetools import LRUCache
+from sqlalchemy import update
+
+from configs import dify_config
+from extensions.ext_database import db
+from models.dataset import DatasetKeywordTableShard
+
+KEYWORD_TABLE_SHARD_COUNT = 64
+
+# (dataset id, shard index) -> ((shard row id, shard version), keyword table of the shard)
+_shard_cache: LRUCache = LRUCache(maxsize=dify_config.KEYWORD_TABLE_SHARD_CACHE_SIZE or 1)
+_shard_cache_lock = threading.Lock()
+
+
+def get_shard_index(keyword: str) -> int:
+    return zlib.crc32(keyword.encode("utf-8")) % KEYWORD_TABLE_SHARD_COUNT
+
+
+class ShardedKeywordTable:
+    """
+    Keyword table of a dataset split into shards by keyword, each stored in its own row.
+
+    Writes only rewrite the shards holding the changed keywords and bump their version, searches only load
+    the shards holding the query keywords. Parsed shards are cached per process and keyed by version,
+    so unchanged shards are not loaded again.
+    Writes must hold the keyword indexing lock of the dataset.
+    """
+
+    def __init__(self, dataset_id: str) -> None:
+        self.dataset_id = dataset_id
+
+    def load(self, keywords: Optional[Iterable[str]] = None) -> dict[str, set[str]]:
+        """
+        Load the keyword table. Only the shards holding the given keywords are loaded if keywords are given.
+        The returned sets may be shared with the cache and must not be modified.
+        """
+        shard_indices = None if keywords is None else {get_shard_index(keyword) for keyword in keywords}
+        if shard_indices is not None and not shard_indices:
+            return {}
+
+        keyword_table: dict[str, set[str]] = {}
+        for shard_table in self._load_shards(shard_indices).values():
+            keyword_table.update(shard_table)
+        return keyword_table
+
+    def add(self, node_keywords: Mapping[str, Sequence[str]]) -> None:
+        """
+        Add the keywords of index nodes, mapping each index node id to its keywords.
+        """
+        keywords_by_shard: dict[int, dict[str, set[str]]] = defaultdict(lambda: defaultdict(set))
+        for node_id, keywords in node_keywords.items():
+            for keyword in keywords:
+                keywords_by_shard[get_shard_index(keyword)][keyword].add(node_id)
+        if not keywords_by_shard:
+            return
+
+        shards = self._load_shards(set(keywords_by_shard))
+        changed_shards = {}
+        for shard_index, shard_keywords in keywords_by_shard.items():
+            shard_table = {keyword: set(node_ids) for keyword, node_ids in shards.get(shard_index, {}).items()}
+            for keyword, node_ids in shard_keywords.items():
+                shard_table.setdefault(keyword, set()).update(node_ids)
+            changed_shards[shard_index] = shard_table
+        self._save_shards(changed_shards)
+
+    def delete_ids(self, ids: Sequence[str]) -> None:
+        node_ids_to_delete = set(ids)
+        changed_shards = {}
+        for shard_index, shard_table in self._load_shards(None).items():
+            if not any(node_ids_to_delete.intersection(node_ids) for node_ids in shard_table.values()):
+                continue
+            changed_shards[shard_index] = {
+                keyword: remaining
+                for keyword, node_ids in shard_table.items()
+                if (remaining := node_ids.difference(node_ids_to_delete))
+            }
+        self._save_shards(changed_shards)
+
+    def replace(self, keyword_table: Mapping[str, Iterable[str]]) -> None:
+        """
+        Replace the whole keyword table, used to convert a keyword table stored in a single blob.
+        """
+        shards: dict[int, dict[str, set[str]]] = {shard_index: {} for shard_index in self._get_shard_versions(None)}
+        for keyword, node_ids in keyword_table.items():
+            shards.setdefault(get_shard_index(keyword), {})[keyword] = set(node_ids)
+        self._save_shards(shards)
+
+    def clear(self) -> None:
+        db.session.query(DatasetKeywordTableShard).filter(
+            DatasetKeywordTableShard.dataset_id == self.dataset_id
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _get_shard_versions(self, shard_indices: Optional[set[int]]) -> dict[int, tuple[str, int]]:
+        # the row id is part of the version, versions restart when the keyword table is deleted and created again
+        query = db.session.query(
+            DatasetKeywordTableShard.shard_index, DatasetKeywordTableShard.id, DatasetKeywordTableShard.version
+        ).filter(DatasetKeywordTableShard.dataset_id == self.dataset_id)
+        if shard_indices is not None:
+            query = query.filter(DatasetKeywordTableShard.shard_index.in_(shard_indices))
+        return {shard_index: (shard_id, version) for shard_index, shard_id, version in query.all()}
+
+    def _load_shards(self, shard_indices: Optional[set[int]]) -> dict[int, dict[str, set[str]]]:
+        shard_versions = self._get_shard_versions(shard_indices)
+
+        shards: dict[int, dict[str, set[str]]] = {}
+        stale_shard_indices = []
+        with _shard_cache_lock:
+            for shard_index, version in shard_versions.items():
+                cached = _shard_cache.get((self.dataset_id, shard_index))
+                if cached and cached[0] == version:
+                    shards[shard_index] = cached[1]
+                else:
+                    stale_shard_indices.append(shard_index)
+
+        if stale_shard_indices:
+            rows = (
+                db.session.query(
+                    DatasetKeywordTableShard.shard_index,
+                    DatasetKeywordTableShard.id,
+                    DatasetKeywordTableShard.version,
+                    DatasetKeywordTableShard.keyword_table,
+                )
+                .filter(
+                    DatasetKeywordTableShard.dataset_id == self.dataset_id,
+                    DatasetKeywordTableShard.shard_index.in_(stale_shard_indices),
+                )
+                .all()
+            )
+            for shard_index, shard_id, version, keyword_table in rows:
+                shard_table = {keyword: set(node_ids) for keyword, node_ids in json.loads(keyword_table).items()}
+                shards[shard_index] = shard_table
+                if dify_config.KEYWORD_TABLE_SHARD_CACHE_SIZE:
+                    with _shard_cache_lock:
+                        _shard_cache[(self.dataset_id, shard_index)] = ((shard_id, version), shard_table)
+
+        return shards
+
+    def _save_shards(self, shards: Mapping[int, Mapping[str, set[str]]]) -> None:
+        if not shards:
+            return
+
+        shard_versions = self._get_shard_versions(set(shards))
+        now = datetime.now(UTC).replace(tzinfo=None)
+        for shard_index, shard_table in shards.items():
+            keyword_table = json.dumps({keyword: list(node_ids) for keyword, node_ids in shard_table.items()})
+            if shard_index in shard_versions:
+                db.session.execute(
+                    update(DatasetKeywordTableShard)
+                    .where(
+                        DatasetKeywordTableShard.dataset_id == self.dataset_id,
+                        DatasetKeywordTableShard.shard_index == shard_index,
+                    )
+                    .values(keyword_table=keyword_table, version=shard_versions[shard_index][1] + 1, updated_at=now)
+                )
+            else:
+                db.session.add(
+                    DatasetKeywordTableShard(
+                        dataset_id=self.dataset_id,
+                        shard_index=shard_index,
+                        keyword_table=keyword_table,
+                        version=1,
+                        updated_at=now,
+                    )
+                )
+        db.session.commit()
@@ -1,8 +1,7 @@
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+import functools
+from collections.abc import Callable
 from typing import Optional
 
-from flask import Flask, current_app
 from sqlalchemy.orm import load_only
 
 from configs import dify_config
@@ -14,6 +13,7 @@ from core.rag.entities.metadata_entities import MetadataCondition
 from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.models.document import Document
 from core.rag.rerank.rerank_type import RerankMode
+from core.rag.retrieval.retrieval_executor import RetrievalExecutor
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from extensions.ext_database import db
 from models.dataset import ChildChunk, Dataset, DocumentSegment
@@ -43,65 +43,67 @@ class RetrievalService:
         reranking_mode: str = "reranking_model",
         weights: Optional[dict] = None,
         document_ids_filter: Optional[list[str]] = None,
-    ):
+    ) -> list[Document]:
         if not query:
             return []
         dataset = cls._get_dataset(dataset_id)
         if not dataset:
             return []
 
-        all_documents: list[Document] = []
-        exceptions: list[str] = []
-
-        # Optimize multithreading with thread pools
-        with ThreadPoolExecutor(max_workers=dify_config.RETRIEVAL_SERVICE_EXECUTORS) as executor:  # type: ignore
-            futures = []
-            if retrieval_method == "keyword_search":
-                futures.append(
-                    executor.submit(
-                        cls.keyword_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        all_documents=all_documents,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
+        searches: list[Callable[[], list[Document]]] = []
+        if retrieval_method == "keyword_search":
+            searches.append(
+                functools.partial(
+                    cls.keyword_search,
+                    dataset_id=dataset_id,
+                    query=query,
+                    top_k=top_k,
+                    document_ids_filter=document_ids_filter,
                 )
-            if RetrievalMethod.is_support_semantic_search(retrieval_method):
-                futures.append(
-                    executor.submit(
-                        cls.embedding_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        score_threshold=score_threshold,
-                        reranking_model=reranking_model,
-                        all_documents=all_documents,
-                        retrieval_method=retrieval_method,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
+            )
+        if RetrievalMethod.is_support_semantic_search(retrieval_method):
+            searches.append(
+                functools.partial(
+                    cls.embedding_search,
+                    dataset_id=dataset_id,
+                    query=query,
+                    top_k=top_k,
+                    score_threshold=score_threshold,
+                    reranking_model=reranking_model,
+                    retrieval_method=retrieval_method,
+                    document_ids_filter=document_ids_filter,
                 )
-            if RetrievalMethod.is_support_fulltext_search(retrieval_method):
-                futures.append(
-                    executor.submit(
-                        cls.full_text_index_search,
-                        flask_app=current_app._get_current_object(),  # type: ignore
-                        dataset_id=dataset_id,
-                        query=query,
-                        top_k=top_k,
-                        score_threshold=score_threshold,
-                        reranking_model=reranking_model,
-                        all_documents=all_documents,
-                        retrieval_method=retrieval_method,
-                        exceptions=exceptions,
-                        document_ids_filter=document_ids_filter,
-                    )
+            )
+        if RetrievalMethod.is_support_fulltext_search(retrieval_method):
+            searches.append(
+                functools.partial(
+                    cls.full_text_index_search,
+                    dataset_id=dataset_id,
+                    query=query,
+                    top_k=top_k,
+                    score_threshold=score_threshold,
+                    reranking_model=reranking_model,
+                    retrieval_method=retrieval_method,
+                    document_ids_filter=document_ids_filter,
                 )
-            concurrent.futures.wait(futures, timeout=30, return_when=concurrent.futures.ALL_COMPLETED)
+            )
+        futures = RetrievalExecutor.get_instance().run(
+            str(dataset.tenant_id),
+            [(dataset_id, search) for search in searches],
+            max_workers=max(dify_config.RETRIEVAL_SERVICE_EXECUTORS, 1),
+        )
+
+        # searches that timed out are left out of the results
+        all_documents: list[Document] = []
+        exceptions: list[str] = []
+        for future in futures:
+            if not future.done() or future.cancelled():
+                continue
+            exception = future.exception()
+            if exception:
+                exceptions.append(str(exception))
+            else:
+                all_documents.extend(future.result())
 
         if exceptions:
             raise ValueError(";\n".join(exceptions))
@@ -149,129 +151,99 @@ class RetrievalService:
     @classmethod
     def keyword_search(
         cls,
-        flask_app: Flask,
         dataset_id: str,
         query: str,
         top_k: int,
-        all_documents: list,
-        exceptions: list,
         document_ids_filter: Optional[list[str]] = None,
-    ):
-        with flask_app.app_context():
-            try:
-                dataset = cls._get_dataset(dataset_id)
-                if not dataset:
-                    raise ValueError("dataset not found")
+    ) -> list[Document]:
+        dataset = cls._get_dataset(dataset_id)
+        if not dataset:
+            raise ValueError("dataset not found")
 
-                keyword = Keyword(dataset=dataset)
+        keyword = Keyword(dataset=dataset)
 
-                documents = keyword.search(
-                    cls.escape_query_for_search(query), top_k=top_k, document_ids_filter=document_ids_filter
-                )
-                all_documents.extend(documents)
-            except Exception as e:
-                exceptions.append(str(e))
+        return keyword.search(cls.escape_query_for_search(query), top_k=top_k, document_ids_filter=document_ids_filter)
 
     @classmethod
     def embedding_search(
         cls,
-        flask_app: Flask,
         dataset_id: str,
         query: str,
         top_k: int,
         score_threshold: Optional[float],
         reranking_model: Optional[dict],
-        all_documents: list,
         retrieval_method: str,
-        exceptions: list,
         document_ids_filter: Optional[list[str]] = None,
-    ):
-        with flask_app.app_context():
-            try:
-                dataset = cls._get_dataset(dataset_id)
-                if not dataset:
-                    raise ValueError("dataset not found")
-
-                vector = Vector(dataset=dataset)
-                documents = vector.search_by_vector(
-                    query,
-                    search_type="similarity_score_threshold",
-                    top_k=top_k,
-                    score_threshold=score_threshold,
-                    filter={"group_id": [dataset.id]},
-                    document_ids_filter=document_ids_filter,
-                )
+    ) -> list[Document]:
+        dataset = cls._get_dataset(dataset_id)
+        if not dataset:
+            raise ValueError("dataset not found")
 
-                if documents:
-                    if (
-                        reranking_model
-                        and reranking_model.get("reranking_model_name")
-                        and reranking_model.get("reranking_provider_name")
-                        and retrieval_method == RetrievalMethod.SEMANTIC_SEARCH.value
-                    ):
-                        data_post_processor = DataPostProcessor(
-                            str(dataset.tenant_id), str(RerankMode.RERANKING_MODEL.value), reranking_model, None, False
-                        )
-                        all_documents.extend(
-                            data_post_processor.invoke(
-                                query=query,
-                                documents=documents,
-                                score_threshold=score_threshold,
-                                top_n=len(documents),
-                            )
-                        )
-                    else:
-                        all_documents.extend(documents)
-            except Exception as e:
-                exceptions.append(str(e))
+        vector = Vector(dataset=dataset)
+        documents = vector.search_by_vector(
+            query,
+            search_type="similarity_score_threshold",
+            top_k=top_k,
+            score_threshold=score_threshold,
+            filter={"group_id": [dataset.id]},
+            document_ids_filter=document_ids_filter,
+        )
+
+        if (
+            documents
+            and reranking_model
+            and reranking_model.get("reranking_model_name")
+            and reranking_model.get("reranking_provider_name")
+            and retrieval_method == RetrievalMethod.SEMANTIC_SEARCH.value
+        ):
+            data_post_processor = DataPostProcessor(
+                str(dataset.tenant_id), str(RerankMode.RERANKING_MODEL.value), reranking_model, None, False
+            )
+            return data_post_processor.invoke(
+                query=query,
+                documents=documents,
+                score_threshold=score_threshold,
+                top_n=len(documents),
+            )
+        return documents
 
     @classmethod
     def full_text_index_search(
         cls,
-        flask_app: Flask,
         dataset_id: str,
         query: str,
         top_k: int,
         score_threshold: Optional[float],
         reranking_model: Optional[dict],
-        all_documents: list,
         retrieval_method: str,
-        exceptions: list,
         document_ids_filter: Optional[list[str]] = None,
-    ):
-        with flask_app.app_context():
-            try:
-                dataset = cls._get_dataset(dataset_id)
-                if not dataset:
-                    raise ValueError("dataset not found")
+    ) -> list[Document]:
+        dataset = cls._get_dataset(dataset_id)
+        if not dataset:
+            raise ValueError("dataset not found")
 
-                vector_processor = Vector(dataset=dataset)
+        vector_processor = Vector(dataset=dataset)
 
-                documents = vector_processor.search_by_full_text(
-                    cls.escape_query_for_search(query), top_k=top_k, document_ids_filter=document_ids_filter
-                )
-                if documents:
-                    if (
-                        reranking_model
-                        and reranking_model.get("reranking_model_name")
-                        and reranking_model.get("reranking_provider_name")
-                        and retrieval_method == RetrievalMethod.FULL_TEXT_SEARCH.value
-                    ):
-                        data_post_processor = DataPostProcessor(
-                            str(dataset.tenant_id), str(RerankMode.RERANKING_MODEL.value), reranking_model, None, False
-                        )
-                        all_documents.extend(
-                            data_post_processor.invoke(
-                                query=query,
-                                documents=documents,
-                                score_threshold=score_threshold,
-                                top_n=len(documents),
-                            )
-                        )
-                    else:
-                        all_documents.extend(documents)
-            except Exception as e:
-                exceptions.append(str(e))
+        documents = vector_processor.search_by_full_text(
+            cls.escape_query_for_search(query), top_k=top_k, document_ids_filter=document_ids_filter
+        )
+        if (
+            documents
+            and reranking_model
+            and reranking_model.get("reranking_model_name")
+            and reranking_model.get("reranking_provider_name")
+            and retrieval_method == RetrievalMethod.FULL_TEXT_SEARCH.value
+        ):
+            data_post_processor = DataPostProcessor(
+                str(dataset.tenant_id), str(RerankMode.RERANKING_MODEL.value), reranking_model, None, False
+            )
+            return data_post_processor.invoke(
+                query=query,
+                documents=documents,
+                score_threshold=score_threshold,
+                top_n=len(documents),
+            )
+        return documents
 
     @staticmethod
     def escape_query_for_search(query: str) -> str:
@@ -298,6 +270,25 @@ class RetrievalService:
                 .all()
             }
 
+            # Batch query segments and child chunks of all retrieved documents
+            dataset_ids = {dataset_document.dataset_id for dataset_document in dataset_documents.values()}
+            child_index_node_ids = set()
+            index_node_ids = set()
+            for document in documents:
+                dataset_document = dataset_documents.get(document.metadata.get("document_id"))
+                if not dataset_document or not document.metadata.get("doc_id"):
+                    continue
+                if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
+                    child_index_node_ids.add(document.metadata["doc_id"])
+                else:
+                    index_node_ids.add(document.metadata["doc_id"])
+
+            child_chunks_by_index_node_id = cls._get_child_chunks_by_index_node_ids(child_index_node_ids)
+            parent_segments = cls._get_segments_by_ids(
+                dataset_ids, {child_chunk.segment_id for child_chunk in child_chunks_by_index_node_id.values()}
+            )
+            segments = cls._get_segments_by_index_node_ids(dataset_ids, index_node_ids)
+
             records = []
             include_segment_ids = set()
             segment_child_map = {}
@@ -315,33 +306,15 @@ class RetrievalService:
                 if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
                     # Handle parent-child documents
                     child_index_node_id = document.metadata.get("doc_id")
+                    if not child_index_node_id:
+                        continue
 
-                    child_chunk = (
-                        db.session.query(ChildChunk).filter(ChildChunk.index_node_id == child_index_node_id).first()
-                    )
-
+                    child_chunk = child_chunks_by_index_node_id.get(child_index_node_id)
                     if not child_chunk:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.id == child_chunk.segment_id,
-                        )
-                        .options(
-                            load_only(
-                                DocumentSegment.id,
-                                DocumentSegment.content,
-                                DocumentSegment.answer,
-                            )
-                        )
-                        .first()
-                    )
-
-                    if not segment:
+                    segment = parent_segments.get(child_chunk.segment_id)
+                    if not segment or segment.dataset_id != dataset_document.dataset_id:
                         continue
 
                     if segment.id not in include_segment_ids:
@@ -378,17 +351,7 @@ class RetrievalService:
                     if not index_node_id:
                         continue
 
-                    segment = (
-                        db.session.query(DocumentSegment)
-                        .filter(
-                            DocumentSegment.dataset_id == dataset_document.dataset_id,
-                            DocumentSegment.enabled == True,
-                            DocumentSegment.status == "completed",
-                            DocumentSegment.index_node_id == index_node_id,
-                        )
-                        .first()
-                    )
-
+                    segment = segments.get((dataset_document.dataset_id, index_node_id))
                     if not segment:
                         continue
 
@@ -431,3 +394,56 @@ class RetrievalService:
         except Exception as e:
             db.session.rollback()
             raise e
+
+    @classmethod
+    def _get_child_chunks_by_index_node_ids(cls, index_node_ids: set[str]) -> dict[str, ChildChunk]:
+        if not index_node_ids:
+            return {}
+        child_chunks: dict[str, ChildChunk] = {}
+        for child_chunk in db.session.query(ChildChunk).filter(ChildChunk.index_node_id.in_(index_node_ids)).all():
+            child_chunks.setdefault(child_chunk.index_node_id, child_chunk)
+        return child_chunks
+
+    @classmethod
+    def _get_segments_by_ids(cls, dataset_ids: set[str], segment_ids: set[str]) -> dict[str, DocumentSegment]:
+        if not segment_ids:
+            return {}
+        segments = (
+            db.session.query(DocumentSegment)
+            .filter(
+                DocumentSegment.dataset_id.in_(dataset_ids),
+                DocumentSegment.enabled == True,
+                DocumentSegment.status == "completed",
+                DocumentSegment.id.in_(segment_ids),
+            )
+            .options(
+                load_only(
+                    DocumentSegment.id,
+                    DocumentSegment.dataset_id,
+                    DocumentSegment.content,
+                    DocumentSegment.answer,
+                )
+            )
+            .all()
+        )
+        return {segment.id: segment for segment in segments}
+
+    @classmethod
+    def _get_segments_by_index_node_ids(
+        cls, dataset_ids: set[str], index_node_ids: set[str]
+    ) -> dict[tuple[str, str], DocumentSegment]:
+        if not index_node_ids:
+            return {}
+        segments: dict[tuple[str, str], DocumentSegment] = {}
+        for segment in (
+            db.session.query(DocumentSegment)
+            .filter(
+                DocumentSegment.dataset_id.in_(dataset_ids),
+                DocumentSegment.enabled == True,
+                DocumentSegment.status == "completed",
+                DocumentSegment.index_node_id.in_(index_node_ids),
+            )
+            .all()
+        ):
+            segments.setdefault((segment.dataset_id, segment.index_node_id), segment)
+        return segments
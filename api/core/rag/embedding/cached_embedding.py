@@ -1,16 +1,20 @@
 import base64
 import logging
+import threading
+from concurrent.futures import Future
 from typing import Any, Optional, cast
 
 import numpy as np
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.postgresql import insert
 
 from configs import dify_config
 from core.entities.embedding_type import EmbeddingInputType
+from core.helper.fork_safe_singleton import ForkSafeSingleton
 from core.model_manager import ModelInstance
 from core.model_runtime.entities.model_entities import ModelPropertyKey
 from core.model_runtime.model_providers.__base.text_embedding_model import TextEmbeddingModel
 from core.rag.embedding.embedding_base import Embeddings
+from core.rag.embedding.embedding_codec import decode_embedding, encode_embedding
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from libs import helper
@@ -19,6 +23,37 @@ from models.dataset import Embedding
 logger = logging.getLogger(__name__)
 
 
+class _QueryEmbeddingFlights:
+    """
+    Query embeddings being computed, shared by the threads embedding the same query at once.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # flight key -> query embedding being computed
+        self._flights: dict[str, Future] = {}
+
+    def join(self, flight_key: str) -> tuple[Future, bool]:
+        """
+        Join the flight of the key, starting it if there is none.
+        :return: the flight, and whether it was started and must be completed by the caller
+        """
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[flight_key] = Future()
+            return flight, True
+
+    def finish(self, flight_key: str) -> None:
+        with self._lock:
+            self._flights.pop(flight_key, None)
+
+
+# flights of the parent are never completed in forked children
+_query_embedding_flights = ForkSafeSingleton(_QueryEmbeddingFlights)
+
+
 class CacheEmbedding(Embeddings):
     def __init__(self, model_instance: ModelInstance, user: Optional[str] = None) -> None:
         self._model_instance = model_instance
@@ -28,23 +63,16 @@ class CacheEmbedding(Embeddings):
         """Embed search docs in batches of 10."""
         # use doc embedding cache or store if not exists
         text_embeddings: list[Any] = [None for _ in range(len(texts))]
+        text_hashes = [helper.generate_text_hash(text) for text in texts]
+        cached_embeddings = self._load_cached_embeddings(set(text_hashes))
         embedding_queue_indices = []
-        for i, text in enumerate(texts):
-            hash = helper.generate_text_hash(text)
-            embedding = (
-                db.session.query(Embedding)
-                .filter_by(
-                    model_name=self._model_instance.model, hash=hash, provider_name=self._model_instance.provider
-                )
-                .first()
-            )
-            if embedding:
-                text_embeddings[i] = embedding.get_embedding()
+        for i, hash in enumerate(text_hashes):
+            if hash in cached_embeddings:
+                text_embeddings[i] = cached_embeddings[hash]
             else:
                 embedding_queue_indices.append(i)
         if embedding_queue_indices:
-            embedding_queue_texts = [texts[i] for i in embedding_queue_indices]
-            embedding_queue_embeddings = []
+            new_embeddings: dict[str, list[float]] = {}
             try:
                 model_type_instance = cast(TextEmbeddingModel, self._model_instance.model_type_instance)
                 model_schema = model_type_instance.get_model_schema(
@@ -55,14 +83,15 @@ class CacheEmbedding(Embeddings):
                     if model_schema and ModelPropertyKey.MAX_CHUNKS in model_schema.model_properties
                     else 1
                 )
-                for i in range(0, len(embedding_queue_texts), max_chunks):
-                    batch_texts = embedding_queue_texts[i : i + max_chunks]
+                for i in range(0, len(embedding_queue_indices), max_chunks):
+                    batch_indices = embedding_queue_indices[i : i + max_chunks]
+                    batch_texts = [texts[index] for index in batch_indices]
 
                     embedding_result = self._model_instance.invoke_text_embedding(
                         texts=batch_texts, user=self._user, input_type=EmbeddingInputType.DOCUMENT
                     )
 
-                    for vector in embedding_result.embeddings:
+                    for index, vector in zip(batch_indices, embedding_result.embeddings):
                         try:
                             # FIXME: type ignore for numpy here
                             normalized_embedding = (vector / np.linalg.norm(vector)).tolist()  # type: ignore
@@ -71,28 +100,11 @@ class CacheEmbedding(Embeddings):
                                 # for issue #11827  float values are not json compliant
                                 logger.warning(f"Normalized embedding is nan: {normalized_embedding}")
                                 continue
-                            embedding_queue_embeddings.append(normalized_embedding)
-                        except IntegrityError:
-                            db.session.rollback()
+                            text_embeddings[index] = normalized_embedding
+                            new_embeddings[text_hashes[index]] = normalized_embedding
                         except Exception:
                             logging.exception("Failed transform embedding")
-                cache_embeddings = []
-                try:
-                    for i, n_embedding in zip(embedding_queue_indices, embedding_queue_embeddings):
-                        text_embeddings[i] = n_embedding
-                        hash = helper.generate_text_hash(texts[i])
-                        if hash not in cache_embeddings:
-                            embedding_cache = Embedding(
-                                model_name=self._model_instance.model,
-                                hash=hash,
-                                provider_name=self._model_instance.provider,
-                            )
-                            embedding_cache.set_embedding(n_embedding)
-                            db.session.add(embedding_cache)
-                            cache_embeddings.append(hash)
-                    db.session.commit()
-                except IntegrityError:
-                    db.session.rollback()
+                self._store_cached_embeddings(new_embeddings)
             except Exception as ex:
                 db.session.rollback()
                 logger.exception("Failed to embed documents: %s")
@@ -100,11 +112,130 @@ class CacheEmbedding(Embeddings):
 
         return text_embeddings
 
+    def _redis_cache_key(self, hash: str) -> str:
+        return f"embedding_document_{self._model_instance.provider}_{self._model_instance.model}_{hash}"
+
+    def _load_cached_embeddings(self, hashes: set[str]) -> dict[str, list[float]]:
+        """
+        Look up cached embeddings for the given text hashes.
+
+        Redis is consulted first when enabled, the remaining hashes are fetched from the
+        embeddings table with one `IN` query per lookup batch.
+        """
+        cached_embeddings: dict[str, list[float]] = {}
+        if not hashes:
+            return cached_embeddings
+
+        pending_hashes = list(hashes)
+        if dify_config.EMBEDDING_CACHE_REDIS_ENABLED:
+            try:
+                pipeline = redis_client.pipeline(transaction=False)
+                for hash in pending_hashes:
+                    pipeline.get(self._redis_cache_key(hash))
+                for hash, value in zip(pending_hashes, pipeline.execute()):
+                    if value:
+                        cached_embeddings[hash] = decode_embedding(value).tolist()
+            except Exception:
+                logger.exception("Failed to load document embeddings from redis")
+            pending_hashes = [hash for hash in pending_hashes if hash not in cached_embeddings]
+
+        db_embeddings: dict[str, list[float]] = {}
+        batch_size = dify_config.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE
+        for i in range(0, len(pending_hashes), batch_size):
+            embeddings = (
+                db.session.query(Embedding)
+                .filter(
+                    Embedding.model_name == self._model_instance.model,
+                    Embedding.provider_name == self._model_instance.provider,
+                    Embedding.hash.in_(pending_hashes[i : i + batch_size]),
+                )
+                .all()
+            )
+            for embedding in embeddings:
+                db_embeddings[embedding.hash] = embedding.get_embedding()
+
+        if db_embeddings and dify_config.EMBEDDING_CACHE_REDIS_ENABLED:
+            self._set_redis_cached_embeddings(db_embeddings)
+        cached_embeddings.update(db_embeddings)
+        return cached_embeddings
+
+    def _store_cached_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        """
+        Persist newly computed embeddings with a bulk insert that skips rows already written
+        by a concurrent indexing task.
+        """
+        if not embeddings:
+            return
+
+        rows = []
+        for hash, vector in embeddings.items():
+            embedding_cache = Embedding(
+                model_name=self._model_instance.model,
+                hash=hash,
+                provider_name=self._model_instance.provider,
+            )
+            embedding_cache.set_embedding(vector)
+            rows.append(
+                {
+                    "model_name": embedding_cache.model_name,
+                    "hash": embedding_cache.hash,
+                    "provider_name": embedding_cache.provider_name,
+                    "embedding": embedding_cache.embedding,
+                }
+            )
+
+        batch_size = dify_config.EMBEDDING_CACHE_LOOKUP_BATCH_SIZE
+        for i in range(0, len(rows), batch_size):
+            stmt = (
+                insert(Embedding)
+                .values(rows[i : i + batch_size])
+                .on_conflict_do_nothing(index_elements=["model_name", "hash", "provider_name"])
+            )
+            db.session.execute(stmt)
+        db.session.commit()
+
+        if dify_config.EMBEDDING_CACHE_REDIS_ENABLED:
+            self._set_redis_cached_embeddings(embeddings)
+
+    def _set_redis_cached_embeddings(self, embeddings: dict[str, list[float]]) -> None:
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for hash, vector in embeddings.items():
+                pipeline.setex(
+                    self._redis_cache_key(hash), dify_config.EMBEDDING_CACHE_REDIS_TTL, encode_embedding(vector)
+                )
+            pipeline.execute()
+        except Exception:
+            logger.exception("Failed to add document embeddings to redis")
+
     def embed_query(self, text: str) -> list[float]:
-        """Embed query text."""
+        """
+        Embed query text.
+
+        Parallel retrievers of datasets using the same embedding model embed the same query at once,
+        only the first one reads the cache and invokes the model, the others wait for its result.
+        """
         # use doc embedding cache or store if not exists
         hash = helper.generate_text_hash(text)
         embedding_cache_key = f"{self._model_instance.provider}_{self._model_instance.model}_{hash}"
+        # credentials differ between tenants, so do failures
+        flight_key = f"{self._model_instance.provider_model_bundle.configuration.tenant_id}:{embedding_cache_key}"
+        flights = _query_embedding_flights.get()
+        flight, is_leader = flights.join(flight_key)
+        if not is_leader:
+            return list(flight.result())
+
+        try:
+            embedding_results = self._embed_query(text, embedding_cache_key)
+            flight.set_result(embedding_results)
+            return embedding_results
+        except Exception as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            flights.finish(flight_key)
+
+    def _embed_query(self, text: str, embedding_cache_key: str) -> list[float]:
         embedding = redis_client.get(embedding_cache_key)
         if embedding:
             redis_client.expire(embedding_cache_key, 600)
@@ -0,0 +1,88 @@
+"""
+Binary storage codec for cached embeddings.
+
+Vectors are stored as a small fixed header followed by the raw little-endian
+payload, so they can be read back with `np.frombuffer` without unpickling:
+
+    magic (4 bytes) | version (1 byte) | storage type (1 byte) | reserved (2 bytes) | payload
+
+The int8 storage type prefixes the payload with a little-endian float32 scale factor.
+Rows written before this codec existed are pickled `list[float]` values and are still decoded.
+"""
+
+import pickle
+import struct
+from enum import StrEnum
+from typing import cast
+
+import numpy as np
+
+EMBEDDING_CODEC_MAGIC = b"DEMB"
+EMBEDDING_CODEC_VERSION = 1
+
+_HEADER = struct.Struct("<4sBB2x")
+_INT8_SCALE = struct.Struct("<f")
+
+
+class EmbeddingStorageType(StrEnum):
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    INT8 = "int8"
+
+
+_STORAGE_TYPE_CODES: dict[EmbeddingStorageType, int] = {
+    EmbeddingStorageType.FLOAT32: 1,
+    EmbeddingStorageType.FLOAT16: 2,
+    EmbeddingStorageType.INT8: 3,
+}
+_STORAGE_TYPES_BY_CODE = {code: storage_type for storage_type, code in _STORAGE_TYPE_CODES.items()}
+_NUMPY_DTYPES: dict[EmbeddingStorageType, str] = {
+    EmbeddingStorageType.FLOAT32: "<f4",
+    EmbeddingStorageType.FLOAT16: "<f2",
+    EmbeddingStorageType.INT8: "i1",
+}
+
+
+def is_encoded_embedding(data: bytes) -> bool:
+    """Return True if the data was written by this codec rather than pickled."""
+    return bytes(data[: len(EMBEDDING_CODEC_MAGIC)]) == EMBEDDING_CODEC_MAGIC
+
+
+def encode_embedding(
+    embedding: list[float] | np.ndarray, storage_type: EmbeddingStorageType = EmbeddingStorageType.FLOAT32
+) -> bytes:
+    storage_type = EmbeddingStorageType(storage_type)
+    vector = np.asarray(embedding, dtype=np.float32)
+    header = _HEADER.pack(EMBEDDING_CODEC_MAGIC, EMBEDDING_CODEC_VERSION, _STORAGE_TYPE_CODES[storage_type])
+    if storage_type == EmbeddingStorageType.INT8:
+        max_abs = float(np.max(np.abs(vector))) if vector.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized: np.ndarray = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return header + _INT8_SCALE.pack(scale) + quantized.tobytes()
+    return header + vector.astype(_NUMPY_DTYPES[storage_type]).tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """
+    Decode stored embedding bytes into a numpy array.
+
+    float32 payloads are returned as a zero-copy view over the given buffer.
+    """
+    if not is_encoded_embedding(data):
+        return np.asarray(pickle.loads(data), dtype=np.float32)  # noqa: S301
+
+    _, version, storage_type_code = _HEADER.unpack_from(data)
+    if version != EMBEDDING_CODEC_VERSION:
+        raise ValueError(f"Unsupported embedding codec version: {version}")
+    storage_type = _STORAGE_TYPES_BY_CODE.get(storage_type_code)
+    if storage_type is None:
+        raise ValueError(f"Unsupported embedding storage type: {storage_type_code}")
+
+    offset = _HEADER.size
+    if storage_type == EmbeddingStorageType.INT8:
+        (scale,) = _INT8_SCALE.unpack_from(data, offset)
+        offset += _INT8_SCALE.size
+        return cast(
+            np.ndarray, np.frombuffer(data, dtype=_NUMPY_DTYPES[storage_type], offset=offset).astype(np.float32) * scale
+        )
+    return np.frombuffer(data, dtype=_NUMPY_DTYPES[storage_type], offset=offset)
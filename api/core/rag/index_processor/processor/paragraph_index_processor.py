@@ -120,8 +120,8 @@ class ParagraphIndexProcessor(BaseIndexProcessor):
         docs = []
         for result in results:
             metadata = result.metadata
-            metadata["score"] = result.score
-            if result.score > score_threshold:
+            metadata["score"] = metadata.get("score") or 0.0
+            if metadata["score"] > score_threshold:
                 doc = Document(page_content=result.page_content, metadata=metadata)
                 docs.append(doc)
         return docs
@@ -1,12 +1,12 @@
+import functools
 import json
+import logging
 import math
 import re
-import threading
 from collections import Counter, defaultdict
-from collections.abc import Generator, Mapping
+from collections.abc import Callable, Generator, Mapping
 from typing import Any, Optional, Union, cast
 
-from flask import Flask, current_app
 from sqlalchemy import Float, and_, or_, text
 from sqlalchemy import cast as sqlalchemy_cast
 
@@ -38,10 +38,11 @@ from core.rag.datasource.retrieval_service import RetrievalService
 from core.rag.entities.citation_metadata import RetrievalSourceMetadata
 from core.rag.entities.context_entities import DocumentContext
 from core.rag.entities.metadata_entities import Condition, MetadataCondition
-from core.rag.index_processor.constant.index_type import IndexType
 from core.rag.models.document import Document
 from core.rag.rerank.rerank_type import RerankMode
+from core.rag.retrieval.retrieval_executor import RetrievalExecutor
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
+from core.rag.retrieval.retrieval_stats import RetrievalStats
 from core.rag.retrieval.router.multi_dataset_function_call_router import FunctionCallMultiDatasetRouter
 from core.rag.retrieval.router.multi_dataset_react_route import ReactMultiDatasetRouter
 from core.rag.retrieval.template_prompts import (
@@ -56,10 +57,12 @@ from core.rag.retrieval.template_prompts import (
 from core.tools.utils.dataset_retriever.dataset_retriever_base_tool import DatasetRetrieverBaseTool
 from extensions.ext_database import db
 from libs.json_in_md_parser import parse_and_check_json_markdown
-from models.dataset import ChildChunk, Dataset, DatasetMetadata, DatasetQuery, DocumentSegment
+from models.dataset import Dataset, DatasetMetadata
 from models.dataset import Document as DatasetDocument
 from services.external_knowledge_service import ExternalDatasetService
 
+logger = logging.getLogger(__name__)
+
 default_retrieval_model: dict[str, Any] = {
     "search_method": RetrievalMethod.SEMANTIC_SEARCH.value,
     "reranking_enable": False,
@@ -420,7 +423,7 @@ class DatasetRetrieval:
     ):
         if not available_datasets:
             return []
-        threads = []
+        searches: list[tuple[str, Callable[[], list[Document]]]] = []
         all_documents: list[Document] = []
         dataset_ids = [dataset.id for dataset in available_datasets]
         index_type_check = all(
@@ -466,22 +469,29 @@ class DatasetRetrieval:
                         document_ids_filter = document_ids
                     else:
                         continue
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset.id,
-                    "query": query,
-                    "top_k": top_k,
-                    "all_documents": all_documents,
-                    "document_ids_filter": document_ids_filter,
-                    "metadata_condition": metadata_condition,
-                },
+            searches.append(
+                (
+                    dataset.id,
+                    functools.partial(
+                        self._retriever,
+                        dataset_id=dataset.id,
+                        query=query,
+                        top_k=top_k,
+                        document_ids_filter=document_ids_filter,
+                        metadata_condition=metadata_condition,
+                    ),
+                )
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+        # datasets that failed or timed out are left out of the results
+        futures = RetrievalExecutor.get_instance().run(tenant_id, searches)
+        for (dataset_id, _), future in zip(searches, futures):
+            if not future.done() or future.cancelled():
+                continue
+            exception = future.exception()
+            if exception:
+                logger.error(f"Failed to retrieve from dataset {dataset_id}", exc_info=exception)
+            else:
+                all_documents.extend(future.result())
 
         with measure_time() as timer:
             if reranking_enable:
@@ -508,50 +518,7 @@ class DatasetRetrieval:
         self, documents: list[Document], message_id: Optional[str] = None, timer: Optional[dict] = None
     ) -> None:
         """Handle retrieval end."""
-        dify_documents = [document for document in documents if document.provider == "dify"]
-        for document in dify_documents:
-            if document.metadata is not None:
-                dataset_document = (
-                    db.session.query(DatasetDocument)
-                    .filter(DatasetDocument.id == document.metadata["document_id"])
-                    .first()
-                )
-                if dataset_document:
-                    if dataset_document.doc_form == IndexType.PARENT_CHILD_INDEX:
-                        child_chunk = (
-                            db.session.query(ChildChunk)
-                            .filter(
-                                ChildChunk.index_node_id == document.metadata["doc_id"],
-                                ChildChunk.dataset_id == dataset_document.dataset_id,
-                                ChildChunk.document_id == dataset_document.id,
-                            )
-                            .first()
-                        )
-                        if child_chunk:
-                            segment = (
-                                db.session.query(DocumentSegment)
-                                .filter(DocumentSegment.id == child_chunk.segment_id)
-                                .update(
-                                    {DocumentSegment.hit_count: DocumentSegment.hit_count + 1},
-                                    synchronize_session=False,
-                                )
-                            )
-                            db.session.commit()
-                    else:
-                        query = db.session.query(DocumentSegment).filter(
-                            DocumentSegment.index_node_id == document.metadata["doc_id"]
-                        )
-
-                        # if 'dataset_id' in document.metadata:
-                        if "dataset_id" in document.metadata:
-                            query = query.filter(DocumentSegment.dataset_id == document.metadata["dataset_id"])
-
-                        # add hit count to document segment
-                        query.update(
-                            {DocumentSegment.hit_count: DocumentSegment.hit_count + 1}, synchronize_session=False
-                        )
-
-                    db.session.commit()
+        RetrievalStats.record_segment_hits(document for document in documents if document.provider == "dify")
 
         # get tracing instance
         trace_manager: TraceQueueManager | None = (
@@ -570,92 +537,84 @@ class DatasetRetrieval:
         """
         if not query:
             return
-        dataset_queries = []
-        for dataset_id in dataset_ids:
-            dataset_query = DatasetQuery(
-                dataset_id=dataset_id,
-                content=query,
-                source="app",
-                source_app_id=app_id,
-                created_by_role=user_from,
-                created_by=user_id,
-            )
-            dataset_queries.append(dataset_query)
-        if dataset_queries:
-            db.session.add_all(dataset_queries)
-        db.session.commit()
+        RetrievalStats.record_dataset_queries(
+            dataset_ids,
+            content=query,
+            source="app",
+            source_app_id=app_id,
+            created_by_role=user_from,
+            created_by=user_id,
+        )
 
     def _retriever(
         self,
-        flask_app: Flask,
         dataset_id: str,
         query: str,
         top_k: int,
-        all_documents: list,
         document_ids_filter: Optional[list[str]] = None,
         metadata_condition: Optional[MetadataCondition] = None,
-    ):
-        with flask_app.app_context():
-            dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+    ) -> list[Document]:
+        dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
 
-            if not dataset:
-                return []
+        if not dataset:
+            return []
 
-            if dataset.provider == "external":
-                external_documents = ExternalDatasetService.fetch_external_knowledge_retrieval(
-                    tenant_id=dataset.tenant_id,
-                    dataset_id=dataset_id,
+        if dataset.provider == "external":
+            all_documents = []
+            external_documents = ExternalDatasetService.fetch_external_knowledge_retrieval(
+                tenant_id=dataset.tenant_id,
+                dataset_id=dataset_id,
+                query=query,
+                external_retrieval_parameters=dataset.retrieval_model,
+                metadata_condition=metadata_condition,
+            )
+            for external_document in external_documents:
+                document = Document(
+                    page_content=external_document.get("content"),
+                    metadata=external_document.get("metadata"),
+                    provider="external",
+                )
+                if document.metadata is not None:
+                    document.metadata["score"] = external_document.get("score")
+                    document.metadata["title"] = external_document.get("title")
+                    document.metadata["dataset_id"] = dataset_id
+                    document.metadata["dataset_name"] = dataset.name
+                all_documents.append(document)
+            return all_documents
+
+        # get retrieval model , if the model is not setting , using default
+        retrieval_model = dataset.retrieval_model or default_retrieval_model
+
+        if dataset.indexing_technique == "economy":
+            # use keyword table query
+            return (
+                RetrievalService.retrieve(
+                    retrieval_method="keyword_search",
+                    dataset_id=dataset.id,
                     query=query,
-                    external_retrieval_parameters=dataset.retrieval_model,
-                    metadata_condition=metadata_condition,
+                    top_k=top_k,
+                    document_ids_filter=document_ids_filter,
                 )
-                for external_document in external_documents:
-                    document = Document(
-                        page_content=external_document.get("content"),
-                        metadata=external_document.get("metadata"),
-                        provider="external",
-                    )
-                    if document.metadata is not None:
-                        document.metadata["score"] = external_document.get("score")
-                        document.metadata["title"] = external_document.get("title")
-                        document.metadata["dataset_id"] = dataset_id
-                        document.metadata["dataset_name"] = dataset.name
-                    all_documents.append(document)
-            else:
-                # get retrieval model , if the model is not setting , using default
-                retrieval_model = dataset.retrieval_model or default_retrieval_model
-
-                if dataset.indexing_technique == "economy":
-                    # use keyword table query
-                    documents = RetrievalService.retrieve(
-                        retrieval_method="keyword_search",
-                        dataset_id=dataset.id,
-                        query=query,
-                        top_k=top_k,
-                        document_ids_filter=document_ids_filter,
-                    )
-                    if documents:
-                        all_documents.extend(documents)
-                else:
-                    if top_k > 0:
-                        # retrieval source
-                        documents = RetrievalService.retrieve(
-                            retrieval_method=retrieval_model["search_method"],
-                            dataset_id=dataset.id,
-                            query=query,
-                            top_k=retrieval_model.get("top_k") or 2,
-                            score_threshold=retrieval_model.get("score_threshold", 0.0)
-                            if retrieval_model["score_threshold_enabled"]
-                            else 0.0,
-                            reranking_model=retrieval_model.get("reranking_model", None)
-                            if retrieval_model["reranking_enable"]
-                            else None,
-                            reranking_mode=retrieval_model.get("reranking_mode") or "reranking_model",
-                            weights=retrieval_model.get("weights", None),
-                            document_ids_filter=document_ids_filter,
-                        )
-
-                        all_documents.extend(documents)
+                or []
+            )
+        if top_k <= 0:
+            return []
+        # retrieval source
+        return RetrievalService.retrieve(
+            retrieval_method=retrieval_model["search_method"],
+            dataset_id=dataset.id,
+            query=query,
+            top_k=retrieval_model.get("top_k") or 2,
+            score_threshold=retrieval_model.get("score_threshold", 0.0)
+            if retrieval_model["score_threshold_enabled"]
+            else 0.0,
+            reranking_model=retrieval_model.get("reranking_model", None)
+            if retrieval_model["reranking_enable"]
+            else None,
+            reranking_mode=retrieval_model.get("reranking_mode") or "reranking_model",
+            weights=retrieval_model.get("weights", None),
+            document_ids_filter=document_ids_filter,
+        )
 
     def to_dataset_retriever_tool(
         self,
@@ -0,0 +1,96 @@
+import concurrent.futures
+import logging
+import threading
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future
+from typing import Any, Optional
+
+from flask import Flask, current_app
+
+from configs import dify_config
+from core.helper.fork_safe_singleton import ForkSafeSingleton
+from core.helper.task_scheduler import TaskGroup, TaskScheduler
+
+logger = logging.getLogger(__name__)
+
+# share of the time left to a search that the searches it runs may take, the rest is left to collect their results
+NESTED_TIMEOUT_RATIO = 0.9
+
+
+class RetrievalExecutor:
+    """
+    Process-wide worker pool running the dataset searches of retrievals.
+
+    Searches run on the long-lived workers of a dedicated TaskScheduler, limited globally by
+    RETRIEVAL_EXECUTOR_MAX_WORKERS and per tenant by RETRIEVAL_EXECUTOR_MAX_WORKERS_PER_TENANT, each one in a new
+    app context of the flask app. `run` waits for the searches until a deadline, searches still pending then are
+    cancelled and searches still running are ignored, so that a slow vector store only drops its own results.
+    Searches run by a search wait until a deadline within the one of their parent, so that the parent still gets
+    their partial results.
+    """
+
+    def __init__(self, max_workers: int, max_workers_per_tenant: int = 0) -> None:
+        self._scheduler = TaskScheduler(
+            max_workers=max_workers, max_workers_per_tenant=max_workers_per_tenant, thread_name_prefix="Retrieval"
+        )
+        self._local = threading.local()
+
+    @staticmethod
+    def get_instance() -> "RetrievalExecutor":
+        # worker threads do not survive a fork, forked children start a new executor
+        return _instance.get()
+
+    def run(
+        self,
+        tenant_id: str,
+        tasks: Sequence[tuple[str, Callable[[], Any]]],
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> list[Future]:
+        """
+        Run searches, given as (dataset id, function) pairs, and wait for them until the timeout.
+        Must be called in an app context, searches run in an app context of the same app.
+        :param max_workers: maximum number of the searches running at the same time, all of them by default
+        :param timeout: timeout in seconds, RETRIEVAL_EXECUTOR_TIMEOUT by default, limited to a share of the time
+            left when called by a search
+        :return: the futures of the searches, those not done did not finish in time and must be ignored
+        """
+        if not tasks:
+            return []
+        if timeout is None:
+            timeout = dify_config.RETRIEVAL_EXECUTOR_TIMEOUT
+        parent_deadline = getattr(self._local, "deadline", None)
+        if parent_deadline is not None:
+            timeout = min(timeout, max(parent_deadline - time.monotonic(), 0) * NESTED_TIMEOUT_RATIO)
+        deadline = time.monotonic() + timeout
+
+        flask_app = current_app._get_current_object()  # type: ignore
+        group = TaskGroup(tenant_id=tenant_id, max_workers=max_workers or len(tasks), scheduler=self._scheduler)
+        futures = [group.submit(self._call, flask_app, fn, deadline) for _, fn in tasks]
+
+        # searches run by a search wait for them without holding its slot
+        with self._scheduler.blocking():
+            _, not_done = concurrent.futures.wait(futures, timeout=timeout)
+        for future, (dataset_id, _) in zip(futures, tasks):
+            if future in not_done:
+                future.cancel()
+                logger.warning(f"Search of dataset {dataset_id} timed out, its results are ignored")
+        return futures
+
+    def _call(self, flask_app: Flask, fn: Callable[[], Any], deadline: float) -> Any:
+        parent_deadline = getattr(self._local, "deadline", None)
+        self._local.deadline = deadline
+        try:
+            with flask_app.app_context():
+                return fn()
+        finally:
+            self._local.deadline = parent_deadline
+
+
+_instance = ForkSafeSingleton(
+    lambda: RetrievalExecutor(
+        max_workers=dify_config.RETRIEVAL_EXECUTOR_MAX_WORKERS,
+        max_workers_per_tenant=dify_config.RETRIEVAL_EXECUTOR_MAX_WORKERS_PER_TENANT,
+    )
+)
@@ -0,0 +1,230 @@
+import json
+import logging
+from collections import defaultdict
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import Integer, String, cast, column, insert, select, update, values
+
+from configs import dify_config
+from core.rag.index_processor.constant.index_type import IndexType
+from core.rag.models.document import Document
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.dataset import ChildChunk, DatasetQuery, DocumentSegment
+from models.dataset import Document as DatasetDocument
+from models.types import StringUUID
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_HITS_KEY = "dataset_retrieval_stats:segment_hits"
+DATASET_QUERIES_KEY = "dataset_retrieval_stats:dataset_queries"
+
+# (dataset id or empty, document id, index node id) of a retrieved document
+SegmentHitKey = tuple[str, str, str]
+
+
+class RetrievalStats:
+    """
+    Hit counts of retrieved segments and dataset queries recorded after retrievals.
+
+    With DATASET_RETRIEVAL_STATS_BUFFER_ENABLED they are buffered in redis, off the request path, and written
+    by the flush_dataset_retrieval_stats_task as grouped updates and bulk inserts. Otherwise they are written
+    right away, also grouped.
+    """
+
+    @classmethod
+    def record_segment_hits(cls, documents: Iterable[Document]) -> None:
+        hits: dict[SegmentHitKey, int] = defaultdict(int)
+        for document in documents:
+            metadata = document.metadata
+            if not metadata or not metadata.get("document_id") or not metadata.get("doc_id"):
+                continue
+            hits[(metadata.get("dataset_id") or "", metadata["document_id"], metadata["doc_id"])] += 1
+        if not hits:
+            return
+
+        if not dify_config.DATASET_RETRIEVAL_STATS_BUFFER_ENABLED:
+            cls._write_segment_hits(hits)
+            return
+
+        pipeline = redis_client.pipeline(transaction=False)
+        for key, count in hits.items():
+            pipeline.hincrby(SEGMENT_HITS_KEY, ":".join(key), count)
+        pipeline.execute()
+
+    @classmethod
+    def record_dataset_queries(
+        cls,
+        dataset_ids: Sequence[str],
+        content: str,
+        source: str,
+        source_app_id: str,
+        created_by_role: str,
+        created_by: str,
+    ) -> None:
+        if not dataset_ids:
+            return
+        created_at = datetime.now(UTC).replace(tzinfo=None)
+        rows = [
+            {
+                "dataset_id": dataset_id,
+                "content": content,
+                "source": source,
+                "source_app_id": source_app_id,
+                "created_by_role": created_by_role,
+                "created_by": created_by,
+                "created_at": created_at,
+            }
+            for dataset_id in dataset_ids
+        ]
+
+        if not dify_config.DATASET_RETRIEVAL_STATS_BUFFER_ENABLED:
+            cls._write_dataset_queries(rows)
+            return
+
+        redis_client.rpush(DATASET_QUERIES_KEY, *(cls._dump_dataset_query(row) for row in rows))
+
+    @classmethod
+    def flush(cls) -> tuple[int, int]:
+        """
+        Write the buffered hit counts and dataset queries.
+        Stats that fail to be written are buffered again.
+        :return: the number of segment hit keys and of dataset queries written
+        """
+        pipeline = redis_client.pipeline(transaction=True)
+        pipeline.hgetall(SEGMENT_HITS_KEY)
+        pipeline.delete(SEGMENT_HITS_KEY)
+        buffered_hits, _ = pipeline.execute()
+        hits: dict[SegmentHitKey, int] = {}
+        for field, count in buffered_hits.items():
+            field = field.decode("utf-8") if isinstance(field, bytes) else field
+            dataset_id, document_id, index_node_id = field.split(":", 2)
+            hits[(dataset_id, document_id, index_node_id)] = int(count)
+        if hits:
+            try:
+                cls._write_segment_hits(hits)
+            except Exception:
+                db.session.rollback()
+                pipeline = redis_client.pipeline(transaction=False)
+                for key, count in hits.items():
+                    pipeline.hincrby(SEGMENT_HITS_KEY, ":".join(key), count)
+                pipeline.execute()
+                raise
+
+        batch_size = dify_config.DATASET_RETRIEVAL_STATS_FLUSH_BATCH_SIZE
+        written_queries = 0
+        while True:
+            pipeline = redis_client.pipeline(transaction=True)
+            pipeline.lrange(DATASET_QUERIES_KEY, 0, batch_size - 1)
+            pipeline.ltrim(DATASET_QUERIES_KEY, batch_size, -1)
+            buffered_queries, _ = pipeline.execute()
+            if not buffered_queries:
+                break
+            try:
+                cls._write_dataset_queries([cls._load_dataset_query(query) for query in buffered_queries])
+            except Exception:
+                db.session.rollback()
+                redis_client.rpush(DATASET_QUERIES_KEY, *buffered_queries)
+                raise
+            written_queries += len(buffered_queries)
+            if len(buffered_queries) < batch_size:
+                break
+
+        return len(hits), written_queries
+
+    @classmethod
+    def _write_segment_hits(cls, hits: Mapping[SegmentHitKey, int]) -> None:
+        segment_hits = cls._resolve_segment_hits(hits)
+        if segment_hits:
+            # the update locks rows in the order of its join plan, lock them in the order of their ids first so
+            # that concurrent writes of overlapping segments wait for each other instead of deadlocking
+            db.session.execute(
+                select(DocumentSegment.id)
+                .where(DocumentSegment.id.in_(segment_hits))
+                .order_by(DocumentSegment.id)
+                .with_for_update()
+            )
+            hits_values = values(column("segment_id", String), column("hits", Integer), name="segment_hits").data(
+                sorted(segment_hits.items())
+            )
+            db.session.execute(
+                update(DocumentSegment)
+                .where(DocumentSegment.id == cast(hits_values.c.segment_id, StringUUID))
+                .values(hit_count=DocumentSegment.hit_count + hits_values.c.hits)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+
+    @classmethod
+    def _resolve_segment_hits(cls, hits: Mapping[SegmentHitKey, int]) -> dict[str, int]:
+        """
+        Map the hits of retrieved documents to the segments they belong to, child chunks of parent-child
+        documents count for their parent segment.
+        """
+        doc_forms: dict[str, str] = dict(
+            db.session.execute(
+                select(DatasetDocument.id, DatasetDocument.doc_form).where(
+                    DatasetDocument.id.in_({document_id for _, document_id, _ in hits})
+                )
+            )
+            .tuples()
+            .all()
+        )
+
+        child_hits: dict[tuple[str, str], int] = {}
+        node_hits: dict[SegmentHitKey, int] = {}
+        for (dataset_id, document_id, index_node_id), count in hits.items():
+            if document_id not in doc_forms:
+                logger.warning(
+                    "Expected DatasetDocument record to exist, but none was found, document_id=%s", document_id
+                )
+            elif doc_forms[document_id] == IndexType.PARENT_CHILD_INDEX:
+                child_hits[(document_id, index_node_id)] = count
+            else:
+                node_hits[(dataset_id, document_id, index_node_id)] = count
+
+        segment_hits: dict[str, int] = defaultdict(int)
+        if child_hits:
+            child_chunks = db.session.execute(
+                select(ChildChunk.document_id, ChildChunk.index_node_id, ChildChunk.segment_id).where(
+                    ChildChunk.document_id.in_({document_id for document_id, _ in child_hits}),
+                    ChildChunk.index_node_id.in_({index_node_id for _, index_node_id in child_hits}),
+                )
+            ).all()
+            for document_id, index_node_id, segment_id in child_chunks:
+                if (document_id, index_node_id) in child_hits:
+                    segment_hits[segment_id] += child_hits[(document_id, index_node_id)]
+
+        if node_hits:
+            segments = db.session.execute(
+                select(DocumentSegment.id, DocumentSegment.dataset_id, DocumentSegment.index_node_id).where(
+                    DocumentSegment.index_node_id.in_({index_node_id for _, _, index_node_id in node_hits})
+                )
+            ).all()
+            segments_by_node: dict[str, list[tuple[str, str]]] = defaultdict(list)
+            for segment_id, dataset_id, index_node_id in segments:
+                segments_by_node[index_node_id].append((segment_id, dataset_id))
+            for (dataset_id, _, index_node_id), count in node_hits.items():
+                for segment_id, segment_dataset_id in segments_by_node[index_node_id]:
+                    # documents without a dataset id count for every segment of the index node
+                    if not dataset_id or dataset_id == segment_dataset_id:
+                        segment_hits[segment_id] += count
+
+        return segment_hits
+
+    @staticmethod
+    def _write_dataset_queries(rows: Sequence[Mapping[str, Any]]) -> None:
+        db.session.execute(insert(DatasetQuery), rows)
+        db.session.commit()
+
+    @staticmethod
+    def _dump_dataset_query(row: Mapping[str, Any]) -> str:
+        return json.dumps({**row, "created_at": row["created_at"].isoformat()})
+
+    @staticmethod
+    def _load_dataset_query(data: bytes | str) -> dict[str, Any]:
+        row: dict[str, Any] = json.loads(data)
+        row["created_at"] = datetime.fromisoformat(row["created_at"])
+        return row
@@ -4,14 +4,17 @@ SQLAlchemy implementation of the WorkflowNodeExecutionRepository.
 
 import json
 import logging
+import threading
 from collections.abc import Sequence
-from typing import Optional, Union
+from typing import Any, Optional, Union
 
-from sqlalchemy import UnaryExpression, asc, delete, desc, select
+from sqlalchemy import UnaryExpression, asc, delete, desc, insert, inspect, select, update
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
 
+from configs import dify_config
 from core.model_runtime.utils.encoders import jsonable_encoder
+from core.repositories.workflow_node_execution_flusher import WorkflowNodeExecutionFlusher
 from core.workflow.entities.workflow_node_execution import (
     WorkflowNodeExecution,
     WorkflowNodeExecutionMetadataKey,
@@ -40,6 +43,11 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
 
     This implementation also includes an in-memory cache for node executions to improve
     performance by reducing database queries.
+
+    In write-behind mode, saved executions are buffered and coalesced per execution instead of being
+    committed one by one, and written in bulk by a background thread every
+    WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL, when the buffer is full, before reading executions of a
+    workflow run, or when `flush` is called at the end of the run.
     """
 
     def __init__(
@@ -48,6 +56,7 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         user: Union[Account, EndUser],
         app_id: Optional[str],
         triggered_from: Optional[WorkflowNodeExecutionTriggeredFrom],
+        write_behind: Optional[bool] = None,
     ):
         """
         Initialize the repository with a SQLAlchemy sessionmaker or engine and context information.
@@ -57,6 +66,7 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
             user: Account or EndUser object containing tenant_id, user ID, and role information
             app_id: App ID for filtering by application (can be None)
             triggered_from: Source of the execution trigger (SINGLE_STEP or WORKFLOW_RUN)
+            write_behind: Whether to buffer saved executions, defaults to WORKFLOW_NODE_EXECUTION_WRITE_MODE
         """
         # If an engine is provided, create a sessionmaker from it
         if isinstance(session_factory, Engine):
@@ -88,6 +98,17 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         # Key: node_execution_id, Value: WorkflowNodeExecution (DB model)
         self._node_execution_cache: dict[str, WorkflowNodeExecutionModel] = {}
 
+        # Write-behind buffer
+        # Key: id, Value: latest WorkflowNodeExecution (DB model) not written to the database yet
+        if write_behind is None:
+            write_behind = dify_config.WORKFLOW_NODE_EXECUTION_WRITE_MODE == "write_behind"
+        self._write_behind = write_behind
+        self._pending_writes: dict[str, WorkflowNodeExecutionModel] = {}
+        # ids of the executions known to exist in the database, which are updated instead of inserted
+        self._persisted_ids: set[str] = set()
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
     def _to_domain_model(self, db_model: WorkflowNodeExecutionModel) -> WorkflowNodeExecution:
         """
         Convert a database model to a domain model.
@@ -194,18 +215,78 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         # Convert domain model to database model using tenant context and other attributes
         db_model = self.to_db_model(execution)
 
-        # Create a new database session
-        with self._session_factory() as session:
-            # SQLAlchemy merge intelligently handles both insert and update operations
-            # based on the presence of the primary key
-            session.merge(db_model)
-            session.commit()
+        if self._write_behind:
+            self._buffer_write(db_model)
+        else:
+            # Create a new database session
+            with self._session_factory() as session:
+                # SQLAlchemy merge intelligently handles both insert and update operations
+                # based on the presence of the primary key
+                session.merge(db_model)
+                session.commit()
+
+        # Update the in-memory cache for faster subsequent lookups
+        # Only cache if we have a node_execution_id to use as the cache key
+        if db_model.node_execution_id:
+            logger.debug(f"Updating cache for node_execution_id: {db_model.node_execution_id}")
+            self._node_execution_cache[db_model.node_execution_id] = db_model
+
+    def _buffer_write(self, db_model: WorkflowNodeExecutionModel) -> None:
+        with self._pending_lock:
+            # a later save of the same execution replaces the buffered one
+            self._pending_writes[db_model.id] = db_model
+            buffer_full = len(self._pending_writes) >= dify_config.WORKFLOW_NODE_EXECUTION_MAX_BUFFER_SIZE
+
+        if buffer_full:
+            # the buffer is bounded, the saving thread writes it when it is full
+            self.flush()
+        else:
+            WorkflowNodeExecutionFlusher.get_instance().register(self)
+
+    def flush(self) -> None:
+        """
+        Write the buffered executions to the database in one transaction.
 
-            # Update the in-memory cache for faster subsequent lookups
-            # Only cache if we have a node_execution_id to use as the cache key
-            if db_model.node_execution_id:
-                logger.debug(f"Updating cache for node_execution_id: {db_model.node_execution_id}")
-                self._node_execution_cache[db_model.node_execution_id] = db_model
+        New executions are inserted and known ones updated in bulk. If writing fails, the executions stay
+        buffered unless they were saved again in the meantime, and the error is raised.
+        """
+        with self._flush_lock:
+            with self._pending_lock:
+                pending_writes = self._pending_writes
+                self._pending_writes = {}
+            if not pending_writes:
+                return
+
+            inserts: list[dict[str, Any]] = []
+            updates: list[dict[str, Any]] = []
+            for execution_id, db_model in pending_writes.items():
+                values = self._to_column_values(db_model)
+                if execution_id in self._persisted_ids:
+                    updates.append(values)
+                else:
+                    inserts.append(values)
+
+            try:
+                with self._session_factory() as session:
+                    if inserts:
+                        session.execute(insert(WorkflowNodeExecutionModel), inserts)
+                    if updates:
+                        session.execute(update(WorkflowNodeExecutionModel), updates)
+                    session.commit()
+            except Exception:
+                with self._pending_lock:
+                    for execution_id, db_model in pending_writes.items():
+                        self._pending_writes.setdefault(execution_id, db_model)
+                raise
+
+            self._persisted_ids.update(pending_writes)
+            logger.debug(f"Flushed {len(inserts)} new and {len(updates)} updated workflow node executions")
+
+    @staticmethod
+    def _to_column_values(db_model: WorkflowNodeExecutionModel) -> dict[str, Any]:
+        # only the columns set on the model, so that unset columns keep their defaults on insert
+        state = inspect(db_model)
+        return {attr.key: state.dict[attr.key] for attr in state.mapper.column_attrs if attr.key in state.dict}
 
     def get_by_node_execution_id(self, node_execution_id: str) -> Optional[WorkflowNodeExecution]:
         """
@@ -242,6 +323,7 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
             if db_model:
                 # Add DB model to cache
                 self._node_execution_cache[node_execution_id] = db_model
+                self._persisted_ids.add(db_model.id)
 
                 # Convert to domain model and return
                 return self._to_domain_model(db_model)
@@ -269,6 +351,8 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         Returns:
             A list of WorkflowNodeExecution database models
         """
+        # make the buffered executions visible to the query
+        self.flush()
         with self._session_factory() as session:
             stmt = select(WorkflowNodeExecutionModel).where(
                 WorkflowNodeExecutionModel.workflow_run_id == workflow_run_id,
@@ -300,6 +384,7 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
             for model in db_models:
                 if model.node_execution_id:
                     self._node_execution_cache[model.node_execution_id] = model
+                self._persisted_ids.add(model.id)
 
             return db_models
 
@@ -347,6 +432,8 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
         Returns:
             A list of running NodeExecution instances
         """
+        # make the buffered executions visible to the query
+        self.flush()
         with self._session_factory() as session:
             stmt = select(WorkflowNodeExecutionModel).where(
                 WorkflowNodeExecutionModel.workflow_run_id == workflow_run_id,
@@ -365,6 +452,7 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
                 # Update cache if node_execution_id is present
                 if model.node_execution_id:
                     self._node_execution_cache[model.node_execution_id] = model
+                self._persisted_ids.add(model.id)
 
                 # Convert to domain model
                 domain_model = self._to_domain_model(model)
@@ -395,6 +483,9 @@ class SQLAlchemyWorkflowNodeExecutionRepository(WorkflowNodeExecutionRepository)
                 + (f" and app {self._app_id}" if self._app_id else "")
             )
 
-            # Clear the in-memory cache
+            # Clear the in-memory cache and the executions not written yet
             self._node_execution_cache.clear()
+            with self._pending_lock:
+                self._pending_writes.clear()
+            self._persisted_ids.clear()
             logger.info("Cleared in-memory node execution cache")
@@ -0,0 +1,78 @@
+"""
+Background flushing of workflow node executions buffered by write-behind repositories.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from configs import dify_config
+from core.helper.fork_safe_singleton import ForkSafeSingleton
+
+if TYPE_CHECKING:
+    from core.repositories.sqlalchemy_workflow_node_execution_repository import (
+        SQLAlchemyWorkflowNodeExecutionRepository,
+    )
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowNodeExecutionFlusher:
+    """
+    Process-wide thread writing the node executions buffered by write-behind repositories.
+
+    Repositories register themselves when they buffer a write and are held until their buffer is written,
+    so buffered executions are not lost when a repository is dropped before the end of its workflow run.
+    Repositories that fail to flush stay registered and are retried on the next tick.
+    """
+
+    def __init__(self, flush_interval: float) -> None:
+        self._flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._repositories: set[SQLAlchemyWorkflowNodeExecutionRepository] = set()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def get_instance() -> "WorkflowNodeExecutionFlusher":
+        # the flushing thread does not survive a fork, the buffers copied from the parent are flushed by the parent
+        return _instance.get()
+
+    @staticmethod
+    def _flush_at_exit() -> None:
+        instance = _instance.peek()
+        if instance is not None:
+            instance.flush_all()
+
+    def register(self, repository: "SQLAlchemyWorkflowNodeExecutionRepository") -> None:
+        with self._lock:
+            self._repositories.add(repository)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="WorkflowNodeExecutionFlusher", daemon=True)
+                self._thread.start()
+
+    def flush_all(self) -> None:
+        with self._lock:
+            repositories = list(self._repositories)
+            self._repositories.clear()
+
+        for repository in repositories:
+            try:
+                repository.flush()
+            except Exception:
+                logger.exception("Failed to flush workflow node executions, retrying on the next flush")
+                with self._lock:
+                    self._repositories.add(repository)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self._flush_interval)
+            self.flush_all()
+
+
+_instance = ForkSafeSingleton(
+    lambda: WorkflowNodeExecutionFlusher(flush_interval=dify_config.WORKFLOW_NODE_EXECUTION_FLUSH_INTERVAL)
+)
+
+atexit.register(WorkflowNodeExecutionFlusher._flush_at_exit)
@@ -1,7 +1,7 @@
-import threading
+import functools
+import logging
 from typing import Any
 
-from flask import Flask, current_app
 from pydantic import BaseModel, Field
 
 from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
@@ -11,11 +11,14 @@ from core.rag.datasource.retrieval_service import RetrievalService
 from core.rag.entities.citation_metadata import RetrievalSourceMetadata
 from core.rag.models.document import Document as RagDocument
 from core.rag.rerank.rerank_model import RerankModelRunner
+from core.rag.retrieval.retrieval_executor import RetrievalExecutor
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from core.tools.utils.dataset_retriever.dataset_retriever_base_tool import DatasetRetrieverBaseTool
 from extensions.ext_database import db
 from models.dataset import Dataset, Document, DocumentSegment
 
+logger = logging.getLogger(__name__)
+
 default_retrieval_model: dict[str, Any] = {
     "search_method": RetrievalMethod.SEMANTIC_SEARCH.value,
     "reranking_enable": False,
@@ -46,23 +49,26 @@ class DatasetMultiRetrieverTool(DatasetRetrieverBaseTool):
         )
 
     def _run(self, query: str) -> str:
-        threads = []
-        all_documents: list[RagDocument] = []
-        for dataset_id in self.dataset_ids:
-            retrieval_thread = threading.Thread(
-                target=self._retriever,
-                kwargs={
-                    "flask_app": current_app._get_current_object(),  # type: ignore
-                    "dataset_id": dataset_id,
-                    "query": query,
-                    "all_documents": all_documents,
-                    "hit_callbacks": self.hit_callbacks,
-                },
+        searches = [
+            (
+                dataset_id,
+                functools.partial(
+                    self._retriever, dataset_id=dataset_id, query=query, hit_callbacks=self.hit_callbacks
+                ),
             )
-            threads.append(retrieval_thread)
-            retrieval_thread.start()
-        for thread in threads:
-            thread.join()
+            for dataset_id in self.dataset_ids
+        ]
+        all_documents: list[RagDocument] = []
+        # datasets that failed or timed out are left out of the results
+        futures = RetrievalExecutor.get_instance().run(self.tenant_id, searches)
+        for (dataset_id, _), future in zip(searches, futures):
+            if not future.done() or future.cancelled():
+                continue
+            exception = future.exception()
+            if exception:
+                logger.error(f"Failed to retrieve from dataset {dataset_id}", exc_info=exception)
+            else:
+                all_documents.extend(future.result())
         # do rerank for searched documents
         model_manager = ModelManager()
         rerank_model_instance = model_manager.get_model_instance(
@@ -155,52 +161,48 @@ class DatasetMultiRetrieverTool(DatasetRetrieverBaseTool):
 
     def _retriever(
         self,
-        flask_app: Flask,
         dataset_id: str,
         query: str,
-        all_documents: list,
         hit_callbacks: list[DatasetIndexToolCallbackHandler],
-    ):
-        with flask_app.app_context():
-            dataset = (
-                db.session.query(Dataset).filter(Dataset.tenant_id == self.tenant_id, Dataset.id == dataset_id).first()
-            )
+    ) -> list[RagDocument]:
+        dataset = (
+            db.session.query(Dataset).filter(Dataset.tenant_id == self.tenant_id, Dataset.id == dataset_id).first()
+        )
 
-            if not dataset:
-                return []
+        if not dataset:
+            return []
 
-            for hit_callback in hit_callbacks:
-                hit_callback.on_query(query, dataset.id)
+        for hit_callback in hit_callbacks:
+            hit_callback.on_query(query, dataset.id)
 
-            # get retrieval model , if the model is not setting , using default
-            retrieval_model = dataset.retrieval_model or default_retrieval_model
+        # get retrieval model , if the model is not setting , using default
+        retrieval_model = dataset.retrieval_model or default_retrieval_model
 
-            if dataset.indexing_technique == "economy":
-                # use keyword table query
-                documents = RetrievalService.retrieve(
+        if dataset.indexing_technique == "economy":
+            # use keyword table query
+            return (
+                RetrievalService.retrieve(
                     retrieval_method="keyword_search",
                     dataset_id=dataset.id,
                     query=query,
                     top_k=retrieval_model.get("top_k") or 2,
                 )
-                if documents:
-                    all_documents.extend(documents)
-            else:
-                if self.top_k > 0:
-                    # retrieval source
-                    documents = RetrievalService.retrieve(
-                        retrieval_method=retrieval_model["search_method"],
-                        dataset_id=dataset.id,
-                        query=query,
-                        top_k=retrieval_model.get("top_k") or 2,
-                        score_threshold=retrieval_model.get("score_threshold", 0.0)
-                        if retrieval_model["score_threshold_enabled"]
-                        else 0.0,
-                        reranking_model=retrieval_model.get("reranking_model", None)
-                        if retrieval_model["reranking_enable"]
-                        else None,
-                        reranking_mode=retrieval_model.get("reranking_mode") or "reranking_model",
-                        weights=retrieval_model.get("weights", None),
-                    )
-
-                    all_documents.extend(documents)
+                or []
+            )
+        if self.top_k <= 0:
+            return []
+        # retrieval source
+        return RetrievalService.retrieve(
+            retrieval_method=retrieval_model["search_method"],
+            dataset_id=dataset.id,
+            query=query,
+            top_k=retrieval_model.get("top_k") or 2,
+            score_threshold=retrieval_model.get("score_threshold", 0.0)
+            if retrieval_model["score_threshold_enabled"]
+            else 0.0,
+            reranking_model=retrieval_model.get("reranking_model", None)
+            if retrieval_model["reranking_enable"]
+            else None,
+            reranking_mode=retrieval_model.get("reranking_mode") or "reranking_model",
+            weights=retrieval_model.get("weights", None),
+        )
@@ -1,8 +1,13 @@
+import copy
+import hashlib
+import json
+import threading
 import uuid
 from collections import defaultdict
 from collections.abc import Mapping
 from typing import Any, Optional, cast
 
+from cachetools import LRUCache
 from pydantic import BaseModel, Field
 
 from configs import dify_config
@@ -13,6 +18,9 @@ from core.workflow.nodes.answer.entities import AnswerStreamGenerateRoute
 from core.workflow.nodes.end.end_stream_generate_router import EndStreamGeneratorRouter
 from core.workflow.nodes.end.entities import EndStreamParam
 
+_compiled_graph_cache: LRUCache = LRUCache(maxsize=dify_config.WORKFLOW_GRAPH_CACHE_SIZE or 1)
+_compiled_graph_cache_lock = threading.Lock()
+
 
 class GraphEdge(BaseModel):
     source_node_id: str = Field(..., description="source node id")
@@ -58,6 +66,63 @@ class Graph(BaseModel):
         """
         Init graph
 
+        Compiled graphs are cached by the content hash of the graph config, so repeated runs of the same
+        workflow version, and iteration or loop sub-graphs, share one compiled graph. Each call returns its own
+        copy of the mappings and stream routes, which the graph engine and stream processors change during a run.
+
+        :param graph_config: graph config
+        :param root_node_id: root node id
+        :return: graph
+        """
+        if not dify_config.WORKFLOW_GRAPH_CACHE_SIZE:
+            return cls._compile(graph_config=graph_config, root_node_id=root_node_id)
+
+        cache_key = cls._generate_cache_key(graph_config=graph_config, root_node_id=root_node_id)
+        with _compiled_graph_cache_lock:
+            graph = _compiled_graph_cache.get(cache_key)
+        if graph is None:
+            graph = cls._compile(graph_config=copy.deepcopy(graph_config), root_node_id=root_node_id)
+            with _compiled_graph_cache_lock:
+                _compiled_graph_cache[cache_key] = graph
+
+        return graph._copy_for_run()
+
+    def _copy_for_run(self) -> "Graph":
+        """
+        Copy the parts of a cached graph that are changed during a run
+
+        Node configs, edges and parallels themselves are not changed and stay shared with the cached graph.
+        """
+        return self.model_copy(
+            update={
+                "node_ids": list(self.node_ids),
+                "edge_mapping": {node_id: list(edges) for node_id, edges in self.edge_mapping.items()},
+                "reverse_edge_mapping": {node_id: list(edges) for node_id, edges in self.reverse_edge_mapping.items()},
+                "parallel_mapping": dict(self.parallel_mapping),
+                "node_parallel_mapping": dict(self.node_parallel_mapping),
+                "answer_stream_generate_routes": self.answer_stream_generate_routes.model_copy(deep=True),
+                "end_stream_param": self.end_stream_param.model_copy(deep=True),
+            }
+        )
+
+    @classmethod
+    def _generate_cache_key(cls, graph_config: Mapping[str, Any], root_node_id: Optional[str]) -> str:
+        content = json.dumps(
+            {
+                "graph": graph_config,
+                "root_node_id": root_node_id,
+                "parallel_depth_limit": dify_config.WORKFLOW_PARALLEL_DEPTH_LIMIT,
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def _compile(cls, graph_config: Mapping[str, Any], root_node_id: Optional[str] = None) -> "Graph":
+        """
+        Build graph from graph config
+
         :param graph_config: graph config
         :param root_node_id: root node id
         :return: graph
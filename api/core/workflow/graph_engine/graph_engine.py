@@ -4,8 +4,8 @@ import queue
 import time
 import uuid
 from collections.abc import Generator, Mapping
-from concurrent.futures import ThreadPoolExecutor, wait
-from copy import copy, deepcopy
+from concurrent.futures import wait
+from copy import copy
 from datetime import UTC, datetime
 from typing import Any, Optional, cast
 
@@ -14,6 +14,7 @@ from flask import Flask, current_app, has_request_context
 from configs import dify_config
 from core.app.apps.base_app_queue_manager import GenerateTaskStoppedError
 from core.app.entities.app_invoke_entities import InvokeFrom
+from core.helper.task_scheduler import TaskGroup
 from core.workflow.entities.node_entities import AgentNodeStrategyInit, NodeRunResult
 from core.workflow.entities.variable_pool import VariablePool, VariableValue
 from core.workflow.entities.workflow_node_execution import WorkflowNodeExecutionMetadataKey, WorkflowNodeExecutionStatus
@@ -42,6 +43,7 @@ from core.workflow.graph_engine.entities.graph import Graph, GraphEdge
 from core.workflow.graph_engine.entities.graph_init_params import GraphInitParams
 from core.workflow.graph_engine.entities.graph_runtime_state import GraphRuntimeState
 from core.workflow.graph_engine.entities.runtime_route_state import RouteNodeState
+from core.workflow.graph_engine.scheduler import GraphEngineScheduler
 from core.workflow.nodes import NodeType
 from core.workflow.nodes.agent.agent_node import AgentNode
 from core.workflow.nodes.agent.entities import AgentNodeData
@@ -59,16 +61,21 @@ from models.workflow import WorkflowType
 logger = logging.getLogger(__name__)
 
 
-class GraphEngineThreadPool(ThreadPoolExecutor):
+class GraphEngineThreadPool(TaskGroup):
+    """
+    Tasks of one workflow run on the process-wide GraphEngineScheduler.
+    """
+
     def __init__(
         self,
-        max_workers=None,
-        thread_name_prefix="",
-        initializer=None,
-        initargs=(),
-        max_submit_count=dify_config.MAX_SUBMIT_COUNT,
+        tenant_id: str,
+        max_workers: int = dify_config.WORKFLOW_PARALLEL_MAX_WORKERS,
+        max_submit_count: int = dify_config.MAX_SUBMIT_COUNT,
+        scheduler: Optional[GraphEngineScheduler] = None,
     ) -> None:
-        super().__init__(max_workers, thread_name_prefix, initializer, initargs)
+        super().__init__(
+            tenant_id=tenant_id, max_workers=max_workers, scheduler=scheduler or GraphEngineScheduler.get_instance()
+        )
         self.max_submit_count = max_submit_count
         self.submit_count = 0
 
@@ -107,7 +114,6 @@ class GraphEngine:
         thread_pool_id: Optional[str] = None,
     ) -> None:
         thread_pool_max_submit_count = dify_config.MAX_SUBMIT_COUNT
-        thread_pool_max_workers = 10
 
         # init thread pool
         if thread_pool_id:
@@ -118,9 +124,7 @@ class GraphEngine:
             self.thread_pool = GraphEngine.workflow_thread_pool_mapping[thread_pool_id]
             self.is_main_thread_pool = False
         else:
-            self.thread_pool = GraphEngineThreadPool(
-                max_workers=thread_pool_max_workers, max_submit_count=thread_pool_max_submit_count
-            )
+            self.thread_pool = GraphEngineThreadPool(tenant_id=tenant_id, max_submit_count=thread_pool_max_submit_count)
             self.thread_pool_id = str(uuid.uuid4())
             self.is_main_thread_pool = True
             GraphEngine.workflow_thread_pool_mapping[self.thread_pool_id] = self.thread_pool
@@ -495,28 +499,30 @@ class GraphEngine:
 
             futures.append(future)
 
-        succeeded_count = 0
-        while True:
-            try:
-                event = q.get(timeout=1)
-                if event is None:
-                    break
+        # hand the worker slot over to the branches while waiting for them when running in a branch itself
+        with self.thread_pool.scheduler.blocking():
+            succeeded_count = 0
+            while True:
+                try:
+                    event = q.get(timeout=1)
+                    if event is None:
+                        break
 
-                yield event
-                if not isinstance(event, BaseAgentEvent) and event.parallel_id == parallel_id:
-                    if isinstance(event, ParallelBranchRunSucceededEvent):
-                        succeeded_count += 1
-                        if succeeded_count == len(futures):
-                            q.put(None)
-
-                        continue
-                    elif isinstance(event, ParallelBranchRunFailedEvent):
-                        raise GraphRunFailedError(event.error)
-            except queue.Empty:
-                continue
+                    yield event
+                    if not isinstance(event, BaseAgentEvent) and event.parallel_id == parallel_id:
+                        if isinstance(event, ParallelBranchRunSucceededEvent):
+                            succeeded_count += 1
+                            if succeeded_count == len(futures):
+                                q.put(None)
+
+                            continue
+                        elif isinstance(event, ParallelBranchRunFailedEvent):
+                            raise GraphRunFailedError(event.error)
+                except queue.Empty:
+                    continue
 
-        # wait all threads
-        wait(futures)
+            # wait all threads
+            wait(futures)
 
         # get final node id
         final_node_id = parallel.end_to_node_id
@@ -895,7 +901,7 @@ class GraphEngine:
         """
         new_instance = copy(self)
         new_instance.graph_runtime_state = copy(self.graph_runtime_state)
-        new_instance.graph_runtime_state.variable_pool = deepcopy(self.graph_runtime_state.variable_pool)
+        new_instance.graph_runtime_state.variable_pool = self.graph_runtime_state.variable_pool.create_child()
         new_instance.graph_runtime_state.total_tokens = 0
         return new_instance
 
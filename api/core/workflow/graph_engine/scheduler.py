@@ -0,0 +1,24 @@
+from configs import dify_config
+from core.helper.fork_safe_singleton import ForkSafeSingleton
+from core.helper.task_scheduler import TaskScheduler
+
+
+class GraphEngineScheduler(TaskScheduler):
+    """
+    Process-wide task scheduler shared by all graph engine runs, limited globally by
+    WORKFLOW_SCHEDULER_MAX_WORKERS and per tenant by WORKFLOW_SCHEDULER_MAX_WORKERS_PER_TENANT.
+    """
+
+    @staticmethod
+    def get_instance() -> "GraphEngineScheduler":
+        # worker threads do not survive a fork, forked children start a new scheduler
+        return _instance.get()
+
+
+_instance = ForkSafeSingleton(
+    lambda: GraphEngineScheduler(
+        max_workers=dify_config.WORKFLOW_SCHEDULER_MAX_WORKERS,
+        max_workers_per_tenant=dify_config.WORKFLOW_SCHEDULER_MAX_WORKERS_PER_TENANT,
+        thread_name_prefix="GraphEngine",
+    )
+)
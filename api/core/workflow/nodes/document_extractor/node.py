@@ -3,9 +3,11 @@ import io
 import json
 import logging
 import os
+import shutil
 import tempfile
-from collections.abc import Mapping, Sequence
-from typing import Any, cast
+from collections.abc import Generator, Mapping, Sequence
+from contextlib import ExitStack, contextmanager
+from typing import IO, Any, cast
 
 import chardet
 import docx
@@ -22,7 +24,6 @@ from docx.text.paragraph import Paragraph
 
 from configs import dify_config
 from core.file import File, FileTransferMethod, file_manager
-from core.helper import ssrf_proxy
 from core.variables import ArrayFileSegment
 from core.variables.segments import FileSegment
 from core.workflow.entities.node_entities import NodeRunResult
@@ -105,7 +106,7 @@ class DocumentExtractorNode(BaseNode[DocumentExtractorNodeData]):
         return {node_id + ".files": node_data.variable_selector}
 
 
-def _extract_text_by_mime_type(*, file_content: bytes, mime_type: str) -> str:
+def _extract_text_by_mime_type(*, file_content: bytes | IO[bytes], mime_type: str) -> str:
     """Extract text from a file based on its MIME type."""
     match mime_type:
         case "text/plain" | "text/html" | "text/htm" | "text/markdown" | "text/xml":
@@ -142,7 +143,7 @@ def _extract_text_by_mime_type(*, file_content: bytes, mime_type: str) -> str:
             raise UnsupportedFileTypeError(f"Unsupported MIME type: {mime_type}")
 
 
-def _extract_text_by_file_extension(*, file_content: bytes, file_extension: str) -> str:
+def _extract_text_by_file_extension(*, file_content: bytes | IO[bytes], file_extension: str) -> str:
     """Extract text from a file based on its file extension."""
     match file_extension:
         case ".txt" | ".markdown" | ".md" | ".html" | ".htm" | ".xml":
@@ -179,7 +180,8 @@ def _extract_text_by_file_extension(*, file_content: bytes, file_extension: str)
             raise UnsupportedFileTypeError(f"Unsupported Extension Type: {file_extension}")
 
 
-def _extract_text_from_plain_text(file_content: bytes) -> str:
+def _extract_text_from_plain_text(file_content: bytes | IO[bytes]) -> str:
+    file_content = _read_file_content(file_content)
     try:
         # Detect encoding using chardet
         result = chardet.detect(file_content)
@@ -198,7 +200,8 @@ def _extract_text_from_plain_text(file_content: bytes) -> str:
             raise TextExtractionError(f"Failed to decode plain text file: {e}") from e
 
 
-def _extract_text_from_json(file_content: bytes) -> str:
+def _extract_text_from_json(file_content: bytes | IO[bytes]) -> str:
+    file_content = _read_file_content(file_content)
     try:
         # Detect encoding using chardet
         result = chardet.detect(file_content)
@@ -219,8 +222,9 @@ def _extract_text_from_json(file_content: bytes) -> str:
             raise TextExtractionError(f"Failed to decode or parse JSON file: {e}") from e
 
 
-def _extract_text_from_yaml(file_content: bytes) -> str:
+def _extract_text_from_yaml(file_content: bytes | IO[bytes]) -> str:
     """Extract the content from yaml file"""
+    file_content = _read_file_content(file_content)
     try:
         # Detect encoding using chardet
         result = chardet.detect(file_content)
@@ -241,9 +245,9 @@ def _extract_text_from_yaml(file_content: bytes) -> str:
             raise TextExtractionError(f"Failed to decode or parse YAML file: {e}") from e
 
 
-def _extract_text_from_pdf(file_content: bytes) -> str:
+def _extract_text_from_pdf(file_content: bytes | IO[bytes]) -> str:
     try:
-        pdf_file = io.BytesIO(file_content)
+        pdf_file = _as_binary_file(file_content)
         pdf_document = pypdfium2.PdfDocument(pdf_file, autoclose=True)
         text = ""
         for page in pdf_document:
@@ -256,7 +260,7 @@ def _extract_text_from_pdf(file_content: bytes) -> str:
         raise TextExtractionError(f"Failed to extract text from PDF: {str(e)}") from e
 
 
-def _extract_text_from_doc(file_content: bytes) -> str:
+def _extract_text_from_doc(file_content: bytes | IO[bytes]) -> str:
     """
     Extract text from a DOC file.
     """
@@ -267,7 +271,7 @@ def _extract_text_from_doc(file_content: bytes) -> str:
 
     try:
         with tempfile.NamedTemporaryFile(suffix=".doc", delete=False) as temp_file:
-            temp_file.write(file_content)
+            _write_file_content(temp_file, file_content)
             temp_file.flush()
             with open(temp_file.name, "rb") as file:
                 elements = partition_via_api(
@@ -289,13 +293,13 @@ def paser_docx_part(block, doc: Document, content_items, i):
         content_items.append((i, "table", Table(block, doc)))
 
 
-def _extract_text_from_docx(file_content: bytes) -> str:
+def _extract_text_from_docx(file_content: bytes | IO[bytes]) -> str:
     """
     Extract text from a DOCX file.
     For now support only paragraph and table add more if needed
     """
     try:
-        doc_file = io.BytesIO(file_content)
+        doc_file = _as_binary_file(file_content)
         doc = docx.Document(doc_file)
         text = []
 
@@ -349,33 +353,50 @@ def _extract_text_from_docx(file_content: bytes) -> str:
         raise TextExtractionError(f"Failed to extract text from DOCX: {str(e)}") from e
 
 
-def _download_file_content(file: File) -> bytes:
-    """Download the content of a file based on its transfer method."""
-    try:
-        if file.transfer_method == FileTransferMethod.REMOTE_URL:
-            if file.remote_url is None:
+@contextmanager
+def _open_file_content(file: File) -> Generator[IO[bytes], None, None]:
+    """
+    Open the content of a file, spooled to a temporary file instead of being loaded in memory.
+    """
+    max_size = dify_config.DOCUMENT_EXTRACTOR_FILE_SIZE_LIMIT * 1024 * 1024
+    with ExitStack() as stack:
+        try:
+            if file.transfer_method == FileTransferMethod.REMOTE_URL and file.remote_url is None:
                 raise FileDownloadError("Missing URL for remote file")
-            response = ssrf_proxy.get(file.remote_url)
-            response.raise_for_status()
-            return cast(bytes, response.content)
-        else:
-            return cast(bytes, file_manager.download(file))
-    except Exception as e:
-        raise FileDownloadError(f"Error downloading file: {str(e)}") from e
+            file_content = stack.enter_context(file_manager.open_file(file, max_size=max_size))
+        except Exception as e:
+            raise FileDownloadError(f"Error downloading file: {str(e)}") from e
+        yield file_content
 
 
-def _extract_text_from_file(file: File):
-    file_content = _download_file_content(file)
-    if file.extension:
-        extracted_text = _extract_text_by_file_extension(file_content=file_content, file_extension=file.extension)
-    elif file.mime_type:
-        extracted_text = _extract_text_by_mime_type(file_content=file_content, mime_type=file.mime_type)
+def _read_file_content(file_content: bytes | IO[bytes]) -> bytes:
+    return file_content if isinstance(file_content, bytes) else file_content.read()
+
+
+def _as_binary_file(file_content: bytes | IO[bytes]) -> IO[bytes]:
+    return io.BytesIO(file_content) if isinstance(file_content, bytes) else file_content
+
+
+def _write_file_content(target: IO[bytes], file_content: bytes | IO[bytes]) -> None:
+    if isinstance(file_content, bytes):
+        target.write(file_content)
     else:
-        raise UnsupportedFileTypeError("Unable to determine file type: MIME type or file extension is missing")
+        shutil.copyfileobj(file_content, target)
+
+
+def _extract_text_from_file(file: File):
+    with _open_file_content(file) as file_content:
+        if file.extension:
+            extracted_text = _extract_text_by_file_extension(file_content=file_content, file_extension=file.extension)
+        elif file.mime_type:
+            extracted_text = _extract_text_by_mime_type(file_content=file_content, mime_type=file.mime_type)
+        else:
+            raise UnsupportedFileTypeError("Unable to determine file type: MIME type or file extension is missing")
     return extracted_text
 
 
-def _extract_text_from_csv(file_content: bytes) -> str:
+def _extract_text_from_csv(file_content: bytes | IO[bytes]) -> str:
+    file_content = _read_file_content(file_content)
     try:
         # Detect encoding using chardet
         result = chardet.detect(file_content)
@@ -414,7 +435,7 @@ def _extract_text_from_csv(file_content: bytes) -> str:
         raise TextExtractionError(f"Failed to extract text from CSV: {str(e)}") from e
 
 
-def _extract_text_from_excel(file_content: bytes) -> str:
+def _extract_text_from_excel(file_content: bytes | IO[bytes]) -> str:
     """Extract text from an Excel file using pandas."""
 
     def _construct_markdown_table(df: pd.DataFrame) -> str:
@@ -436,7 +457,7 @@ def _extract_text_from_excel(file_content: bytes) -> str:
         return markdown_table
 
     try:
-        excel_file = pd.ExcelFile(io.BytesIO(file_content))
+        excel_file = pd.ExcelFile(_as_binary_file(file_content))
         markdown_table = ""
         for sheet_name in excel_file.sheet_names:
             try:
@@ -458,14 +479,14 @@ def _extract_text_from_excel(file_content: bytes) -> str:
         raise TextExtractionError(f"Failed to extract text from Excel file: {str(e)}") from e
 
 
-def _extract_text_from_ppt(file_content: bytes) -> str:
+def _extract_text_from_ppt(file_content: bytes | IO[bytes]) -> str:
     from unstructured.partition.api import partition_via_api
     from unstructured.partition.ppt import partition_ppt
 
     try:
         if dify_config.UNSTRUCTURED_API_URL:
             with tempfile.NamedTemporaryFile(suffix=".ppt", delete=False) as temp_file:
-                temp_file.write(file_content)
+                _write_file_content(temp_file, file_content)
                 temp_file.flush()
                 with open(temp_file.name, "rb") as file:
                     elements = partition_via_api(
@@ -476,7 +497,7 @@ def _extract_text_from_ppt(file_content: bytes) -> str:
                     )
                 os.unlink(temp_file.name)
         else:
-            with io.BytesIO(file_content) as file:
+            with _as_binary_file(file_content) as file:
                 elements = partition_ppt(file=file)
         return "\n".join([getattr(element, "text", "") for element in elements])
 
@@ -484,14 +505,14 @@ def _extract_text_from_ppt(file_content: bytes) -> str:
         raise TextExtractionError(f"Failed to extract text from PPTX: {str(e)}") from e
 
 
-def _extract_text_from_pptx(file_content: bytes) -> str:
+def _extract_text_from_pptx(file_content: bytes | IO[bytes]) -> str:
     from unstructured.partition.api import partition_via_api
     from unstructured.partition.pptx import partition_pptx
 
     try:
         if dify_config.UNSTRUCTURED_API_URL:
             with tempfile.NamedTemporaryFile(suffix=".pptx", delete=False) as temp_file:
-                temp_file.write(file_content)
+                _write_file_content(temp_file, file_content)
                 temp_file.flush()
                 with open(temp_file.name, "rb") as file:
                     elements = partition_via_api(
@@ -502,21 +523,21 @@ def _extract_text_from_pptx(file_content: bytes) -> str:
                     )
                 os.unlink(temp_file.name)
         else:
-            with io.BytesIO(file_content) as file:
+            with _as_binary_file(file_content) as file:
                 elements = partition_pptx(file=file)
         return "\n".join([getattr(element, "text", "") for element in elements])
     except Exception as e:
         raise TextExtractionError(f"Failed to extract text from PPTX: {str(e)}") from e
 
 
-def _extract_text_from_epub(file_content: bytes) -> str:
+def _extract_text_from_epub(file_content: bytes | IO[bytes]) -> str:
     from unstructured.partition.api import partition_via_api
     from unstructured.partition.epub import partition_epub
 
     try:
         if dify_config.UNSTRUCTURED_API_URL:
             with tempfile.NamedTemporaryFile(suffix=".epub", delete=False) as temp_file:
-                temp_file.write(file_content)
+                _write_file_content(temp_file, file_content)
                 temp_file.flush()
                 with open(temp_file.name, "rb") as file:
                     elements = partition_via_api(
@@ -528,36 +549,36 @@ def _extract_text_from_epub(file_content: bytes) -> str:
                 os.unlink(temp_file.name)
         else:
             pypandoc.download_pandoc()
-            with io.BytesIO(file_content) as file:
+            with _as_binary_file(file_content) as file:
                 elements = partition_epub(file=file)
         return "\n".join([str(element) for element in elements])
     except Exception as e:
         raise TextExtractionError(f"Failed to extract text from EPUB: {str(e)}") from e
 
 
-def _extract_text_from_eml(file_content: bytes) -> str:
+def _extract_text_from_eml(file_content: bytes | IO[bytes]) -> str:
     from unstructured.partition.email import partition_email
 
     try:
-        with io.BytesIO(file_content) as file:
+        with _as_binary_file(file_content) as file:
             elements = partition_email(file=file)
         return "\n".join([str(element) for element in elements])
     except Exception as e:
         raise TextExtractionError(f"Failed to extract text from EML: {str(e)}") from e
 
 
-def _extract_text_from_msg(file_content: bytes) -> str:
+def _extract_text_from_msg(file_content: bytes | IO[bytes]) -> str:
     from unstructured.partition.msg import partition_msg
 
     try:
-        with io.BytesIO(file_content) as file:
+        with _as_binary_file(file_content) as file:
             elements = partition_msg(file=file)
         return "\n".join([str(element) for element in elements])
     except Exception as e:
         raise TextExtractionError(f"Failed to extract text from MSG: {str(e)}") from e
 
 
-def _extract_text_from_vtt(vtt_bytes: bytes) -> str:
+def _extract_text_from_vtt(vtt_bytes: bytes | IO[bytes]) -> str:
     text = _extract_text_from_plain_text(vtt_bytes)
 
     # remove bom
@@ -596,7 +617,7 @@ def _extract_text_from_vtt(vtt_bytes: bytes) -> str:
     return "\n".join(formatted)
 
 
-def _extract_text_from_properties(file_content: bytes) -> str:
+def _extract_text_from_properties(file_content: bytes | IO[bytes]) -> str:
     try:
         text = _extract_text_from_plain_text(file_content)
         lines = text.splitlines()
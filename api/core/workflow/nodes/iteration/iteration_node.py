@@ -167,7 +167,9 @@ class IterationNode(BaseNode[IterationNodeData]):
                 futures: list[Future] = []
                 q: Queue = Queue()
                 thread_pool = GraphEngineThreadPool(
-                    max_workers=self.node_data.parallel_nums, max_submit_count=dify_config.MAX_SUBMIT_COUNT
+                    tenant_id=self.tenant_id,
+                    max_workers=self.node_data.parallel_nums,
+                    max_submit_count=dify_config.MAX_SUBMIT_COUNT,
                 )
                 for index, item in enumerate(iterator_list_value):
                     future: Future = thread_pool.submit(
@@ -187,31 +189,33 @@ class IterationNode(BaseNode[IterationNodeData]):
                     )
                     future.add_done_callback(thread_pool.task_done_callback)
                     futures.append(future)
-                succeeded_count = 0
-                while True:
-                    try:
-                        event = q.get(timeout=1)
-                        if event is None:
-                            break
-                        if isinstance(event, IterationRunNextEvent):
-                            succeeded_count += 1
-                            if succeeded_count == len(futures):
-                                q.put(None)
-                        yield event
-                        if isinstance(event, RunCompletedEvent):
-                            q.put(None)
-                            for f in futures:
-                                if not f.done():
-                                    f.cancel()
-                            yield event
-                        if isinstance(event, IterationRunFailedEvent):
-                            q.put(None)
+                # hand the worker slot over to the iterations while waiting for them
+                with thread_pool.scheduler.blocking():
+                    succeeded_count = 0
+                    while True:
+                        try:
+                            event = q.get(timeout=1)
+                            if event is None:
+                                break
+                            if isinstance(event, IterationRunNextEvent):
+                                succeeded_count += 1
+                                if succeeded_count == len(futures):
+                                    q.put(None)
                             yield event
-                    except Empty:
-                        continue
+                            if isinstance(event, RunCompletedEvent):
+                                q.put(None)
+                                for f in futures:
+                                    if not f.done():
+                                        f.cancel()
+                                yield event
+                            if isinstance(event, IterationRunFailedEvent):
+                                q.put(None)
+                                yield event
+                        except Empty:
+                            continue
 
-                # wait all threads
-                wait(futures)
+                    # wait all threads
+                    wait(futures)
             else:
                 for _ in range(len(iterator_list_value)):
                     yield from self._run_single_iter(
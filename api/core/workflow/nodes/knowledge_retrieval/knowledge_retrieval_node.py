@@ -1,7 +1,6 @@
 import json
 import logging
 import re
-import time
 from collections import defaultdict
 from collections.abc import Mapping, Sequence
 from typing import Any, Optional, cast
@@ -12,6 +11,7 @@ from sqlalchemy.orm import Session
 
 from core.app.app_config.entities import DatasetRetrieveConfigEntity
 from core.app.entities.app_invoke_entities import ModelConfigWithCredentialsEntity
+from core.app.features.rate_limiting.sliding_window_rate_limit import check_knowledge_rate_limit
 from core.entities.agent_entities import PlanningStrategy
 from core.entities.model_entities import ModelStatus
 from core.model_manager import ModelInstance, ModelManager
@@ -40,7 +40,6 @@ from core.workflow.nodes.knowledge_retrieval.template_prompts import (
 from core.workflow.nodes.llm.entities import LLMNodeChatModelMessage, LLMNodeCompletionModelPromptTemplate
 from core.workflow.nodes.llm.node import LLMNode
 from extensions.ext_database import db
-from extensions.ext_redis import redis_client
 from libs.json_in_md_parser import parse_and_check_json_markdown
 from models.dataset import Dataset, DatasetMetadata, Document, RateLimitLog
 from services.feature_service import FeatureService
@@ -90,12 +89,7 @@ class KnowledgeRetrievalNode(LLMNode):
         # check rate limit
         knowledge_rate_limit = FeatureService.get_knowledge_rate_limit(self.tenant_id)
         if knowledge_rate_limit.enabled:
-            current_time = int(time.time() * 1000)
-            key = f"rate_limit_{self.tenant_id}"
-            redis_client.zadd(key, {current_time: current_time})
-            redis_client.zremrangebyscore(key, 0, current_time - 60000)
-            request_count = redis_client.zcard(key)
-            if request_count > knowledge_rate_limit.limit:
+            if check_knowledge_rate_limit(self.tenant_id, knowledge_rate_limit.limit) < 0:
                 with Session(db.engine) as session:
                     # add ratelimit record
                     rate_limit_log = RateLimitLog(
@@ -1,4 +1,6 @@
+import logging
 import os
+import time
 from collections.abc import Mapping, Sequence
 from typing import Any, Optional
 
@@ -9,6 +11,8 @@ from core.workflow.nodes.base import BaseNode
 from core.workflow.nodes.enums import NodeType
 from core.workflow.nodes.template_transform.entities import TemplateTransformNodeData
 
+logger = logging.getLogger(__name__)
+
 MAX_TEMPLATE_TRANSFORM_OUTPUT_LENGTH = int(os.environ.get("TEMPLATE_TRANSFORM_MAX_LENGTH", "80000"))
 
 
@@ -36,24 +40,40 @@ class TemplateTransformNode(BaseNode[TemplateTransformNodeData]):
             value = self.graph_runtime_state.variable_pool.get(variable_selector.value_selector)
             variables[variable_name] = value.to_object() if value else None
         # Run code
+        start_at = time.perf_counter()
         try:
             result = CodeExecutor.execute_workflow_code_template(
                 language=CodeLanguage.JINJA2, code=self.node_data.template, inputs=variables
             )
         except CodeExecutionError as e:
-            return NodeRunResult(inputs=variables, status=WorkflowNodeExecutionStatus.FAILED, error=str(e))
+            return NodeRunResult(
+                inputs=variables,
+                process_data=self._render_process_data(start_at),
+                status=WorkflowNodeExecutionStatus.FAILED,
+                error=str(e),
+            )
+        process_data = self._render_process_data(start_at)
 
         if len(result["result"]) > MAX_TEMPLATE_TRANSFORM_OUTPUT_LENGTH:
             return NodeRunResult(
                 inputs=variables,
+                process_data=process_data,
                 status=WorkflowNodeExecutionStatus.FAILED,
                 error=f"Output length exceeds {MAX_TEMPLATE_TRANSFORM_OUTPUT_LENGTH} characters",
             )
 
         return NodeRunResult(
-            status=WorkflowNodeExecutionStatus.SUCCEEDED, inputs=variables, outputs={"output": result["result"]}
+            status=WorkflowNodeExecutionStatus.SUCCEEDED,
+            inputs=variables,
+            process_data=process_data,
+            outputs={"output": result["result"]},
         )
 
+    def _render_process_data(self, start_at: float) -> dict[str, Any]:
+        render_latency = time.perf_counter() - start_at
+        logger.debug(f"Rendered the template of node {self.node_id} in {render_latency:.4f}s")
+        return {"render_latency": round(render_latency, 6)}
+
     @classmethod
     def _extract_variable_selector_to_variable_mapping(
         cls, *, graph_config: Mapping[str, Any], node_id: str, node_data: TemplateTransformNodeData
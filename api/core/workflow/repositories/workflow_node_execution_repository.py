@@ -39,6 +39,15 @@ class WorkflowNodeExecutionRepository(Protocol):
         """
         ...
 
+    def flush(self) -> None:
+        """
+        Persist the saved NodeExecution instances that are not persisted yet.
+
+        Implementations that persist on save have nothing to do. Callers flush at the end
+        of a workflow run, so that the executions are visible to other readers.
+        """
+        ...
+
     def get_by_node_execution_id(self, node_execution_id: str) -> Optional[WorkflowNodeExecution]:
         """
         Retrieve a NodeExecution by its node_execution_id.
@@ -100,6 +100,9 @@ class WorkflowCycleManager:
         workflow_execution.total_steps = total_steps
         workflow_execution.finished_at = datetime.now(UTC).replace(tzinfo=None)
 
+        # the node executions must be persisted before the run is traced and reported as finished
+        self._workflow_node_execution_repository.flush()
+
         if trace_manager:
             trace_manager.add_trace_task(
                 TraceTask(
@@ -134,6 +137,9 @@ class WorkflowCycleManager:
         execution.finished_at = datetime.now(UTC).replace(tzinfo=None)
         execution.exceptions_count = exceptions_count
 
+        # the node executions must be persisted before the run is traced and reported as finished
+        self._workflow_node_execution_repository.flush()
+
         if trace_manager:
             trace_manager.add_trace_task(
                 TraceTask(
@@ -186,6 +192,9 @@ class WorkflowCycleManager:
                 # Update the repository with the domain model
                 self._workflow_node_execution_repository.save(node_execution)
 
+        # the node executions must be persisted before the run is traced and reported as finished
+        self._workflow_node_execution_repository.flush()
+
         if trace_manager:
             trace_manager.add_trace_task(
                 TraceTask(
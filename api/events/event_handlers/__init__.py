@@ -1,5 +1,6 @@
 from .clean_when_dataset_deleted import handle
 from .clean_when_document_deleted import handle
+from .clear_memory_snapshot_when_message_created import handle
 from .create_document_index import handle
 from .create_installed_app_when_app_created import handle
 from .create_site_record_when_app_created import handle
@@ -0,0 +1,8 @@
+from core.memory.history_message_loader import HistoryMessageLoader
+from events.message_event import message_was_created
+
+
+@message_was_created.connect
+def handle(sender, **kwargs):
+    message = sender
+    HistoryMessageLoader.invalidate(message.conversation_id)
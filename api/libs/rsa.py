@@ -1,13 +1,22 @@
 import hashlib
+import threading
 
+from cachetools import TTLCache
 from Crypto.Cipher import AES
 from Crypto.PublicKey import RSA
 from Crypto.Random import get_random_bytes
 
+from configs import dify_config
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
 from libs import gmpy2_pkcs10aep_cipher
 
+# tenant id -> (rsa key, cipher) parsed from the private key of the tenant, ciphers hold no state between calls
+_decoding_cache: TTLCache = TTLCache(
+    maxsize=dify_config.TENANT_RSA_KEY_CACHE_SIZE or 1, ttl=dify_config.TENANT_RSA_KEY_CACHE_TTL
+)
+_decoding_cache_lock = threading.Lock()
+
 
 def generate_key_pair(tenant_id):
     private_key = RSA.generate(2048)
@@ -19,6 +28,8 @@ def generate_key_pair(tenant_id):
     filepath = "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
 
     storage.save(filepath, pem_private)
+    redis_client.delete(_private_key_cache_key(filepath))
+    invalidate_decrypt_decoding(tenant_id)
 
     return pem_public.decode()
 
@@ -46,9 +57,15 @@ def encrypt(text, public_key):
 
 
 def get_decrypt_decoding(tenant_id):
+    if dify_config.TENANT_RSA_KEY_CACHE_SIZE:
+        with _decoding_cache_lock:
+            decoding = _decoding_cache.get(tenant_id)
+        if decoding is not None:
+            return decoding
+
     filepath = "privkeys/{tenant_id}".format(tenant_id=tenant_id) + "/private.pem"
 
-    cache_key = "tenant_privkey:{hash}".format(hash=hashlib.sha3_256(filepath.encode()).hexdigest())
+    cache_key = _private_key_cache_key(filepath)
     private_key = redis_client.get(cache_key)
     if not private_key:
         try:
@@ -60,8 +77,25 @@ def get_decrypt_decoding(tenant_id):
 
     rsa_key = RSA.import_key(private_key)
     cipher_rsa = gmpy2_pkcs10aep_cipher.new(rsa_key)
+    decoding = (rsa_key, cipher_rsa)
+
+    if dify_config.TENANT_RSA_KEY_CACHE_SIZE:
+        with _decoding_cache_lock:
+            _decoding_cache[tenant_id] = decoding
+    return decoding
+
+
+def invalidate_decrypt_decoding(tenant_id):
+    """
+    Drop the parsed private key of the tenant from the cache of this process.
+    Other processes load the new key once their cached one expires after TENANT_RSA_KEY_CACHE_TTL.
+    """
+    with _decoding_cache_lock:
+        _decoding_cache.pop(tenant_id, None)
+
 
-    return rsa_key, cipher_rsa
+def _private_key_cache_key(filepath):
+    return "tenant_privkey:{hash}".format(hash=hashlib.sha3_256(filepath.encode()).hexdigest())
 
 
 def decrypt_token_with_decoding(encrypted_text, rsa_key, cipher_rsa):
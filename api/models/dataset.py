@@ -5,17 +5,18 @@ import hmac
 import json
 import logging
 import os
-import pickle
 import re
 import time
 from json import JSONDecodeError
 from typing import Any, cast
 
+import numpy as np
 from sqlalchemy import func
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped
 
 from configs import dify_config
+from core.rag.embedding.embedding_codec import EmbeddingStorageType, decode_embedding, encode_embedding
 from core.rag.index_processor.constant.built_in_field import BuiltInField, MetadataDataSource
 from core.rag.retrieval.retrieval_methods import RetrievalMethod
 from extensions.ext_storage import storage
@@ -912,6 +913,27 @@ class DatasetKeywordTable(Base):
                 return None
 
 
+class DatasetKeywordTableShard(Base):
+    """
+    One shard of the keyword table of a dataset, used when the keyword data source type is 'sharded'.
+    Keywords are assigned to shards by a stable hash, see ShardedKeywordTable.
+    """
+
+    __tablename__ = "dataset_keyword_table_shards"
+    __table_args__ = (
+        db.PrimaryKeyConstraint("id", name="dataset_keyword_table_shard_pkey"),
+        db.UniqueConstraint("dataset_id", "shard_index", name="dataset_keyword_table_shard_dataset_shard_idx"),
+    )
+
+    id = db.Column(StringUUID, primary_key=True, server_default=db.text("uuid_generate_v4()"))
+    dataset_id = db.Column(StringUUID, nullable=False)
+    shard_index = db.Column(db.Integer, nullable=False)
+    # json object mapping each keyword of the shard to the list of its index node ids
+    keyword_table = db.Column(db.Text, nullable=False)
+    version = db.Column(db.Integer, nullable=False, server_default=db.text("1"))
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=func.current_timestamp())
+
+
 class Embedding(Base):
     __tablename__ = "embeddings"
     __table_args__ = (
@@ -930,10 +952,13 @@ class Embedding(Base):
     provider_name = db.Column(db.String(255), nullable=False, server_default=db.text("''::character varying"))
 
     def set_embedding(self, embedding_data: list[float]):
-        self.embedding = pickle.dumps(embedding_data, protocol=pickle.HIGHEST_PROTOCOL)
+        self.embedding = encode_embedding(embedding_data, EmbeddingStorageType(dify_config.EMBEDDING_STORAGE_FORMAT))
 
     def get_embedding(self) -> list[float]:
-        return cast(list[float], pickle.loads(self.embedding))  # noqa: S301
+        return cast(list[float], self.get_embedding_array().tolist())
+
+    def get_embedding_array(self) -> np.ndarray:
+        return decode_embedding(self.embedding)
 
 
 class DatasetCollectionBinding(Base):
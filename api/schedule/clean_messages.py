@@ -7,6 +7,7 @@ from werkzeug.exceptions import NotFound
 
 import app
 from configs import dify_config
+from core.memory.history_message_loader import HistoryMessageLoader
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from models.model import (
@@ -86,5 +87,6 @@ def clean_messages():
                 )
                 db.session.query(Message).filter(Message.id == message.id).delete()
                 db.session.commit()
+                HistoryMessageLoader.invalidate(message.conversation_id)
     end_at = time.perf_counter()
     click.echo(click.style("Cleaned messages from db success latency: {}".format(end_at - start_at), fg="green"))
@@ -0,0 +1,33 @@
+import logging
+import time
+
+import click
+
+import app
+from core.rag.retrieval.retrieval_stats import RetrievalStats
+from extensions.ext_redis import redis_client
+
+
+@app.celery.task(queue="dataset")
+def flush_dataset_retrieval_stats_task():
+    lock = redis_client.lock("flush_dataset_retrieval_stats_task", timeout=600, blocking_timeout=0)
+    # hits of the same segments are written by one flush at a time
+    if not lock.acquire():
+        return
+    start_at = time.perf_counter()
+    try:
+        segment_hits, dataset_queries = RetrievalStats.flush()
+    except Exception:
+        logging.exception("Failed to flush dataset retrieval stats")
+        return
+    finally:
+        lock.release()
+    end_at = time.perf_counter()
+    if segment_hits or dataset_queries:
+        click.echo(
+            click.style(
+                f"Flushed {segment_hits} segment hits and {dataset_queries} dataset queries,"
+                f" latency: {end_at - start_at}",
+                fg="green",
+            )
+        )
@@ -8,6 +8,7 @@ from sqlalchemy import or_, select
 from werkzeug.datastructures import FileStorage
 from werkzeug.exceptions import NotFound
 
+from core.memory.history_message_loader import HistoryMessageLoader
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from models.model import App, AppAnnotationHitHistory, AppAnnotationSetting, Message, MessageAnnotation
@@ -60,6 +61,8 @@ class AppAnnotationService:
             )
         db.session.add(annotation)
         db.session.commit()
+        if annotation.conversation_id:
+            HistoryMessageLoader.invalidate(annotation.conversation_id)
         # if annotation reply is enabled , add annotation to index
         annotation_setting = (
             db.session.query(AppAnnotationSetting).filter(AppAnnotationSetting.app_id == app_id).first()
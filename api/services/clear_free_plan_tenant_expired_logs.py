@@ -9,6 +9,7 @@ from flask import Flask, current_app
 from sqlalchemy.orm import Session
 
 from configs import dify_config
+from core.memory.history_message_loader import HistoryMessageLoader
 from core.model_runtime.utils.encoders import jsonable_encoder
 from extensions.ext_database import db
 from extensions.ext_storage import storage
@@ -60,6 +61,9 @@ class ClearFreePlanTenantExpiredLogs:
 
                     session.commit()
 
+                    for conversation_id in {message.conversation_id for message in messages}:
+                        HistoryMessageLoader.invalidate(conversation_id)
+
                     click.echo(
                         click.style(
                             f"[{datetime.datetime.now()}] Processed {len(message_ids)} messages for tenant {tenant_id} "
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 
 from core.app.entities.app_invoke_entities import InvokeFrom
 from core.llm_generator.llm_generator import LLMGenerator
+from core.memory.history_message_loader import HistoryMessageLoader
 from extensions.ext_database import db
 from libs.infinite_scroll_pagination import InfiniteScrollPagination
 from models import ConversationVariable
@@ -172,6 +173,8 @@ class ConversationService:
         conversation.updated_at = datetime.now(UTC).replace(tzinfo=None)
         db.session.commit()
 
+        HistoryMessageLoader.invalidate(conversation.id)
+
     @classmethod
     def get_conversational_variable(
         cls,
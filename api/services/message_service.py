@@ -4,6 +4,7 @@ from typing import Optional, Union
 from core.app.apps.advanced_chat.app_config_manager import AdvancedChatAppConfigManager
 from core.app.entities.app_invoke_entities import InvokeFrom
 from core.llm_generator.llm_generator import LLMGenerator
+from core.memory.history_message_loader import HistoryMessageLoader
 from core.memory.token_buffer_memory import TokenBufferMemory
 from core.model_manager import ModelManager
 from core.model_runtime.entities.model_entities import ModelType
@@ -175,6 +176,8 @@ class MessageService:
 
         db.session.commit()
 
+        HistoryMessageLoader.invalidate(message.conversation_id)
+
         return feedback
 
     @classmethod
@@ -8,6 +8,7 @@ from constants import HIDDEN_VALUE
 from core.entities.provider_configuration import ProviderConfiguration
 from core.helper import encrypter
 from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
 from core.model_manager import LBModelManager
 from core.model_runtime.entities.model_entities import ModelType
 from core.model_runtime.entities.provider_entities import (
@@ -47,6 +48,8 @@ class ModelLoadBalancingService:
         # Enable model load balancing
         provider_configuration.enable_model_load_balancing(model=model, model_type=ModelType.value_of(model_type))
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def disable_model_load_balancing(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
         disable model load balancing.
@@ -68,6 +71,8 @@ class ModelLoadBalancingService:
         # disable model load balancing
         provider_configuration.disable_model_load_balancing(model=model, model_type=ModelType.value_of(model_type))
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def get_load_balancing_configs(
         self, tenant_id: str, provider: str, model: str, model_type: str
     ) -> tuple[bool, list[dict]]:
@@ -277,6 +282,8 @@ class ModelLoadBalancingService:
         db.session.add(inherit_config)
         db.session.commit()
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
         return inherit_config
 
     def update_load_balancing_configs(
@@ -422,6 +429,8 @@ class ModelLoadBalancingService:
 
             self._clear_credentials_cache(tenant_id, config_id)
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def validate_load_balancing_credentials(
         self,
         tenant_id: str,
@@ -2,6 +2,7 @@ import logging
 from typing import Optional
 
 from core.entities.model_entities import ModelStatus, ModelWithProviderEntity, ProviderModelWithStatusEntity
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
 from core.model_runtime.entities.model_entities import ModelType, ParameterRule
 from core.model_runtime.model_providers.model_provider_factory import ModelProviderFactory
 from core.provider_manager import ProviderManager
@@ -144,6 +145,8 @@ class ModelProviderService:
         # Add or update custom provider credentials.
         provider_configuration.add_or_update_custom_credentials(credentials)
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def remove_provider_credentials(self, tenant_id: str, provider: str) -> None:
         """
         remove custom provider config.
@@ -163,6 +166,8 @@ class ModelProviderService:
         # Remove custom provider credentials.
         provider_configuration.delete_custom_credentials()
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def get_model_credentials(self, tenant_id: str, provider: str, model_type: str, model: str) -> Optional[dict]:
         """
         get model credentials.
@@ -238,6 +243,8 @@ class ModelProviderService:
             model_type=ModelType.value_of(model_type), model=model, credentials=credentials
         )
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def remove_model_credentials(self, tenant_id: str, provider: str, model_type: str, model: str) -> None:
         """
         remove model credentials.
@@ -259,6 +266,8 @@ class ModelProviderService:
         # Remove custom model credentials
         provider_configuration.delete_custom_model_credentials(model_type=ModelType.value_of(model_type), model=model)
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def get_models_by_model_type(self, tenant_id: str, model_type: str) -> list[ProviderWithModelsResponse]:
         """
         get models by model type.
@@ -438,6 +447,8 @@ class ModelProviderService:
         # Switch preferred provider type
         provider_configuration.switch_preferred_provider_type(preferred_provider_type_enum)
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def enable_model(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
         enable model.
@@ -459,6 +470,8 @@ class ModelProviderService:
         # Enable model
         provider_configuration.enable_model(model=model, model_type=ModelType.value_of(model_type))
 
+        ProviderConfigurationsCache.invalidate(tenant_id)
+
     def disable_model(self, tenant_id: str, provider: str, model: str, model_type: str) -> None:
         """
         disable model.
@@ -479,3 +492,5 @@ class ModelProviderService:
 
         # Enable model
         provider_configuration.disable_model(model=model, model_type=ModelType.value_of(model_type))
+
+        ProviderConfigurationsCache.invalidate(tenant_id)
@@ -0,0 +1,52 @@
+from unittest.mock import MagicMock, patch
+
+from core.app.apps.stop_signal_watcher import StopSignalWatcher
+
+
+def _redis_with_flags(flags: set[str]) -> MagicMock:
+    mock_redis = MagicMock()
+    pipeline = MagicMock()
+    checked_keys: list[str] = []
+    pipeline.exists.side_effect = checked_keys.append
+
+    def execute():
+        results = [key in flags for key in checked_keys]
+        checked_keys.clear()
+        return results
+
+    pipeline.execute.side_effect = execute
+    mock_redis.pipeline.return_value = pipeline
+    return mock_redis
+
+
+def test_poll_sets_stop_event_of_stopped_tasks():
+    watcher = StopSignalWatcher(poll_interval=60)
+    mock_redis = _redis_with_flags({"generate_task_stopped:task-1"})
+
+    with (
+        patch("core.app.apps.stop_signal_watcher.redis_client", mock_redis),
+        patch.object(watcher, "_ensure_started"),
+    ):
+        stopped = watcher.watch("generate_task_stopped:task-1")
+        running = watcher.watch("generate_task_stopped:task-2")
+        watcher.poll()
+
+    assert stopped.is_set()
+    assert not running.is_set()
+    # all watched flags are read in a single round trip
+    assert mock_redis.pipeline.call_count == 1
+
+
+def test_unwatched_tasks_are_not_polled():
+    watcher = StopSignalWatcher(poll_interval=60)
+    mock_redis = _redis_with_flags(set())
+
+    with (
+        patch("core.app.apps.stop_signal_watcher.redis_client", mock_redis),
+        patch.object(watcher, "_ensure_started"),
+    ):
+        watcher.watch("generate_task_stopped:task-1")
+        watcher.unwatch("generate_task_stopped:task-1")
+        watcher.poll()
+
+    mock_redis.pipeline.assert_not_called()
@@ -0,0 +1,142 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.app.features.rate_limiting.rate_limit import RateLimit
+from core.app.features.rate_limiting.sliding_window_rate_limit import check_knowledge_rate_limit
+from core.errors.error import AppInvokeQuotaExceededError
+
+
+class _CountingRedis:
+    """
+    Counts the round trips to redis, a registered script costs one round trip per call.
+    """
+
+    def __init__(self, script_result: int = 0) -> None:
+        self.round_trips = 0
+        self.script_result = script_result
+
+    def register_script(self, source: str):
+        def run(keys, args):
+            self.round_trips += 1
+            return self.script_result
+
+        return run
+
+    def __getattr__(self, item):
+        def command(*args, **kwargs):
+            self.round_trips += 1
+            return 0
+
+        return command
+
+
+@pytest.fixture
+def mock_redis():
+    redis = MagicMock()
+    with (
+        patch("core.app.features.rate_limiting.rate_limit.redis_client", redis),
+        patch("core.app.features.rate_limiting.lua_script.redis_client", redis),
+    ):
+        yield redis
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    RateLimit._instance_dict.clear()
+    yield
+    RateLimit._instance_dict.clear()
+
+
+def test_enter_admits_in_one_script_call(mock_redis):
+    script = mock_redis.register_script.return_value
+    rate_limit = RateLimit("client", 5)
+    script.reset_mock()
+    script.return_value = 4
+
+    request_id = rate_limit.enter("request")
+
+    assert request_id == "request"
+    script.assert_called_once()
+    assert script.call_args.kwargs["keys"] == ["dify:rate_limit:client:active_requests"]
+    assert script.call_args.kwargs["args"][0] == "request"
+    assert script.call_args.kwargs["args"][2] == 5
+    mock_redis.hlen.assert_not_called()
+    mock_redis.hset.assert_not_called()
+
+
+def test_enter_raises_when_limit_reached(mock_redis):
+    mock_redis.register_script.return_value.return_value = -1
+    rate_limit = RateLimit("client", 1)
+
+    with pytest.raises(AppInvokeQuotaExceededError):
+        rate_limit.enter()
+
+
+def test_disabled_rate_limit_does_not_use_redis(mock_redis):
+    rate_limit = RateLimit("client", 0)
+
+    request_id = rate_limit.enter()
+    rate_limit.exit(request_id)
+
+    mock_redis.register_script.assert_not_called()
+    mock_redis.hdel.assert_not_called()
+
+
+def test_check_knowledge_rate_limit(mock_redis):
+    script = mock_redis.register_script.return_value
+    script.return_value = 3
+
+    assert check_knowledge_rate_limit("tenant", 2) == -1
+    script.return_value = 2
+    assert check_knowledge_rate_limit("tenant", 2) == 0
+
+    first, second = (call.kwargs for call in script.call_args_list)
+    assert first["keys"] == ["rate_limit_tenant"]
+    assert first["args"][1] == 60000
+    # requests in the same millisecond are counted separately
+    assert first["args"][2] != second["args"][2]
+
+
+def _legacy_knowledge_rate_limit(redis, tenant_id: str, limit: int) -> bool:
+    # the sequence of commands sent before the sliding window moved into a script
+    key = f"rate_limit_{tenant_id}"
+    redis.zadd(key, {0: 0})
+    redis.zremrangebyscore(key, 0, -60000)
+    return redis.zcard(key) > limit
+
+
+def _legacy_enter_and_exit(redis, key: str, max_active_requests: int) -> None:
+    if redis.hlen(key) >= max_active_requests:
+        raise AppInvokeQuotaExceededError()
+    redis.hset(key, "request", "0")
+    redis.hdel(key, "request")
+
+
+def test_redis_round_trips_per_request_benchmark(benchmark):
+    redis = _CountingRedis(script_result=1)
+    with (
+        patch("core.app.features.rate_limiting.rate_limit.redis_client", redis),
+        patch("core.app.features.rate_limiting.lua_script.redis_client", redis),
+    ):
+        rate_limit = RateLimit("client", 10)
+
+        def request():
+            check_knowledge_rate_limit("tenant", 10)
+            rate_limit.exit(rate_limit.enter())
+
+        benchmark(request)
+
+        redis.round_trips = 0
+        request()
+        round_trips = redis.round_trips
+
+    legacy = _CountingRedis()
+    _legacy_knowledge_rate_limit(legacy, "tenant", 10)
+    _legacy_enter_and_exit(legacy, "key", 10)
+
+    benchmark.extra_info["redis_round_trips_per_request"] = round_trips
+    benchmark.extra_info["legacy_redis_round_trips_per_request"] = legacy.round_trips
+    # knowledge limit: 3 -> 1, enter: 2 -> 1, exit: 1 -> 1
+    assert legacy.round_trips == 6
+    assert round_trips == 3
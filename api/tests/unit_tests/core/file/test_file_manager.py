@@ -0,0 +1,130 @@
+import base64
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from core.file import File, FileTransferMethod, FileType, file_manager
+
+CONTENT = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def mock_storage():
+    storage = MagicMock()
+    # chunk sizes that are not multiples of 3, as returned by storage backends
+    storage.load_stream.side_effect = lambda key: iter(CONTENT[i : i + 1000] for i in range(0, len(CONTENT), 1000))
+    with patch("core.file.file_manager.storage", storage):
+        yield storage
+
+
+def _file(size: int = -1) -> File:
+    return File(
+        tenant_id="tenant",
+        type=FileType.IMAGE,
+        transfer_method=FileTransferMethod.LOCAL_FILE,
+        related_id="upload_file_id",
+        filename="image.png",
+        extension=".png",
+        mime_type="image/png",
+        size=size,
+        storage_key="upload_files/tenant/image.png",
+    )
+
+
+def test_encoded_string_is_streamed(mock_storage):
+    assert file_manager._get_encoded_string(_file()) == base64.b64encode(CONTENT).decode("utf-8")
+    mock_storage.load.assert_not_called()
+
+
+@pytest.mark.parametrize(("start", "length"), [(0, None), (0, 10), (999, 2), (1500, 3000), (10000, None)])
+def test_stream_range(mock_storage, start, length):
+    end = None if length is None else start + length
+    assert b"".join(file_manager.stream(_file(), start=start, length=length)) == CONTENT[start:end]
+
+
+def test_stream_stops_at_end_of_range(mock_storage):
+    read_chunks = []
+
+    def load_stream(key):
+        for i in range(0, len(CONTENT), 1000):
+            read_chunks.append(i)
+            yield CONTENT[i : i + 1000]
+
+    mock_storage.load_stream.side_effect = load_stream
+
+    assert b"".join(file_manager.stream(_file(), length=1500)) == CONTENT[:1500]
+    assert read_chunks == [0, 1000]
+
+
+def test_open_file_spools_content(mock_storage):
+    with patch("core.file.file_manager.dify_config.FILES_SPOOL_MAX_MEMORY_SIZE", 0):
+        with file_manager.open_file(_file()) as file:
+            assert file.read() == CONTENT
+
+
+def test_size_limit(mock_storage):
+    # the size of the file is checked before reading it
+    with pytest.raises(ValueError):
+        list(file_manager.stream(_file(size=len(CONTENT)), max_size=100))
+    mock_storage.load_stream.assert_not_called()
+
+    # and while reading it, when unknown
+    with pytest.raises(ValueError):
+        with file_manager.open_file(_file(), max_size=len(CONTENT) - 1):
+            pass
+
+    with file_manager.open_file(_file(), max_size=len(CONTENT)) as file:
+        assert file.read() == CONTENT
+
+
+def _remote_file() -> File:
+    return File(
+        tenant_id="tenant",
+        type=FileType.DOCUMENT,
+        transfer_method=FileTransferMethod.REMOTE_URL,
+        remote_url="https://example.com/file.pdf",
+        filename="file.pdf",
+        extension=".pdf",
+        mime_type="application/pdf",
+    )
+
+
+def _mock_stream(response: httpx.Response):
+    @contextmanager
+    def stream(method, url, **kwargs):
+        yield response
+
+    return patch("core.file.file_manager.ssrf_proxy.stream", stream)
+
+
+def test_remote_file_is_streamed():
+    read_chunks = []
+
+    def chunks():
+        for i in range(0, len(CONTENT), 1000):
+            read_chunks.append(i)
+            yield CONTENT[i : i + 1000]
+
+    response = httpx.Response(200, content=chunks(), request=httpx.Request("GET", "https://example.com/file.pdf"))
+    with _mock_stream(response):
+        assert b"".join(file_manager.stream(_remote_file(), length=1500)) == CONTENT[:1500]
+
+    assert read_chunks == [0, 1000]
+
+
+def test_remote_file_size_limit():
+    request = httpx.Request("GET", "https://example.com/file.pdf")
+
+    # the content length is checked before reading the body
+    response = MagicMock(headers={"content-length": str(len(CONTENT))})
+    with _mock_stream(response), pytest.raises(ValueError):
+        list(file_manager.stream(_remote_file(), max_size=100))
+    response.iter_bytes.assert_not_called()
+
+    # and the size while reading it, when unknown
+    response = httpx.Response(200, content=iter([CONTENT]), request=request)
+    with _mock_stream(response), pytest.raises(ValueError):
+        with file_manager.open_file(_remote_file(), max_size=len(CONTENT) - 1):
+            pass
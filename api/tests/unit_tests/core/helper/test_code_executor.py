@@ -0,0 +1,51 @@
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+
+from core.helper.code_executor import sandbox_client
+from core.helper.code_executor.code_executor import CodeExecutionError, CodeExecutor, CodeLanguage
+
+
+def _response(stdout: str = "", error: str = "", status_code: int = 200) -> httpx.Response:
+    return httpx.Response(
+        status_code, json={"code": 0, "message": "success", "data": {"stdout": stdout, "error": error}}
+    )
+
+
+@pytest.fixture
+def client():
+    client = MagicMock()
+    with patch.object(sandbox_client, "get_client", return_value=client):
+        yield client
+
+
+def test_get_client_is_shared():
+    try:
+        assert sandbox_client.get_client() is sandbox_client.get_client()
+    finally:
+        sandbox_client.close_clients()
+
+
+def test_execute_code(client):
+    client.post.return_value = _response(stdout="hello")
+
+    assert CodeExecutor.execute_code(CodeLanguage.PYTHON3, "", "print('hello')") == "hello"
+
+    url = client.post.call_args.args[0]
+    assert url.endswith("/v1/sandbox/run")
+    assert client.post.call_args.kwargs["json"]["code"] == "print('hello')"
+
+
+def test_execute_code_errors(client):
+    client.post.return_value = _response(status_code=503)
+    with pytest.raises(CodeExecutionError, match="unavailable"):
+        CodeExecutor.execute_code(CodeLanguage.PYTHON3, "", "")
+
+    client.post.return_value = _response(error="NameError")
+    with pytest.raises(CodeExecutionError, match="NameError"):
+        CodeExecutor.execute_code(CodeLanguage.PYTHON3, "", "")
+
+    client.post.side_effect = httpx.ConnectError("connection refused")
+    with pytest.raises(CodeExecutionError, match="network issue"):
+        CodeExecutor.execute_code(CodeLanguage.PYTHON3, "", "")
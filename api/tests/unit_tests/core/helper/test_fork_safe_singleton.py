@@ -0,0 +1,47 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.helper.fork_safe_singleton import ForkSafeSingleton
+
+
+def test_created_once_on_first_use():
+    created = []
+    singleton = ForkSafeSingleton(lambda: created.append(object()) or created[-1])
+    assert singleton.peek() is None
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        values = list(executor.map(lambda _: singleton.get(), range(32)))
+
+    assert len(created) == 1
+    assert all(value is created[0] for value in values)
+    assert singleton.peek() is created[0]
+
+
+def test_pop():
+    singleton = ForkSafeSingleton(object)
+    value = singleton.get()
+
+    assert singleton.pop() is value
+    assert singleton.peek() is None
+    assert singleton.get() is not value
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_reset_in_forked_child():
+    singleton = ForkSafeSingleton(object)
+    parent_value = singleton.get()
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = singleton.peek() is None and singleton.get() is not parent_value
+        os.write(write_fd, b"1" if ok else b"0")
+        os._exit(0)
+
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b"1"
+    os.close(read_fd)
+    assert singleton.get() is parent_value
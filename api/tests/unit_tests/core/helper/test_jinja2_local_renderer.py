@@ -0,0 +1,95 @@
+from unittest.mock import patch
+
+import jinja2
+import pytest
+
+from core.helper.code_executor.code_executor import CodeExecutor, CodeLanguage
+from core.helper.code_executor.jinja2.jinja2_local_renderer import Jinja2LocalRenderer
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    Jinja2LocalRenderer._outputs.clear()
+    yield
+    Jinja2LocalRenderer._outputs.clear()
+
+
+@pytest.mark.parametrize(
+    ("template", "inputs"),
+    [
+        ("Hello {{ name }}!", {"name": "Dify"}),
+        (
+            "{% for item in items %}{{ loop.index }}. {{ item.title | upper }}\n{% endfor %}",
+            {"items": [{"title": "a"}]},
+        ),
+        ("{% if score > 0.5 %}pass{% else %}fail{% endif %} {{ tags | join(', ') }}", {"score": 0.7, "tags": ["x"]}),
+        ("{{ missing }}{{ data['key'] }} {{ numbers | sum }}\n\n", {"data": {"key": "v"}, "numbers": [1, 2]}),
+    ],
+)
+def test_render_matches_jinja2(template, inputs):
+    assert Jinja2LocalRenderer.render(template, inputs) == jinja2.Template(template).render(**inputs)
+
+
+@pytest.mark.parametrize(
+    "template",
+    [
+        "{% for i in range(10) %}{{ i }}{% endfor %}",
+        "{% include 'other' %}",
+        "{{ name.__class__ }}",
+        "{{ name['__class__'] }}",
+        "{{ name * 1000000 }}",
+        "{{ '%09999999d' % 1 }}",
+        "{{ '{:>9999999}'.format(1) }}",
+        "{{ '{x:>9999999}'.format_map({'x': 1}) }}",
+        "{{ name.ljust(9999999) }}",
+        "{{ items.append(1) }}",
+        "{% for a in items %}{% for b in items %}{{ a }}{{ b }}{% endfor %}{% endfor %}",
+        "{% set name = name ~ name %}{{ name }}",
+        "{{ name | replace('D', name) }}",
+        "{{ items | random }}",
+        "{% macro f() %}{{ f() }}{% endmacro %}{{ f() }}",
+        "line\\nbreak",
+        "{{ unclosed",
+    ],
+)
+def test_templates_outside_the_safe_subset_are_left_to_the_sandbox(template):
+    assert Jinja2LocalRenderer.render(template, {"name": "Dify", "items": [1]}) is None
+
+
+def test_outputs_longer_than_the_string_limit_are_left_to_the_sandbox():
+    template = "{% for item in items %}{{ item }}{% endfor %}"
+
+    with patch("configs.dify_config.CODE_MAX_STRING_LENGTH", 10):
+        assert Jinja2LocalRenderer.render(template, {"items": ["x"] * 10}) == "x" * 10
+        assert Jinja2LocalRenderer.render(template, {"items": ["x"] * 11}) is None
+
+
+def test_failing_templates_are_left_to_the_sandbox():
+    assert Jinja2LocalRenderer.render("{{ count / 0 }}", {"count": 1}) is None
+    assert Jinja2LocalRenderer.render("{{ items | sum }}", {"items": ["a"]}) is None
+
+
+def test_rendered_outputs_are_cached():
+    template = "Hi {{ name }}"
+
+    with patch.object(
+        Jinja2LocalRenderer._environment, "get_template", wraps=Jinja2LocalRenderer._environment.get_template
+    ) as get_template:
+        assert Jinja2LocalRenderer.render(template, {"name": "a"}) == "Hi a"
+        assert Jinja2LocalRenderer.render(template, {"name": "a"}) == "Hi a"
+        assert Jinja2LocalRenderer.render(template, {"name": "b"}) == "Hi b"
+
+    assert get_template.call_count == 2
+
+
+def test_code_executor_renders_jinja2_locally():
+    with (
+        patch("configs.dify_config.JINJA2_LOCAL_RENDER_ENABLED", True),
+        patch.object(CodeExecutor, "execute_code", return_value="<<RESULT>>sandbox<<RESULT>>") as execute_code,
+    ):
+        local = CodeExecutor.execute_workflow_code_template(CodeLanguage.JINJA2, "{{ a }}", {"a": "local"})
+        sandbox = CodeExecutor.execute_workflow_code_template(CodeLanguage.JINJA2, "{{ range(3) }}", {})
+
+    assert local == {"result": "local"}
+    assert sandbox == {"result": "sandbox"}
+    execute_code.assert_called_once()
@@ -0,0 +1,70 @@
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.helper.model_provider_cache import ProviderCredentialsCache, ProviderCredentialsCacheType
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
+
+
+@pytest.fixture
+def mock_redis():
+    store: dict[str, bytes] = {}
+    redis = MagicMock()
+    redis.get.side_effect = lambda key: store.get(key)
+
+    def set_(key, value, nx=False):
+        if nx and key in store:
+            return None
+        store[key] = value.encode("utf-8")
+        return True
+
+    redis.set.side_effect = set_
+    redis.setex.side_effect = lambda key, ttl, value: store.__setitem__(key, value.encode("utf-8"))
+    redis.delete.side_effect = lambda key: store.pop(key, None)
+    redis.store = store
+    with (
+        patch("core.helper.model_provider_cache.redis_client", redis),
+        patch("core.helper.provider_configurations_cache.redis_client", redis),
+        patch("core.helper.model_provider_cache.dify_config.PROVIDER_CREDENTIALS_LOCAL_CACHE_SIZE", 10),
+    ):
+        ProviderCredentialsCache._entries.clear()
+        yield redis
+        ProviderCredentialsCache._entries.clear()
+
+
+def _cache(version):
+    return ProviderCredentialsCache(
+        tenant_id="tenant", identity_id="provider_id", cache_type=ProviderCredentialsCacheType.PROVIDER, version=version
+    )
+
+
+def test_credentials_are_cached_in_process_for_version(mock_redis):
+    version = ProviderConfigurationsCache.get_version("tenant")
+    _cache(version).set({"api_key": "key"})
+    mock_redis.get.reset_mock()
+
+    credentials = _cache(version).get()
+    assert credentials == {"api_key": "key"}
+    credentials["api_key"] = "changed"
+    assert _cache(version).get() == {"api_key": "key"}
+    mock_redis.get.assert_not_called()
+
+    # without a version only redis is used
+    assert _cache(None).get() == {"api_key": "key"}
+    assert mock_redis.get.call_count == 1
+
+
+def test_delete_invalidates_credentials_of_all_processes(mock_redis):
+    version = ProviderConfigurationsCache.get_version("tenant")
+    _cache(version).set({"api_key": "key"})
+
+    # another process changes the credentials
+    mock_redis.store[_cache(None).cache_key] = json.dumps({"api_key": "new_key"}).encode("utf-8")
+    ProviderCredentialsCache(
+        tenant_id="tenant", identity_id="other_id", cache_type=ProviderCredentialsCacheType.PROVIDER
+    ).delete()
+
+    new_version = ProviderConfigurationsCache.get_version("tenant")
+    assert new_version != version
+    assert _cache(new_version).get() == {"api_key": "new_key"}
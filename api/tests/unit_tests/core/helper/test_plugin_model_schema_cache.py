@@ -0,0 +1,218 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis import RedisError
+
+from core.helper.plugin_model_schema_cache import PluginModelSchemaCache
+from core.model_runtime.entities.common_entities import I18nObject
+from core.model_runtime.entities.model_entities import AIModelEntity, FetchFrom, ModelType
+from core.model_runtime.entities.provider_entities import ConfigurateMethod, ProviderEntity
+from core.plugin.entities.plugin_daemon import PluginModelProviderEntity
+
+
+@pytest.fixture
+def mock_redis():
+    store: dict[str, bytes] = {}
+    redis = MagicMock()
+    redis.get.side_effect = lambda key: store.get(key)
+
+    def set_(key, value, nx=False, ex=None):
+        if nx and key in store:
+            return None
+        store[key] = value if isinstance(value, bytes) else str(value).encode("utf-8")
+        return True
+
+    redis.set.side_effect = set_
+    redis.store = store
+    with patch("core.helper.plugin_model_schema_cache.redis_client", redis):
+        yield redis
+
+
+@pytest.fixture(autouse=True)
+def clear_entries():
+    PluginModelSchemaCache._entries.clear()
+    PluginModelSchemaCache._versions.clear()
+    yield
+    PluginModelSchemaCache._entries.clear()
+    PluginModelSchemaCache._versions.clear()
+
+
+def _model_schema(model: str = "gpt-4o") -> AIModelEntity:
+    return AIModelEntity(
+        model=model,
+        label=I18nObject(en_US=model),
+        model_type=ModelType.LLM,
+        fetch_from=FetchFrom.PREDEFINED_MODEL,
+        model_properties={},
+    )
+
+
+def _model_provider() -> PluginModelProviderEntity:
+    return PluginModelProviderEntity(
+        id="provider_id",
+        created_at=datetime(2025, 1, 1),
+        updated_at=datetime(2025, 1, 1),
+        provider="openai",
+        tenant_id="tenant",
+        plugin_unique_identifier="langgenius/openai:0.0.1",
+        plugin_id="langgenius/openai",
+        declaration=ProviderEntity(
+            provider="openai",
+            label=I18nObject(en_US="OpenAI"),
+            supported_model_types=[ModelType.LLM],
+            configurate_methods=[ConfigurateMethod.PREDEFINED_MODEL],
+            models=[_model_schema()],
+        ),
+    )
+
+
+def _get_model_schema(tenant_id: str, credentials: dict, loader) -> AIModelEntity | None:
+    return PluginModelSchemaCache.get_model_schema(
+        tenant_id, "langgenius/openai", "openai", "llm", "gpt-4o", credentials, loader=loader
+    )
+
+
+def test_model_schema_is_loaded_once(mock_redis):
+    loader = MagicMock(return_value=_model_schema())
+
+    first = _get_model_schema("tenant_1", {"api_key": "key"}, loader)
+    second = _get_model_schema("tenant_1", {"api_key": "key"}, loader)
+
+    assert loader.call_count == 1
+    assert first == second == _model_schema()
+    # credentials are only stored hashed
+    assert not any(b"key" in value or "api_key" in key for key, value in mock_redis.store.items())
+
+
+def test_model_schema_is_keyed_by_credentials(mock_redis):
+    loader = MagicMock(return_value=_model_schema())
+
+    _get_model_schema("tenant_2", {"api_key": "key"}, loader)
+    _get_model_schema("tenant_2", {"api_key": "other"}, loader)
+
+    assert loader.call_count == 2
+
+
+def test_model_schema_is_shared_through_redis(mock_redis):
+    loader = MagicMock(return_value=_model_schema())
+    _get_model_schema("tenant_3", {}, loader)
+
+    # another process only has the redis tier
+    PluginModelSchemaCache._entries.clear()
+    PluginModelSchemaCache._versions.clear()
+    assert _get_model_schema("tenant_3", {}, loader) == _model_schema()
+    assert loader.call_count == 1
+
+
+def test_missing_model_schema_is_not_cached(mock_redis):
+    loader = MagicMock(return_value=None)
+
+    assert _get_model_schema("tenant_4", {}, loader) is None
+    assert _get_model_schema("tenant_4", {}, loader) is None
+    assert loader.call_count == 2
+
+
+def test_invalidate_reloads_model_schema(mock_redis):
+    loader = MagicMock(side_effect=[_model_schema("gpt-4o"), _model_schema("gpt-4o-mini")])
+    _get_model_schema("tenant_5", {}, loader)
+
+    PluginModelSchemaCache.invalidate("tenant_5")
+
+    schema = _get_model_schema("tenant_5", {}, loader)
+    assert schema is not None
+    assert schema.model == "gpt-4o-mini"
+
+
+def test_entries_expire_after_ttl(mock_redis):
+    loader = MagicMock(return_value=_model_schema())
+    _get_model_schema("tenant_6", {}, loader)
+
+    with patch("core.helper.plugin_model_schema_cache.dify_config.PLUGIN_MODEL_SCHEMA_CACHE_TTL", -1):
+        mock_redis.store.clear()
+        _get_model_schema("tenant_6", {}, loader)
+
+    assert loader.call_count == 2
+
+
+def test_model_providers_are_copies(mock_redis):
+    loader = MagicMock(return_value=[_model_provider()])
+
+    providers = PluginModelSchemaCache.get_model_providers("tenant_7", loader=loader)
+    # the model provider factory prefixes the provider names with the plugin id
+    providers[0].declaration.provider = "langgenius/openai/openai"
+
+    providers = PluginModelSchemaCache.get_model_providers("tenant_7", loader=loader)
+    assert providers[0].declaration.provider == "openai"
+    assert loader.call_count == 1
+
+
+def test_plugin_model_client_uses_cache(mock_redis):
+    from core.plugin.impl.model import PluginModelClient
+
+    client = PluginModelClient()
+    with (
+        patch("core.plugin.impl.model.dify_config.PLUGIN_MODEL_SCHEMA_CACHE_ENABLED", True),
+        patch.object(PluginModelClient, "_get_model_schema", return_value=_model_schema()) as get_model_schema,
+    ):
+        for _ in range(3):
+            schema = client.get_model_schema(
+                "tenant_8", "user", "langgenius/openai", "openai", "llm", "gpt-4o", {"api_key": "key"}
+            )
+            assert schema == _model_schema()
+
+    assert get_model_schema.call_count == 1
+
+
+def test_plugin_service_invalidates_on_uninstall(mock_redis):
+    from services.plugin.plugin_service import PluginService
+
+    loader = MagicMock(return_value=_model_schema())
+    _get_model_schema("tenant_9", {}, loader)
+
+    with patch("services.plugin.plugin_service.PluginInstaller") as installer:
+        installer.return_value.uninstall.return_value = True
+        assert PluginService.uninstall("tenant_9", "installation_id") is True
+
+    _get_model_schema("tenant_9", {}, loader)
+    assert loader.call_count == 2
+
+
+def test_process_hits_do_not_read_redis(mock_redis):
+    loader = MagicMock(return_value=_model_schema())
+    _get_model_schema("tenant_10", {}, loader)
+    mock_redis.get.reset_mock()
+
+    _get_model_schema("tenant_10", {}, loader)
+
+    mock_redis.get.assert_not_called()
+    assert loader.call_count == 1
+
+
+def test_redis_errors_fall_back_to_loader(mock_redis):
+    loader = MagicMock(return_value=_model_schema())
+    mock_redis.get.side_effect = RedisError("redis is down")
+    mock_redis.set.side_effect = RedisError("redis is down")
+
+    assert _get_model_schema("tenant_11", {}, loader) == _model_schema()
+    providers_loader = MagicMock(return_value=[_model_provider()])
+    assert PluginModelSchemaCache.get_model_providers("tenant_11", loader=providers_loader) == [_model_provider()]
+    PluginModelSchemaCache.invalidate("tenant_11")
+
+
+def test_plugin_service_invalidates_once_per_succeeded_task(mock_redis):
+    from core.plugin.entities.plugin_daemon import PluginInstallTaskStatus
+    from services.plugin.plugin_service import PluginService
+
+    loader = MagicMock(return_value=_model_schema())
+    with patch("services.plugin.plugin_service.PluginInstaller") as installer:
+        installer.return_value.fetch_plugin_installation_task.return_value = MagicMock(
+            status=PluginInstallTaskStatus.Success
+        )
+        PluginService.fetch_install_task("tenant_12", "task_id")
+        _get_model_schema("tenant_12", {}, loader)
+        # the frontend keeps polling the finished task
+        PluginService.fetch_install_task("tenant_12", "task_id")
+        _get_model_schema("tenant_12", {}, loader)
+
+    assert loader.call_count == 1
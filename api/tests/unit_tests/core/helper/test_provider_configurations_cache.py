@@ -0,0 +1,74 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.helper.provider_configurations_cache import ProviderConfigurationsCache
+
+
+@pytest.fixture
+def mock_redis():
+    store: dict[str, bytes] = {}
+    redis = MagicMock()
+    redis.get.side_effect = lambda key: store.get(key)
+
+    def set_(key, value, nx=False):
+        if nx and key in store:
+            return None
+        store[key] = value.encode("utf-8")
+        return True
+
+    redis.set.side_effect = set_
+    with patch("core.helper.provider_configurations_cache.redis_client", redis):
+        yield redis
+
+
+def test_get_returns_cached_configurations_for_current_version(mock_redis):
+    version = ProviderConfigurationsCache.get_version("tenant_1")
+    assert ProviderConfigurationsCache.get_version("tenant_1") == version
+    configurations = object()
+
+    assert ProviderConfigurationsCache.get("tenant_1", version) is None
+    ProviderConfigurationsCache.set("tenant_1", version, configurations)
+    assert ProviderConfigurationsCache.get("tenant_1", version) is configurations
+
+
+def test_invalidate_changes_version(mock_redis):
+    version = ProviderConfigurationsCache.get_version("tenant_2")
+    ProviderConfigurationsCache.set("tenant_2", version, object())
+
+    ProviderConfigurationsCache.invalidate("tenant_2")
+
+    new_version = ProviderConfigurationsCache.get_version("tenant_2")
+    assert new_version != version
+    assert ProviderConfigurationsCache.get("tenant_2", new_version) is None
+
+
+def test_entries_expire_after_ttl(mock_redis):
+    version = ProviderConfigurationsCache.get_version("tenant_3")
+    ProviderConfigurationsCache.set("tenant_3", version, object())
+
+    with patch("core.helper.provider_configurations_cache.dify_config.PROVIDER_CONFIGURATIONS_CACHE_TTL", -1):
+        assert ProviderConfigurationsCache.get("tenant_3", version) is None
+
+
+def test_provider_manager_reuses_cached_configurations(mock_redis):
+    from core.entities.provider_configuration import ProviderConfigurations
+    from core.provider_manager import ProviderManager
+
+    built = ProviderConfigurations(tenant_id="tenant_4")
+    built.configurations["provider"] = MagicMock()
+
+    with (
+        patch("core.provider_manager.dify_config.PROVIDER_CONFIGURATIONS_CACHE_ENABLED", True),
+        patch.object(ProviderManager, "_build_configurations", return_value=built) as build_configurations,
+    ):
+        first = ProviderManager().get_configurations("tenant_4")
+        first.configurations["other"] = MagicMock()
+        second = ProviderManager().get_configurations("tenant_4")
+
+        ProviderConfigurationsCache.invalidate("tenant_4")
+        ProviderManager().get_configurations("tenant_4")
+
+    assert build_configurations.call_count == 2
+    assert list(second.configurations) == ["provider"]
+    assert second.configurations["provider"] is built.configurations["provider"]
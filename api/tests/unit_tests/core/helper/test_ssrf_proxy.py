@@ -1,9 +1,17 @@
 import secrets
 from unittest.mock import MagicMock, patch
 
+import httpx
 import pytest
 
-from core.helper.ssrf_proxy import SSRF_DEFAULT_MAX_RETRIES, STATUS_FORCELIST, make_request
+from core.helper.ssrf_proxy import (
+    SSRF_DEFAULT_MAX_RETRIES,
+    STATUS_FORCELIST,
+    close_clients,
+    get_client,
+    make_request,
+    stream,
+)
 
 
 @patch("httpx.Client.request")
@@ -50,3 +58,77 @@ def test_retry_logic_success(mock_request):
     assert response.status_code == 200
     assert mock_request.call_count == SSRF_DEFAULT_MAX_RETRIES + 1
     assert mock_request.call_args_list[0][1].get("method") == "GET"
+
+
+def test_client_is_reused_across_requests():
+    close_clients()
+    seen_clients = []
+
+    def request(self, method, url, **kwargs):
+        seen_clients.append(self)
+        return MagicMock(status_code=200)
+
+    with patch("httpx.Client.request", request):
+        make_request("GET", "http://example.com")
+        make_request("GET", "http://example.org")
+
+    assert seen_clients[0] is seen_clients[1]
+    assert seen_clients[0] is get_client()
+    close_clients()
+
+
+def test_pooled_client_does_not_keep_cookies():
+    close_clients()
+    sent_cookies = []
+
+    def handle_request(self, request):
+        sent_cookies.append(request.headers.get("cookie"))
+        return httpx.Response(200, headers={"set-cookie": "session=secret; Path=/"}, request=request)
+
+    with patch("httpx.HTTPTransport.handle_request", handle_request):
+        make_request("GET", "http://example.com")
+        make_request("GET", "http://example.com")
+
+    assert sent_cookies == [None, None]
+    close_clients()
+
+
+def test_pooled_client_keeps_cookies_within_a_redirect_chain():
+    close_clients()
+    sent_cookies = []
+
+    def handle_request(self, request):
+        sent_cookies.append(request.headers.get("cookie"))
+        if request.url.path == "/login":
+            return httpx.Response(
+                302, headers={"location": "/home", "set-cookie": "session=secret; Path=/"}, request=request
+            )
+        return httpx.Response(200, request=request)
+
+    with patch("httpx.HTTPTransport.handle_request", handle_request):
+        response = make_request("GET", "http://example.com/login", follow_redirects=True)
+        make_request("GET", "http://example.com/home")
+
+    assert response.status_code == 200
+    assert sent_cookies == [None, "session=secret", None]
+    close_clients()
+
+
+def test_stream_retries_until_headers_and_reads_body_lazily():
+    close_clients()
+    status_codes = [503, 200]
+
+    def handle_request(self, request):
+        return httpx.Response(status_codes.pop(0), content=iter([b"a", b"b"]), request=request)
+
+    with (
+        patch("httpx.HTTPTransport.handle_request", handle_request),
+        patch("core.helper.ssrf_proxy.time.sleep"),
+        stream("GET", "http://example.com/file") as response,
+    ):
+        assert not response.is_stream_consumed
+        assert b"".join(response.iter_bytes()) == b"ab"
+
+    assert response.is_closed
+    assert status_codes == []
+    close_clients()
@@ -0,0 +1,126 @@
+import threading
+import time
+
+from core.helper.task_scheduler import TaskGroup, TaskScheduler
+
+
+def _track_concurrency(counter: dict, lock: threading.Lock, key: str, duration: float = 0.05):
+    with lock:
+        for name in (key, "all"):
+            counter[name] = counter.get(name, 0) + 1
+            counter[f"{name}_max"] = max(counter.get(f"{name}_max", 0), counter[name])
+    time.sleep(duration)
+    with lock:
+        for name in (key, "all"):
+            counter[name] -= 1
+
+
+def test_submit_returns_result_and_exception():
+    scheduler = TaskScheduler(max_workers=2)
+    group = TaskGroup(tenant_id="tenant", max_workers=2, scheduler=scheduler)
+
+    def fail():
+        raise ValueError("failed")
+
+    assert group.submit(lambda x: x * 2, 21).result(timeout=5) == 42
+    future = group.submit(fail)
+    assert isinstance(future.exception(timeout=5), ValueError)
+
+
+def test_group_and_global_limits():
+    scheduler = TaskScheduler(max_workers=3)
+    first = TaskGroup(tenant_id="tenant_1", max_workers=2, scheduler=scheduler)
+    second = TaskGroup(tenant_id="tenant_2", max_workers=10, scheduler=scheduler)
+    counter: dict = {}
+    lock = threading.Lock()
+
+    futures = [first.submit(_track_concurrency, counter, lock, "first") for _ in range(6)]
+    futures += [second.submit(_track_concurrency, counter, lock, "second") for _ in range(6)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert counter["first_max"] <= 2
+    assert counter["all_max"] == 3
+
+
+def test_per_tenant_limit():
+    scheduler = TaskScheduler(max_workers=10, max_workers_per_tenant=2)
+    groups = [TaskGroup(tenant_id="tenant", max_workers=10, scheduler=scheduler) for _ in range(3)]
+    counter: dict = {}
+    lock = threading.Lock()
+
+    futures = [group.submit(_track_concurrency, counter, lock, "tenant") for group in groups for _ in range(3)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert counter["tenant_max"] == 2
+
+
+def test_round_robin_across_groups():
+    scheduler = TaskScheduler(max_workers=1)
+    busy = TaskGroup(tenant_id="tenant", max_workers=1, scheduler=scheduler)
+    other = TaskGroup(tenant_id="tenant", max_workers=1, scheduler=scheduler)
+    order: list[str] = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(timeout=5)
+
+    blocker = busy.submit(block)
+    started.wait(timeout=5)
+    futures = [busy.submit(order.append, "busy") for _ in range(3)]
+    futures.append(other.submit(order.append, "other"))
+    release.set()
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+
+    assert order.index("other") < 2
+
+
+def test_nested_tasks_do_not_deadlock():
+    scheduler = TaskScheduler(max_workers=1)
+    group = TaskGroup(tenant_id="tenant", max_workers=1, scheduler=scheduler)
+
+    def parent():
+        child = group.submit(lambda: "child")
+        with scheduler.blocking():
+            return child.result(timeout=5)
+
+    assert group.submit(parent).result(timeout=10) == "child"
+    assert scheduler._running_count == 0
+
+
+def test_resumed_tasks_exceed_the_limit_until_pending_tasks_wait():
+    scheduler = TaskScheduler(max_workers=1)
+    group = TaskGroup(tenant_id="tenant", max_workers=10, scheduler=scheduler)
+    other = TaskGroup(tenant_id="tenant", max_workers=10, scheduler=scheduler)
+    other_started = threading.Event()
+    release = threading.Event()
+    pending_started = threading.Event()
+
+    def block():
+        other_started.set()
+        release.wait(timeout=5)
+
+    def parent():
+        child = group.submit(lambda: "child")
+        blocker = other.submit(block)
+        with scheduler.blocking():
+            child.result(timeout=5)
+            other_started.wait(timeout=5)
+        # the parent takes its slot back while the other task holds the only one
+        running_count = scheduler._running_count
+        pending = group.submit(pending_started.set)
+        started_early = pending_started.wait(timeout=0.1)
+        release.set()
+        blocker.result(timeout=5)
+        return running_count, started_early, pending
+
+    running_count, started_early, pending = group.submit(parent).result(timeout=10)
+    pending.result(timeout=5)
+
+    assert running_count == 2
+    assert not started_early
@@ -0,0 +1,200 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+from redis import RedisError
+
+from core.memory.history_message_loader import HistoryMessageLoader
+from core.memory.token_buffer_memory import TokenBufferMemory
+from models.model import AppMode, Message, MessageFile
+
+
+class _FakeRedisPipeline:
+    def __init__(self, store: dict):
+        self._store = store
+        self._results: list = []
+
+    def get(self, key):
+        self._results.append(self._store.get(key))
+
+    def setex(self, key, ttl, value):
+        self._store[key] = str(value).encode()
+        self._results.append(True)
+
+    def execute(self):
+        results, self._results = self._results, []
+        return results
+
+
+def _messages(count: int) -> list[SimpleNamespace]:
+    # newest first, as returned by the query
+    return [
+        SimpleNamespace(
+            id=f"message-{i}",
+            query=f"q{i} " * 10,
+            answer=f"a{i} " * 10,
+            workflow_run_id=None,
+            parent_message_id=f"message-{i - 1}" if i > 0 else None,
+            answer_tokens=10,
+        )
+        for i in reversed(range(count))
+    ]
+
+
+def _count_tokens(prompt_messages) -> int:
+    # every prompt message costs 10 tokens plus a fixed overhead of 3 tokens per request
+    return 10 * len(prompt_messages) + 3
+
+
+@pytest.fixture
+def redis_store():
+    store: dict = {}
+    mock_redis = MagicMock()
+    with patch("core.memory.token_buffer_memory.redis_client", mock_redis):
+        mock_redis.pipeline.side_effect = lambda transaction=False: _FakeRedisPipeline(store)
+        yield store
+
+
+def _memory(messages) -> tuple[TokenBufferMemory, MagicMock]:
+    conversation = MagicMock(id="conversation-id", mode=AppMode.CHAT)
+    model_instance = MagicMock(provider="openai", model="gpt-4o")
+    model_instance.get_llm_num_tokens.side_effect = _count_tokens
+    return TokenBufferMemory(conversation=conversation, model_instance=model_instance), model_instance
+
+
+def _query(messages):
+    def query(*entities):
+        mock_query = MagicMock()
+        if entities[0] is MessageFile:
+            mock_query.filter.return_value.all.return_value = []
+        else:
+            assert entities[0] is Message.id
+            mock_query.filter.return_value.order_by.return_value.limit.return_value.all.return_value = messages
+        return mock_query
+
+    return query
+
+
+def _get_history_prompt_messages(memory, messages, max_token_limit):
+    with patch("core.memory.history_message_loader.db") as mock_db:
+        mock_db.session.query.side_effect = _query(messages)
+        return memory.get_history_prompt_messages(max_token_limit=max_token_limit)
+
+
+def test_prune_history_with_cached_message_tokens(redis_store):
+    messages = _messages(20)
+    memory, model_instance = _memory(messages)
+
+    prompt_messages = _get_history_prompt_messages(memory, messages, 100)
+
+    assert len(prompt_messages) == 9
+    assert prompt_messages[-1].content == messages[0].answer
+    # one call for the whole history and one per dropped message, as many as dropping them one by one
+    assert model_instance.get_llm_num_tokens.call_count == 1 + 31
+    assert len(redis_store) == 31
+    assert set(redis_store.values()) == {b"10"}
+
+    model_instance.get_llm_num_tokens.reset_mock()
+    assert len(_get_history_prompt_messages(memory, messages, 100)) == 9
+
+    # dropped messages are skipped with their cached counts on the next turn, and the result is checked
+    assert model_instance.get_llm_num_tokens.call_count == 3
+
+
+def test_prune_history_corrects_estimate(redis_store):
+    messages = _messages(20)
+    memory, _ = _memory(messages)
+    _get_history_prompt_messages(memory, messages, 100)
+
+    # overestimated counts drop too many messages, which are added back
+    for key in redis_store:
+        redis_store[key] = b"30"
+    assert len(_get_history_prompt_messages(memory, messages, 100)) == 9
+
+    # underestimated counts drop too few messages, more are dropped
+    for key in redis_store:
+        redis_store[key] = b"5"
+    assert len(_get_history_prompt_messages(memory, messages, 100)) == 9
+
+
+def test_prune_history_without_redis():
+    messages = _messages(20)
+    memory, model_instance = _memory(messages)
+    mock_redis = MagicMock()
+    mock_redis.pipeline.return_value.execute.side_effect = RedisError("redis is down")
+
+    with patch("core.memory.token_buffer_memory.redis_client", mock_redis):
+        assert len(_get_history_prompt_messages(memory, messages, 100)) == 9
+
+    assert model_instance.get_llm_num_tokens.call_count == 1 + 31
+
+
+def test_history_under_limit_is_not_pruned(redis_store):
+    messages = _messages(3)
+    memory, model_instance = _memory(messages)
+
+    with patch("core.memory.history_message_loader.db") as mock_db:
+        mock_db.session.query.side_effect = _query(messages)
+        prompt_messages = memory.get_history_prompt_messages(max_token_limit=2000)
+
+    assert len(prompt_messages) == 6
+    assert model_instance.get_llm_num_tokens.call_count == 1
+    assert redis_store == {}
+
+
+def test_history_message_files_are_loaded_in_one_query(redis_store):
+    messages = _messages(5)
+    memory, _ = _memory(messages)
+
+    with patch("core.memory.history_message_loader.db") as mock_db:
+        mock_db.session.query.side_effect = _query(messages)
+        memory.get_history_prompt_messages(max_token_limit=2000)
+
+    queried_entities = [call.args[0] for call in mock_db.session.query.call_args_list]
+    assert queried_entities.count(MessageFile) == 1
+
+
+def test_history_message_snapshot_cache(redis_store):
+    messages = _messages(3)
+    memory, _ = _memory(messages)
+    snapshots: dict = {}
+    mock_redis = MagicMock()
+    mock_redis.hget.side_effect = lambda key, field: snapshots.get((key, field))
+    mock_redis.hset.side_effect = lambda key, field, value: snapshots.__setitem__((key, field), value)
+    mock_redis.delete.side_effect = lambda key: [snapshots.pop(k) for k in list(snapshots) if k[0] == key]
+
+    with (
+        patch("core.memory.history_message_loader.dify_config.MEMORY_SNAPSHOT_CACHE_ENABLED", True),
+        patch("core.memory.history_message_loader.redis_client", mock_redis),
+        patch("core.memory.history_message_loader.db") as mock_db,
+    ):
+        mock_db.session.query.side_effect = _query(messages)
+        first = memory.get_history_prompt_messages(max_token_limit=2000)
+        query_count = mock_db.session.query.call_count
+        second = memory.get_history_prompt_messages(max_token_limit=2000)
+        assert mock_db.session.query.call_count == query_count
+        assert second == first
+
+        HistoryMessageLoader.invalidate("conversation-id")
+        memory.get_history_prompt_messages(max_token_limit=2000)
+        assert mock_db.session.query.call_count == 2 * query_count
+
+
+def test_history_messages_are_loaded_while_redis_is_down(redis_store):
+    messages = _messages(3)
+    memory, _ = _memory(messages)
+    mock_redis = MagicMock()
+    mock_redis.hget.side_effect = RedisError("connection refused")
+    mock_redis.delete.side_effect = RedisError("connection refused")
+
+    with (
+        patch("core.memory.history_message_loader.dify_config.MEMORY_SNAPSHOT_CACHE_ENABLED", True),
+        patch("core.memory.history_message_loader.redis_client", mock_redis),
+        patch("core.memory.history_message_loader.db") as mock_db,
+    ):
+        mock_db.session.query.side_effect = _query(messages)
+        prompt_messages = memory.get_history_prompt_messages(max_token_limit=2000)
+        HistoryMessageLoader.invalidate("conversation-id")
+
+    assert len(prompt_messages) == 6
+    mock_redis.hset.assert_not_called()
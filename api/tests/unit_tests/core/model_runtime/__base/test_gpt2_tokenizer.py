@@ -0,0 +1,103 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from core.model_runtime.model_providers.__base.tokenizers import gpt2_tokenzier
+from core.model_runtime.model_providers.__base.tokenizers.gpt2_tokenzier import GPT2Tokenizer
+
+# pre-tokenization pattern of GPT-2, stands in for the BPE encoder which needs to be downloaded
+_PATTERN = re.compile(r"""'s|'t|'re|'ve|'m|'ll|'d| ?[^\W\d_]+| ?\d+| ?[^\s\w]+|\s+(?!\S)|\s+""")
+
+
+class _FakeEncoder:
+    def __init__(self) -> None:
+        self.encoded = 0
+
+    def encode(self, text: str) -> list[str]:
+        self.encoded += 1
+        return _PATTERN.findall(text)
+
+    def encode_batch(self, texts: list[str]) -> list[list[str]]:
+        return [self.encode(text) for text in texts]
+
+
+@pytest.fixture
+def encoder():
+    encoder = _FakeEncoder()
+    with patch.object(gpt2_tokenzier, "_tokenizer", encoder):
+        gpt2_tokenzier._num_tokens_cache.clear()
+        yield encoder
+    gpt2_tokenzier._num_tokens_cache.clear()
+
+
+def _corpus() -> list[str]:
+    paragraph = (
+        "Dify is an open-source LLM app development platform. Its intuitive interface combines agentic AI "
+        "workflow, RAG pipeline, agent capabilities, model management, observability features and more, "
+        "letting you quickly go from prototype to production. Chunk {}: the quick brown fox jumps over the lazy dog."
+    )
+    # splitters and memory pruning count the same chunks again and again
+    return [paragraph.format(i % 50) * 4 for i in range(500)]
+
+
+def test_get_num_tokens_is_cached(encoder):
+    assert GPT2Tokenizer.get_num_tokens("hello world") == 2
+    assert GPT2Tokenizer.get_num_tokens("hello world") == 2
+    assert encoder.encoded == 1
+
+
+def test_get_num_tokens_batch(encoder):
+    GPT2Tokenizer.get_num_tokens("hello world")
+
+    counts = GPT2Tokenizer.get_num_tokens_batch(["hello world", "a b c", "a b c", ""])
+
+    assert counts == [2, 3, 3, 0]
+    # cached and repeated texts are encoded once
+    assert encoder.encoded == 3
+    assert GPT2Tokenizer.get_num_tokens_batch([]) == []
+
+
+def test_get_num_tokens_batch_without_cache(encoder):
+    with patch("configs.dify_config.GPT2_TOKENIZER_CACHE_SIZE", 0):
+        assert GPT2Tokenizer.get_num_tokens_batch(["a b", "a b"]) == [2, 2]
+        assert GPT2Tokenizer.get_num_tokens_batch(["a b"]) == [2]
+
+    assert encoder.encoded == 2
+
+
+def test_get_num_tokens_batch_in_process_pool(encoder):
+    texts = [f"text number {i}" for i in range(10)]
+    with (
+        patch("configs.dify_config.GPT2_TOKENIZER_PROCESS_POOL_WORKERS", 3),
+        patch("configs.dify_config.GPT2_TOKENIZER_PROCESS_POOL_MIN_CHARS", 1),
+        ThreadPoolExecutor(max_workers=3) as pool,
+        patch.object(GPT2Tokenizer, "_get_process_pool", return_value=pool) as get_process_pool,
+    ):
+        counts = GPT2Tokenizer.get_num_tokens_batch(texts)
+
+    get_process_pool.assert_called_once()
+    assert counts == [3] * 10
+
+
+@pytest.mark.benchmark(group="gpt2_tokenizer")
+def test_get_num_tokens_uncached_benchmark(benchmark, encoder):
+    corpus = _corpus()
+
+    counts = benchmark(lambda: [GPT2Tokenizer._get_num_tokens_by_gpt2(text) for text in corpus])
+
+    assert len(counts) == len(corpus)
+
+
+@pytest.mark.benchmark(group="gpt2_tokenizer")
+def test_get_num_tokens_batch_cached_benchmark(benchmark, encoder):
+    corpus = _corpus()
+    expected = [GPT2Tokenizer._get_num_tokens_by_gpt2(text) for text in corpus]
+    encoder.encoded = 0
+
+    counts = benchmark(GPT2Tokenizer.get_num_tokens_batch, corpus)
+
+    assert counts == expected
+    # each distinct chunk is encoded once, then served from the cache
+    assert encoder.encoded == 50
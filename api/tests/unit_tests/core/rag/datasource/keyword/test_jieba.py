@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock, patch
+
+from core.rag.datasource.keyword.jieba.jieba import Jieba
+from models.dataset import DocumentSegment
+
+
+def _segment(index_node_id: str, document_id: str = "document_id") -> DocumentSegment:
+    return DocumentSegment(
+        index_node_id=index_node_id,
+        index_node_hash=f"{index_node_id}_hash",
+        content=f"{index_node_id} content",
+        document_id=document_id,
+        dataset_id="dataset_id",
+    )
+
+
+def _search(keyword_table: dict, segments: list[DocumentSegment], **kwargs):
+    dataset = MagicMock(id="dataset_id")
+    jieba = Jieba(dataset)
+    queried_node_ids = []
+
+    def get_segments(index_node_ids, document_ids_filter=None):
+        queried_node_ids.append(list(index_node_ids))
+        return {
+            segment.index_node_id: segment
+            for segment in segments
+            if segment.index_node_id in index_node_ids
+            and (not document_ids_filter or segment.document_id in document_ids_filter)
+        }
+
+    with (
+        patch.object(Jieba, "_get_sharded_keyword_table", return_value=None),
+        patch.object(Jieba, "_get_dataset_keyword_table", return_value=keyword_table),
+        patch("core.rag.datasource.keyword.jieba.jieba.JiebaKeywordTableHandler") as handler,
+        patch.object(Jieba, "_get_segments_by_index_node_ids", side_effect=get_segments),
+    ):
+        handler.return_value.extract_keywords.return_value = {"apple", "banana"}
+        documents = jieba.search("apple banana", **kwargs)
+    return documents, queried_node_ids
+
+
+def test_search_hydrates_segments_in_one_query_and_keeps_ranking():
+    keyword_table = {"apple": {"node_1", "node_2"}, "banana": {"node_2", "node_3"}}
+    segments = [_segment("node_1"), _segment("node_2"), _segment("node_3")]
+
+    documents, queried_node_ids = _search(keyword_table, segments, top_k=2)
+
+    assert len(queried_node_ids) == 1
+    assert [document.metadata["doc_id"] for document in documents][0] == "node_2"
+    assert len(documents) == 2
+
+
+def test_search_applies_document_filter_before_top_k():
+    keyword_table = {"apple": {"node_1", "node_2", "node_3"}, "banana": {"node_1", "node_2"}}
+    segments = [
+        _segment("node_1", "other_document"),
+        _segment("node_2", "other_document"),
+        _segment("node_3", "document_id"),
+    ]
+
+    documents, queried_node_ids = _search(keyword_table, segments, top_k=1, document_ids_filter=["document_id"])
+
+    assert [document.metadata["doc_id"] for document in documents] == ["node_3"]
+    assert len(queried_node_ids) == 1
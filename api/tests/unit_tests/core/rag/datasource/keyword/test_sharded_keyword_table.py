@@ -0,0 +1,81 @@
+import json
+from unittest.mock import MagicMock, patch
+
+from core.rag.datasource.keyword.jieba import sharded_keyword_table
+from core.rag.datasource.keyword.jieba.sharded_keyword_table import ShardedKeywordTable, get_shard_index
+
+
+def _find_keywords_in_different_shards() -> tuple[str, str]:
+    first = "keyword_0"
+    for i in range(1, 1000):
+        if get_shard_index(f"keyword_{i}") != get_shard_index(first):
+            return first, f"keyword_{i}"
+    raise AssertionError("no keywords in different shards")
+
+
+def test_get_shard_index_is_stable():
+    assert get_shard_index("dify") == get_shard_index("dify")
+    assert 0 <= get_shard_index("dify") < sharded_keyword_table.KEYWORD_TABLE_SHARD_COUNT
+
+
+def test_add_only_saves_shards_of_added_keywords():
+    first, second = _find_keywords_in_different_shards()
+    table = ShardedKeywordTable("dataset_id")
+    existing = {get_shard_index(first): {first: {"node_1"}, "other": {"node_3"}}}
+
+    with (
+        patch.object(ShardedKeywordTable, "_load_shards", return_value=existing) as load_shards,
+        patch.object(ShardedKeywordTable, "_save_shards") as save_shards,
+    ):
+        table.add({"node_2": [first]})
+
+    load_shards.assert_called_once_with({get_shard_index(first)})
+    saved = save_shards.call_args.args[0]
+    assert saved == {get_shard_index(first): {first: {"node_1", "node_2"}, "other": {"node_3"}}}
+    # cached shard tables are not modified
+    assert existing[get_shard_index(first)][first] == {"node_1"}
+    assert get_shard_index(second) not in saved
+
+
+def test_delete_ids_only_saves_changed_shards():
+    first, second = _find_keywords_in_different_shards()
+    table = ShardedKeywordTable("dataset_id")
+    shards = {
+        get_shard_index(first): {first: {"node_1"}},
+        get_shard_index(second): {second: {"node_1", "node_2"}},
+    }
+
+    with (
+        patch.object(ShardedKeywordTable, "_load_shards", return_value=shards),
+        patch.object(ShardedKeywordTable, "_save_shards") as save_shards,
+    ):
+        table.delete_ids(["node_2"])
+
+    assert save_shards.call_args.args[0] == {get_shard_index(second): {second: {"node_1"}}}
+
+
+def test_load_shards_caches_by_version():
+    shard_index = get_shard_index("keyword")
+    mock_db = MagicMock()
+    mock_db.session.query.return_value.filter.return_value.all.return_value = [
+        (shard_index, "shard_id", 1, json.dumps({"keyword": ["node_1"]}))
+    ]
+    table = ShardedKeywordTable("cached_dataset_id")
+
+    with (
+        patch.object(sharded_keyword_table, "db", mock_db),
+        patch.object(ShardedKeywordTable, "_get_shard_versions", return_value={shard_index: ("shard_id", 1)}),
+    ):
+        assert table.load(["keyword"]) == {"keyword": {"node_1"}}
+        assert table.load(["keyword"]) == {"keyword": {"node_1"}}
+    assert mock_db.session.query.call_count == 1
+
+    mock_db.session.query.return_value.filter.return_value.all.return_value = [
+        (shard_index, "shard_id", 2, json.dumps({"keyword": ["node_1", "node_2"]}))
+    ]
+    with (
+        patch.object(sharded_keyword_table, "db", mock_db),
+        patch.object(ShardedKeywordTable, "_get_shard_versions", return_value={shard_index: ("shard_id", 2)}),
+    ):
+        assert table.load(["keyword"]) == {"keyword": {"node_1", "node_2"}}
+    assert mock_db.session.query.call_count == 2
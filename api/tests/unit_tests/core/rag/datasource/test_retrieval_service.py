@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+from core.rag.datasource.retrieval_service import RetrievalService
+from core.rag.index_processor.constant.index_type import IndexType
+from core.rag.models.document import Document
+from models.dataset import DocumentSegment
+
+
+class _FakeStore:
+    """In-memory stand-in for the segment and child chunk tables that counts bulk lookups."""
+
+    def __init__(self, dataset_documents, child_chunks, segments):
+        self.dataset_documents = dataset_documents
+        self.child_chunks = child_chunks
+        self.segments = segments
+        self.lookups = 0
+
+    def get_child_chunks_by_index_node_ids(self, index_node_ids):
+        self.lookups += 1
+        return {c.index_node_id: c for c in self.child_chunks if c.index_node_id in index_node_ids}
+
+    def get_segments_by_ids(self, dataset_ids, segment_ids):
+        self.lookups += 1
+        return {s.id: s for s in self.segments if s.id in segment_ids and s.dataset_id in dataset_ids}
+
+    def get_segments_by_index_node_ids(self, dataset_ids, index_node_ids):
+        self.lookups += 1
+        return {
+            (s.dataset_id, s.index_node_id): s
+            for s in self.segments
+            if s.index_node_id in index_node_ids and s.dataset_id in dataset_ids
+        }
+
+
+def _segment(segment_id, dataset_id, index_node_id):
+    return DocumentSegment(
+        id=segment_id, dataset_id=dataset_id, index_node_id=index_node_id, content=f"content {segment_id}", answer=None
+    )
+
+
+def _child_chunk(chunk_id, segment_id, index_node_id, position):
+    return SimpleNamespace(
+        id=chunk_id, segment_id=segment_id, index_node_id=index_node_id, content=f"child {chunk_id}", position=position
+    )
+
+
+def _document(document_id, doc_id, score):
+    return Document(page_content="", metadata={"document_id": document_id, "doc_id": doc_id, "score": score})
+
+
+def _format(store, documents):
+    with (
+        patch("core.rag.datasource.retrieval_service.db") as mock_db,
+        patch.object(RetrievalService, "_get_child_chunks_by_index_node_ids", store.get_child_chunks_by_index_node_ids),
+        patch.object(RetrievalService, "_get_segments_by_ids", store.get_segments_by_ids),
+        patch.object(RetrievalService, "_get_segments_by_index_node_ids", store.get_segments_by_index_node_ids),
+    ):
+        mock_db.session.query.return_value.filter.return_value.options.return_value.all.return_value = (
+            store.dataset_documents
+        )
+        return RetrievalService.format_retrieval_documents(documents)
+
+
+def _build_store(num_documents):
+    dataset_documents = [
+        SimpleNamespace(id="doc-text", doc_form=IndexType.PARAGRAPH_INDEX, dataset_id="dataset-1"),
+        SimpleNamespace(id="doc-parent", doc_form=IndexType.PARENT_CHILD_INDEX, dataset_id="dataset-2"),
+    ]
+    segments = [_segment(f"seg-{i}", "dataset-1", f"node-{i}") for i in range(num_documents)]
+    segments += [_segment(f"parent-{i}", "dataset-2", f"parent-node-{i}") for i in range(num_documents)]
+    child_chunks = [_child_chunk(f"child-{i}", f"parent-{i // 2}", f"child-node-{i}", i) for i in range(num_documents)]
+    return _FakeStore(dataset_documents, child_chunks, segments)
+
+
+def test_format_retrieval_documents():
+    store = _build_store(4)
+    documents = [
+        _document("doc-text", "node-1", 0.9),
+        _document("doc-parent", "child-node-0", 0.5),
+        _document("doc-parent", "child-node-1", 0.8),
+        _document("doc-text", "missing-node", 0.7),
+        _document("doc-parent", "child-node-2", 0.6),
+        _document("doc-text", "node-0", 0.4),
+        _document("unknown-doc", "node-2", 0.3),
+    ]
+
+    records = _format(store, documents)
+
+    assert [record.segment.id for record in records] == ["seg-1", "parent-0", "parent-1", "seg-0"]
+    assert [record.score for record in records] == [0.9, 0.8, 0.6, 0.4]
+    assert records[0].child_chunks is None
+    assert [chunk.id for chunk in records[1].child_chunks] == ["child-0", "child-1"]
+    assert [chunk.id for chunk in records[2].child_chunks] == ["child-2"]
+    assert store.lookups == 3
+
+
+def test_format_retrieval_documents_ignores_segment_of_other_dataset():
+    store = _build_store(1)
+    store.segments.append(_segment("seg-other", "dataset-2", "node-shared"))
+
+    records = _format(store, [_document("doc-text", "node-shared", 0.9)])
+
+    assert records == []
+
+
+@pytest.mark.parametrize("num_documents", [50])
+def test_format_retrieval_documents_benchmark(benchmark, num_documents):
+    store = _build_store(num_documents)
+    documents = [_document("doc-text", f"node-{i}", 0.5) for i in range(num_documents)]
+    documents += [_document("doc-parent", f"child-node-{i}", 0.5) for i in range(num_documents)]
+
+    records = benchmark(_format, store, documents)
+
+    assert len(records) == num_documents + num_documents // 2
+    # the number of lookups does not grow with the number of retrieved documents
+    store.lookups = 0
+    _format(store, documents)
+    assert store.lookups == 3
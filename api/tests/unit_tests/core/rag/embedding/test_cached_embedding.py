@@ -0,0 +1,112 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from core.rag.embedding.cached_embedding import CacheEmbedding
+from libs import helper
+from models.dataset import Embedding
+
+
+def _model_instance(vectors_by_text: dict[str, list[float]]) -> MagicMock:
+    model_instance = MagicMock()
+    model_instance.provider = "openai"
+    model_instance.model = "text-embedding-3-small"
+    model_instance.provider_model_bundle.configuration.tenant_id = "tenant"
+    model_instance.model_type_instance.get_model_schema.return_value = None
+
+    def invoke_text_embedding(texts, user=None, input_type=None):
+        result = MagicMock()
+        result.embeddings = [vectors_by_text[text] for text in texts]
+        return result
+
+    model_instance.invoke_text_embedding.side_effect = invoke_text_embedding
+    return model_instance
+
+
+def _cached_row(text: str, vector: list[float]) -> Embedding:
+    embedding = Embedding(
+        model_name="text-embedding-3-small", hash=helper.generate_text_hash(text), provider_name="openai"
+    )
+    embedding.set_embedding(vector)
+    return embedding
+
+
+def test_embed_documents_looks_up_cache_in_bulk():
+    model_instance = _model_instance({"miss": [3.0, 4.0]})
+    with patch("core.rag.embedding.cached_embedding.db") as mock_db:
+        query = mock_db.session.query.return_value.filter.return_value
+        query.all.return_value = [_cached_row("hit", [1.0, 0.0])]
+
+        result = CacheEmbedding(model_instance).embed_documents(["hit", "miss", "hit"])
+
+    assert result[0] == [1.0, 0.0]
+    assert result[2] == [1.0, 0.0]
+    assert np.allclose(result[1], [0.6, 0.8])
+    # one lookup query for all texts and a single bulk insert for the miss
+    assert mock_db.session.query.call_count == 1
+    assert mock_db.session.execute.call_count == 1
+    mock_db.session.commit.assert_called_once()
+    model_instance.invoke_text_embedding.assert_called_once()
+    assert model_instance.invoke_text_embedding.call_args.kwargs["texts"] == ["miss"]
+
+
+def test_embed_documents_skips_nan_without_shifting_results():
+    model_instance = _model_instance({"zero": [0.0, 0.0], "ok": [0.0, 2.0]})
+    with patch("core.rag.embedding.cached_embedding.db") as mock_db:
+        mock_db.session.query.return_value.filter.return_value.all.return_value = []
+        result = CacheEmbedding(model_instance).embed_documents(["zero", "ok"])
+
+    assert result[0] is None
+    assert np.allclose(result[1], [0.0, 1.0])
+
+
+def test_embed_query_is_single_flight_per_model():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_model_instance(model: str) -> MagicMock:
+        model_instance = _model_instance({"query": [3.0, 4.0]})
+        model_instance.model = model
+        invoke_text_embedding = model_instance.invoke_text_embedding.side_effect
+
+        def invoke(*args, **kwargs):
+            started.set()
+            release.wait(timeout=5)
+            return invoke_text_embedding(*args, **kwargs)
+
+        model_instance.invoke_text_embedding.side_effect = invoke
+        return model_instance
+
+    same_model = [slow_model_instance("text-embedding-3-small") for _ in range(8)]
+    other_model = slow_model_instance("text-embedding-3-large")
+    with patch("core.rag.embedding.cached_embedding.redis_client", MagicMock(**{"get.return_value": None})):
+        with ThreadPoolExecutor(max_workers=9) as executor:
+            futures = [executor.submit(CacheEmbedding(same_model[0]).embed_query, "query")]
+            started.wait(timeout=5)
+            futures += [executor.submit(CacheEmbedding(m).embed_query, "query") for m in same_model[1:]]
+            futures.append(executor.submit(CacheEmbedding(other_model).embed_query, "query"))
+            # let the followers join the flight before it completes
+            time.sleep(0.1)
+            release.set()
+            results = [future.result(timeout=5) for future in futures]
+
+    assert all(np.allclose(result, [0.6, 0.8]) for result in results)
+    assert sum(m.invoke_text_embedding.call_count for m in same_model) == 1
+    assert other_model.invoke_text_embedding.call_count == 1
+
+
+def test_embed_query_failure_is_shared_then_retried():
+    model_instance = _model_instance({})
+    model_instance.invoke_text_embedding.side_effect = ValueError("rate limited")
+    with patch("core.rag.embedding.cached_embedding.redis_client", MagicMock(**{"get.return_value": None})):
+        with pytest.raises(ValueError):
+            CacheEmbedding(model_instance).embed_query("query")
+
+        model_instance.invoke_text_embedding.side_effect = _model_instance(
+            {"query": [1.0, 0.0]}
+        ).invoke_text_embedding.side_effect
+        assert CacheEmbedding(model_instance).embed_query("query") == [1.0, 0.0]
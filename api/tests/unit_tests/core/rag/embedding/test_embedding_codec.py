@@ -0,0 +1,50 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from core.rag.embedding.embedding_codec import (
+    EmbeddingStorageType,
+    decode_embedding,
+    encode_embedding,
+    is_encoded_embedding,
+)
+
+VECTOR = [0.5, -0.25, 0.125, 0.0, -1.0]
+
+
+@pytest.mark.parametrize(
+    ("storage_type", "atol"),
+    [
+        (EmbeddingStorageType.FLOAT32, 0.0),
+        (EmbeddingStorageType.FLOAT16, 1e-3),
+        (EmbeddingStorageType.INT8, 1e-2),
+    ],
+)
+def test_encode_decode_round_trip(storage_type, atol):
+    data = encode_embedding(VECTOR, storage_type)
+
+    assert is_encoded_embedding(data)
+    assert np.allclose(decode_embedding(data), VECTOR, atol=atol)
+
+
+def test_float32_payload_size():
+    data = encode_embedding(VECTOR)
+
+    assert len(data) == 8 + 4 * len(VECTOR)
+    assert len(data) < len(pickle.dumps(VECTOR, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_decode_legacy_pickle():
+    data = pickle.dumps(VECTOR, protocol=pickle.HIGHEST_PROTOCOL)
+
+    assert not is_encoded_embedding(data)
+    assert decode_embedding(data).tolist() == VECTOR
+
+
+def test_decode_unknown_version():
+    data = bytearray(encode_embedding(VECTOR))
+    data[4] = 99
+
+    with pytest.raises(ValueError):
+        decode_embedding(bytes(data))
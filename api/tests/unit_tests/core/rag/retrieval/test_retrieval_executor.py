@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+from flask import Flask, current_app, g
+
+from core.rag.retrieval.retrieval_executor import RetrievalExecutor
+
+
+@pytest.fixture
+def flask_app():
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+
+def test_run_returns_results_and_exceptions(flask_app):
+    executor = RetrievalExecutor(max_workers=4)
+
+    def fail():
+        raise ValueError("vector store is down")
+
+    futures = executor.run("tenant", [("dataset_1", lambda: ["document"]), ("dataset_2", fail)])
+
+    assert futures[0].result() == ["document"]
+    assert isinstance(futures[1].exception(), ValueError)
+
+
+def test_searches_run_in_an_app_context_of_the_app(flask_app):
+    executor = RetrievalExecutor(max_workers=1)
+
+    futures = executor.run("tenant", [("dataset", lambda: current_app._get_current_object())] * 2)
+
+    assert all(future.result() is flask_app for future in futures)
+
+
+def test_searches_do_not_share_the_app_context(flask_app):
+    executor = RetrievalExecutor(max_workers=1)
+
+    def search():
+        seen = g.get("user")
+        g.user = "tenant_1_user"
+        return seen
+
+    first = executor.run("tenant_1", [("dataset", search)])
+    second = executor.run("tenant_2", [("dataset", search)])
+
+    assert first[0].result() is None
+    assert second[0].result() is None
+
+
+def test_slow_search_is_ignored_after_timeout(flask_app):
+    executor = RetrievalExecutor(max_workers=4)
+    release = threading.Event()
+
+    start_at = time.perf_counter()
+    futures = executor.run(
+        "tenant",
+        [("fast", lambda: ["document"]), ("slow", lambda: release.wait(timeout=5))],
+        timeout=0.2,
+    )
+    elapsed = time.perf_counter() - start_at
+    release.set()
+
+    assert elapsed < 2
+    assert futures[0].result() == ["document"]
+    assert not futures[1].done()
+
+
+def test_per_tenant_limit(flask_app):
+    executor = RetrievalExecutor(max_workers=10, max_workers_per_tenant=2)
+    lock = threading.Lock()
+    counter = {"running": 0, "max": 0}
+
+    def search():
+        with lock:
+            counter["running"] += 1
+            counter["max"] = max(counter["max"], counter["running"])
+        time.sleep(0.05)
+        with lock:
+            counter["running"] -= 1
+        return []
+
+    executor.run("tenant", [("dataset", search)] * 6)
+
+    assert counter["max"] == 2
+
+
+def test_nested_searches_do_not_deadlock(flask_app):
+    executor = RetrievalExecutor(max_workers=1)
+
+    def search():
+        # a dataset retriever running the searches of its retrieval methods
+        return [future.result() for future in executor.run("tenant", [("dataset", lambda: "child")] * 2)]
+
+    futures = executor.run("tenant", [("dataset", search)], timeout=10)
+
+    assert futures[0].result() == ["child", "child"]
+
+
+def test_nested_searches_return_partial_results_before_the_deadline(flask_app):
+    executor = RetrievalExecutor(max_workers=4)
+    release = threading.Event()
+
+    def search():
+        # the retrieval methods of a dataset, one of which hangs
+        futures = executor.run("tenant", [("dataset", lambda: "child"), ("dataset", lambda: release.wait(timeout=5))])
+        return [future.result() for future in futures if future.done()]
+
+    futures = executor.run("tenant", [("dataset", search)], timeout=0.5)
+    release.set()
+
+    assert futures[0].done()
+    assert futures[0].result() == ["child"]
@@ -0,0 +1,148 @@
+from collections import defaultdict
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from core.rag.index_processor.constant.index_type import IndexType
+from core.rag.models.document import Document
+from core.rag.retrieval.retrieval_stats import DATASET_QUERIES_KEY, SEGMENT_HITS_KEY, RetrievalStats
+
+
+class _FakeRedis:
+    """In-memory stand-in for the hash and list commands used to buffer the stats."""
+
+    def __init__(self):
+        self.hashes: dict[str, dict[bytes, int]] = defaultdict(dict)
+        self.lists: dict[str, list[bytes]] = defaultdict(list)
+
+    def hincrby(self, key, field, amount):
+        field = field.encode("utf-8")
+        self.hashes[key][field] = self.hashes[key].get(field, 0) + amount
+
+    def hgetall(self, key):
+        return {field: str(count).encode("utf-8") for field, count in self.hashes[key].items()}
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+        self.lists.pop(key, None)
+
+    def rpush(self, key, *items):
+        self.lists[key].extend(item if isinstance(item, bytes) else item.encode("utf-8") for item in items)
+
+    def lrange(self, key, start, end):
+        return self.lists[key][start : end + 1]
+
+    def ltrim(self, key, start, end):
+        self.lists[key] = self.lists[key][start:]
+
+    def pipeline(self, transaction=True):
+        redis = self
+        results = []
+
+        class _Pipeline:
+            def __getattr__(self, name):
+                return lambda *args: results.append(getattr(redis, name)(*args))
+
+            def execute(self):
+                return list(results)
+
+        return _Pipeline()
+
+
+@pytest.fixture
+def fake_redis():
+    redis = _FakeRedis()
+    with (
+        patch("core.rag.retrieval.retrieval_stats.redis_client", redis),
+        patch("core.rag.retrieval.retrieval_stats.dify_config.DATASET_RETRIEVAL_STATS_BUFFER_ENABLED", True),
+    ):
+        yield redis
+
+
+def _document(document_id, doc_id, dataset_id="dataset"):
+    return Document(page_content="", metadata={"document_id": document_id, "doc_id": doc_id, "dataset_id": dataset_id})
+
+
+def _record_queries(dataset_ids):
+    RetrievalStats.record_dataset_queries(
+        dataset_ids, content="query", source="app", source_app_id="app", created_by_role="account", created_by="user"
+    )
+
+
+def test_record_buffers_without_touching_the_database(fake_redis):
+    with patch("core.rag.retrieval.retrieval_stats.db") as mock_db:
+        RetrievalStats.record_segment_hits(
+            [_document("document", "node_1"), _document("document", "node_1"), _document("document", "node_2")]
+        )
+        _record_queries(["dataset_1", "dataset_2"])
+
+    mock_db.session.execute.assert_not_called()
+    mock_db.session.commit.assert_not_called()
+    assert fake_redis.hashes[SEGMENT_HITS_KEY] == {b"dataset:document:node_1": 2, b"dataset:document:node_2": 1}
+    assert len(fake_redis.lists[DATASET_QUERIES_KEY]) == 2
+
+
+def test_flush_writes_grouped_hits_and_bulk_queries(fake_redis):
+    for _ in range(3):
+        RetrievalStats.record_segment_hits([_document("document", "node_1"), _document("parent_child", "child_1")])
+        _record_queries(["dataset_1", "dataset_2"])
+
+    with patch("core.rag.retrieval.retrieval_stats.db") as mock_db:
+        mock_db.session.execute.side_effect = [
+            # documents, child chunks and segments looked up once for all hits
+            MagicMock(
+                tuples=lambda: MagicMock(
+                    all=lambda: [
+                        ("document", IndexType.PARAGRAPH_INDEX),
+                        ("parent_child", IndexType.PARENT_CHILD_INDEX),
+                    ]
+                )
+            ),
+            MagicMock(all=lambda: [("parent_child", "child_1", "segment_2")]),
+            MagicMock(all=lambda: [("segment_1", "dataset", "node_1"), ("other_segment", "other_dataset", "node_1")]),
+            MagicMock(),
+            MagicMock(),
+            MagicMock(),
+        ]
+        assert RetrievalStats.flush() == (2, 6)
+
+    # rows are locked in the order of their ids before they are updated
+    lock_statement = mock_db.session.execute.call_args_list[3].args[0]
+    compiled = str(lock_statement.compile(dialect=postgresql.dialect()))
+    assert "ORDER BY document_segments.id" in compiled
+    assert "FOR UPDATE" in compiled
+    update_statement = mock_db.session.execute.call_args_list[4].args[0]
+    compiled = update_statement.compile(dialect=postgresql.dialect())
+    assert "FROM (VALUES" in str(compiled)
+    assert list(compiled.params.values()) == ["segment_1", 3, "segment_2", 3]
+    insert_call = mock_db.session.execute.call_args_list[5]
+    assert [row["dataset_id"] for row in insert_call.args[1]] == ["dataset_1", "dataset_2"] * 3
+    assert not fake_redis.hashes.get(SEGMENT_HITS_KEY)
+    assert not fake_redis.lists.get(DATASET_QUERIES_KEY)
+
+
+def test_flush_buffers_stats_again_on_failure(fake_redis):
+    RetrievalStats.record_segment_hits([_document("document", "node_1")])
+    _record_queries(["dataset_1"])
+
+    with patch("core.rag.retrieval.retrieval_stats.db") as mock_db:
+        mock_db.session.execute.side_effect = RuntimeError("database is down")
+        with pytest.raises(RuntimeError):
+            RetrievalStats.flush()
+
+    assert fake_redis.hashes[SEGMENT_HITS_KEY] == {b"dataset:document:node_1": 1}
+    assert len(fake_redis.lists[DATASET_QUERIES_KEY]) == 1
+
+
+def test_record_writes_right_away_when_buffer_disabled():
+    with (
+        patch("core.rag.retrieval.retrieval_stats.redis_client", MagicMock()) as mock_redis,
+        patch("core.rag.retrieval.retrieval_stats.db") as mock_db,
+    ):
+        _record_queries(["dataset_1", "dataset_2"])
+
+    mock_redis.rpush.assert_not_called()
+    assert mock_db.session.execute.call_count == 1
+    assert len(mock_db.session.execute.call_args.args[1]) == 2
+    mock_db.session.commit.assert_called_once()
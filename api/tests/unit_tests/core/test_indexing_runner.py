@@ -0,0 +1,57 @@
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from core.indexing_runner import DocumentIsPausedError, IndexingRunner
+from core.rag.models.document import Document
+
+
+def _documents(count: int) -> list[Document]:
+    return [Document(page_content=f"content {i}", metadata={"doc_id": f"node_{i}"}) for i in range(count)]
+
+
+@pytest.fixture
+def runner():
+    with patch("core.indexing_runner.ModelManager"):
+        yield IndexingRunner()
+
+
+def test_process_document_group_loads_in_batches(runner):
+    documents = _documents(5)
+
+    with (
+        patch("core.indexing_runner.dify_config.INDEXING_LOAD_BATCH_SIZE", 2),
+        patch.object(IndexingRunner, "_process_chunk", return_value=3) as process_chunk,
+    ):
+        tokens = runner._process_document_group(
+            MagicMock(), MagicMock(), documents, MagicMock(), MagicMock(), MagicMock(), threading.Event()
+        )
+
+    assert tokens == 9
+    assert [len(call.args[2]) for call in process_chunk.call_args_list] == [2, 2, 1]
+
+
+def test_process_document_group_stops_after_failure(runner):
+    stop_event = threading.Event()
+
+    with (
+        patch("core.indexing_runner.dify_config.INDEXING_LOAD_BATCH_SIZE", 2),
+        patch.object(IndexingRunner, "_process_chunk", side_effect=DocumentIsPausedError()) as process_chunk,
+    ):
+        with pytest.raises(DocumentIsPausedError):
+            runner._process_document_group(
+                MagicMock(), MagicMock(), _documents(5), MagicMock(), MagicMock(), MagicMock(), stop_event
+            )
+
+    assert stop_event.is_set()
+    assert process_chunk.call_count == 1
+
+    with patch.object(IndexingRunner, "_process_chunk") as process_chunk:
+        assert (
+            runner._process_document_group(
+                MagicMock(), MagicMock(), _documents(5), MagicMock(), MagicMock(), MagicMock(), stop_event
+            )
+            == 0
+        )
+    process_chunk.assert_not_called()
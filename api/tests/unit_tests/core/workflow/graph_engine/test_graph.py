@@ -1,5 +1,14 @@
+from datetime import UTC, datetime
+from unittest.mock import patch
+
+from core.workflow.entities.variable_pool import VariablePool
+from core.workflow.graph_engine.entities.event import NodeRunStreamChunkEvent
 from core.workflow.graph_engine.entities.graph import Graph
 from core.workflow.graph_engine.entities.run_condition import RunCondition
+from core.workflow.graph_engine.entities.runtime_route_state import RouteNodeState
+from core.workflow.nodes.answer.answer_stream_processor import AnswerStreamProcessor
+from core.workflow.nodes.enums import NodeType
+from core.workflow.nodes.llm.entities import LLMNodeData
 from core.workflow.utils.condition.entities import Condition
 
 
@@ -789,3 +798,72 @@ def test_parallels_graph6():
 
     for node_id in ["code1", "code2"]:
         assert graph.node_parallel_mapping[node_id] == child_parallel.id
+
+
+def test_init_uses_compiled_graph_cache():
+    graph_config = {
+        "edges": [
+            {"id": "start-source-llm-target", "source": "start", "target": "llm"},
+            {"id": "llm-source-answer-target", "source": "llm", "target": "answer"},
+        ],
+        "nodes": [
+            {"data": {"type": "start"}, "id": "start"},
+            {"data": {"type": "llm"}, "id": "llm"},
+            {"data": {"type": "answer", "title": "answer", "answer": "1"}, "id": "answer"},
+        ],
+    }
+
+    graph = Graph.init(graph_config=graph_config)
+    with patch.object(Graph, "_compile", wraps=Graph._compile) as compile_mock:
+        cached_graph = Graph.init(graph_config=graph_config)
+        compile_mock.assert_not_called()
+
+        changed_config = {**graph_config, "nodes": [*graph_config["nodes"], {"data": {"type": "end"}, "id": "end"}]}
+        Graph.init(graph_config=changed_config)
+        compile_mock.assert_called_once()
+
+    assert cached_graph is not graph
+    assert cached_graph.model_dump() == graph.model_dump()
+
+    # extra edges are added to the view only, not to the cached graph
+    cached_graph.add_extra_edge(source_node_id="answer", target_node_id="start")
+    assert "answer" in cached_graph.edge_mapping
+    assert "answer" not in Graph.init(graph_config=graph_config).edge_mapping
+
+
+def test_init_from_cache_does_not_share_stream_state_between_runs():
+    graph_config = {
+        "edges": [
+            {"id": "start-source-llm-target", "source": "start", "target": "llm", "sourceHandle": "source"},
+            {"id": "llm-source-answer-target", "source": "llm", "target": "answer", "sourceHandle": "source"},
+            {"id": "llm-fail-branch-code-target", "source": "llm", "target": "code", "sourceHandle": "fail-branch"},
+            {"id": "code-source-answer-target", "source": "code", "target": "answer", "sourceHandle": "source"},
+        ],
+        "nodes": [
+            {"data": {"type": "start"}, "id": "start"},
+            {"data": {"type": "llm", "error_strategy": "fail-branch"}, "id": "llm"},
+            {"data": {"type": "code"}, "id": "code"},
+            {"data": {"type": "answer", "title": "answer", "answer": "{{#llm.text#}}"}, "id": "answer"},
+        ],
+    }
+
+    expected_dependencies = Graph.init(graph_config=graph_config).answer_stream_generate_routes.answer_dependencies
+    assert expected_dependencies["answer"] == ["llm", "llm"]
+
+    # the answer stream processor removes the streaming node from the answer dependencies of its own run
+    for _ in range(2):
+        graph = Graph.init(graph_config=graph_config)
+        assert graph.answer_stream_generate_routes.answer_dependencies == expected_dependencies
+
+        processor = AnswerStreamProcessor(graph=graph, variable_pool=VariablePool())
+        event = NodeRunStreamChunkEvent(
+            id="llm-execution",
+            node_id="llm",
+            node_type=NodeType.LLM,
+            node_data=LLMNodeData.model_construct(title="llm"),
+            route_node_state=RouteNodeState(node_id="llm", start_at=datetime.now(UTC).replace(tzinfo=None)),
+            chunk_content="chunk",
+            from_variable_selector=["llm", "text"],
+        )
+        processor._get_stream_out_answer_node_ids(event)
+        assert graph.answer_stream_generate_routes.answer_dependencies["answer"] == ["llm"]
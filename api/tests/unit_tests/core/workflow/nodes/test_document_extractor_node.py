@@ -1,3 +1,4 @@
+import contextlib
 import io
 from unittest.mock import Mock, patch
 
@@ -111,13 +112,9 @@ def test_run_extract_text(
 
     mock_graph_runtime_state.variable_pool.get.return_value = mock_array_file_segment
 
-    mock_download = Mock(return_value=file_content)
-    mock_ssrf_proxy_get = Mock()
-    mock_ssrf_proxy_get.return_value.content = file_content
-    mock_ssrf_proxy_get.return_value.raise_for_status = Mock()
+    mock_open_file = Mock(side_effect=lambda file, max_size: contextlib.nullcontext(io.BytesIO(file_content)))
 
-    monkeypatch.setattr("core.file.file_manager.download", mock_download)
-    monkeypatch.setattr("core.helper.ssrf_proxy.get", mock_ssrf_proxy_get)
+    monkeypatch.setattr("core.file.file_manager.open_file", mock_open_file)
 
     if mime_type == "application/pdf":
         mock_pdf_extract = Mock(return_value=expected_text[0])
@@ -133,10 +130,7 @@ def test_run_extract_text(
     assert result.outputs is not None
     assert result.outputs["text"] == expected_text
 
-    if transfer_method == FileTransferMethod.REMOTE_URL:
-        mock_ssrf_proxy_get.assert_called_once_with("https://example.com/file.txt")
-    elif transfer_method == FileTransferMethod.LOCAL_FILE:
-        mock_download.assert_called_once_with(mock_file)
+    mock_open_file.assert_called_once_with(mock_file, max_size=0)
 
 
 def test_extract_text_from_plain_text():
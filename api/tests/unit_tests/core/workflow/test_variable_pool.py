@@ -44,3 +44,59 @@ def test_use_long_selector(pool):
     result = pool.get(("node_1", "part_1", "part_2"))
     assert result is not None
     assert result.value == "test_value"
+
+
+def test_child_pool_reads_fall_through_to_parent(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent"))
+
+    child = pool.create_child()
+    result = child.get(("node_1", "var"))
+    assert result is not None
+    assert result.value == "parent"
+
+
+def test_child_pool_writes_stay_local(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent"))
+    child = pool.create_child()
+
+    child.add(("node_1", "var"), StringSegment(value="child"))
+    child.add(("node_2", "var"), StringSegment(value="new"))
+
+    assert child.get(("node_1", "var")).value == "child"
+    assert child.get(("node_2", "var")).value == "new"
+    assert pool.get(("node_1", "var")).value == "parent"
+    assert pool.get(("node_2", "var")) is None
+
+
+def test_child_pool_removals_hide_parent_values(pool):
+    pool.add(("node_1", "var"), StringSegment(value="parent"))
+    pool.add(("node_2", "var_1"), StringSegment(value="parent"))
+    pool.add(("node_2", "var_2"), StringSegment(value="parent"))
+    child = pool.create_child()
+
+    child.remove(("node_1", "var"))
+    child.remove(("node_2",))
+
+    assert child.get(("node_1", "var")) is None
+    assert child.get(("node_2", "var_1")) is None
+    assert child.get(("node_2", "var_2")) is None
+    assert pool.get(("node_1", "var")).value == "parent"
+    assert pool.get(("node_2", "var_1")).value == "parent"
+
+    child.add(("node_1", "var"), StringSegment(value="child"))
+    child.add(("node_2", "var_1"), StringSegment(value="child"))
+    assert child.get(("node_1", "var")).value == "child"
+    assert child.get(("node_2", "var_1")).value == "child"
+    assert child.get(("node_2", "var_2")) is None
+
+
+def test_sibling_child_pools_are_isolated(pool):
+    first = pool.create_child()
+    second = pool.create_child()
+
+    first.add(("iteration", "index"), StringSegment(value="0"))
+    second.add(("iteration", "index"), StringSegment(value="1"))
+
+    assert first.get(("iteration", "index")).value == "0"
+    assert second.get(("iteration", "index")).value == "1"
+    assert pool.get(("iteration", "index")) is None
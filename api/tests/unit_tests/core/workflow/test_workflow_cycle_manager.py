@@ -236,6 +236,8 @@ def test_handle_workflow_run_success(workflow_cycle_manager, mock_workflow_execu
     assert result.total_tokens == 100
     assert result.total_steps == 5
     assert result.finished_at is not None
+    # Verify the node executions were persisted at the end of the run
+    workflow_cycle_manager._workflow_node_execution_repository.flush.assert_called_once()
 
 
 def test_handle_workflow_run_failed(workflow_cycle_manager, mock_workflow_execution_repository):
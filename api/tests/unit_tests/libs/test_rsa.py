@@ -1,7 +1,9 @@
+from unittest.mock import MagicMock, patch
+
 import rsa as pyrsa
 from Crypto.PublicKey import RSA
 
-from libs import gmpy2_pkcs10aep_cipher
+from libs import gmpy2_pkcs10aep_cipher, rsa
 
 
 def test_gmpy2_pkcs10aep_cipher() -> None:
@@ -27,3 +29,20 @@ def test_gmpy2_pkcs10aep_cipher() -> None:
     encrypted_by_private_key = private_cipher_rsa.encrypt(message=raw_text_bytes)
     decrypted_by_private_key = private_cipher_rsa.decrypt(encrypted_by_private_key)
     assert decrypted_by_private_key == raw_text_bytes
+
+
+def test_decrypt_decoding_is_cached_per_tenant() -> None:
+    private_key = pyrsa.newkeys(1024)[1].save_pkcs1()
+    mock_redis = MagicMock()
+    mock_redis.get.return_value = private_key
+    rsa.invalidate_decrypt_decoding("tenant")
+
+    with patch("libs.rsa.redis_client", mock_redis):
+        first = rsa.get_decrypt_decoding("tenant")
+        second = rsa.get_decrypt_decoding("tenant")
+        assert first is second
+        assert mock_redis.get.call_count == 1
+
+        rsa.invalidate_decrypt_decoding("tenant")
+        assert rsa.get_decrypt_decoding("tenant") is not first
+        assert mock_redis.get.call_count == 2
@@ -400,3 +400,113 @@ def test_to_domain_model(repository):
     assert domain_model.metadata == metadata_dict
     assert domain_model.created_at == db_model.created_at
     assert domain_model.finished_at == db_model.finished_at
+
+
+@pytest.fixture
+def write_behind_repository(session, mock_user, mocker: MockerFixture):
+    """Create a write-behind repository without the background flusher."""
+    _, session_factory = session
+    mocker.patch("core.repositories.sqlalchemy_workflow_node_execution_repository.WorkflowNodeExecutionFlusher")
+    return SQLAlchemyWorkflowNodeExecutionRepository(
+        session_factory=session_factory,
+        user=mock_user,
+        app_id="test-app",
+        triggered_from=WorkflowNodeExecutionTriggeredFrom.WORKFLOW_RUN,
+        write_behind=True,
+    )
+
+
+def _node_execution(execution_id: str, status: WorkflowNodeExecutionStatus) -> WorkflowNodeExecution:
+    return WorkflowNodeExecution(
+        id=execution_id,
+        workflow_id="test-workflow-id",
+        node_execution_id=f"node-execution-{execution_id}",
+        workflow_execution_id="test-workflow-run-id",
+        index=1,
+        node_id="test-node-id",
+        node_type=NodeType.START,
+        title="Test Node",
+        status=status,
+        created_at=datetime.now(),
+    )
+
+
+def test_write_behind_coalesces_saves(write_behind_repository, session):
+    """Test that the start and finish of an execution are written once."""
+    session_obj, _ = session
+
+    write_behind_repository.save(_node_execution("test-id", WorkflowNodeExecutionStatus.RUNNING))
+    write_behind_repository.save(_node_execution("test-id", WorkflowNodeExecutionStatus.SUCCEEDED))
+
+    session_obj.merge.assert_not_called()
+    session_obj.execute.assert_not_called()
+    # the buffered execution is visible to lookups
+    execution = write_behind_repository.get_by_node_execution_id("node-execution-test-id")
+    assert execution.status == WorkflowNodeExecutionStatus.SUCCEEDED
+
+    write_behind_repository.flush()
+
+    session_obj.execute.assert_called_once()
+    rows = session_obj.execute.call_args.args[1]
+    assert len(rows) == 1
+    assert rows[0]["id"] == "test-id"
+    assert rows[0]["status"] == WorkflowNodeExecutionStatus.SUCCEEDED
+    assert rows[0]["tenant_id"] == "test-tenant"
+    session_obj.commit.assert_called_once()
+
+
+def test_write_behind_updates_persisted_executions(write_behind_repository, session):
+    """Test that executions written before are updated instead of inserted."""
+    session_obj, _ = session
+
+    write_behind_repository.save(_node_execution("test-id", WorkflowNodeExecutionStatus.RUNNING))
+    write_behind_repository.flush()
+    write_behind_repository.save(_node_execution("test-id", WorkflowNodeExecutionStatus.SUCCEEDED))
+    write_behind_repository.save(_node_execution("other-id", WorkflowNodeExecutionStatus.RUNNING))
+    write_behind_repository.flush()
+
+    insert_stmt, inserts = session_obj.execute.call_args_list[1].args
+    update_stmt, updates = session_obj.execute.call_args_list[2].args
+    assert insert_stmt.is_insert
+    assert [row["id"] for row in inserts] == ["other-id"]
+    assert update_stmt.is_update
+    assert [row["id"] for row in updates] == ["test-id"]
+
+
+def test_write_behind_keeps_executions_when_flush_fails(write_behind_repository, session):
+    """Test that executions stay buffered when writing them fails."""
+    session_obj, _ = session
+    session_obj.commit.side_effect = [Exception("database unavailable"), None]
+
+    write_behind_repository.save(_node_execution("test-id", WorkflowNodeExecutionStatus.RUNNING))
+    with pytest.raises(Exception, match="database unavailable"):
+        write_behind_repository.flush()
+    write_behind_repository.flush()
+
+    assert session_obj.execute.call_count == 2
+    assert session_obj.execute.call_args.args[0].is_insert
+
+
+def test_write_behind_flushes_when_buffer_is_full(write_behind_repository, session, mocker: MockerFixture):
+    """Test that the saving thread writes the buffer when it is full."""
+    session_obj, _ = session
+    mocker.patch("configs.dify_config.WORKFLOW_NODE_EXECUTION_MAX_BUFFER_SIZE", 2)
+
+    write_behind_repository.save(_node_execution("first-id", WorkflowNodeExecutionStatus.RUNNING))
+    session_obj.execute.assert_not_called()
+    write_behind_repository.save(_node_execution("second-id", WorkflowNodeExecutionStatus.RUNNING))
+
+    session_obj.execute.assert_called_once()
+    assert len(session_obj.execute.call_args.args[1]) == 2
+
+
+def test_write_behind_reads_see_buffered_executions(write_behind_repository, session):
+    """Test that reading the executions of a workflow run writes the buffered ones first."""
+    session_obj, _ = session
+    session_obj.scalars.return_value.all.return_value = []
+
+    write_behind_repository.save(_node_execution("test-id", WorkflowNodeExecutionStatus.RUNNING))
+    write_behind_repository.get_by_workflow_run(workflow_run_id="test-workflow-run-id")
+
+    called = [name for name, _, _ in session_obj.mock_calls if name in ("execute", "commit", "scalars")]
+    assert called == ["execute", "commit", "scalars"]